@@ -1,13 +1,29 @@
 import os
+import json
+import uuid
+import queue
 import logging
-from flask import Flask, render_template, request, flash, redirect, url_for, session
+from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
-import tempfile
 import traceback
 
-from utils.document_processor import extract_text_from_file
-from utils.ai_processor import simplify_legal_text, summarize_document, answer_question
+from utils.document_processor import spool_stream
+from utils.extraction_store import create_extraction_store, extract_with_store
+from utils.ai_processor import (simplify_legal_text, summarize_document, analyze_document,
+                                answer_question, answer_questions, review_revision, stream_analysis, context_cache,
+                                set_document_source, STREAM_ACTIONS)
+from utils.document_store import create_document_store
+from utils.history import HistoryEntry, create_history_store, HISTORY_PAGE_SIZE
+from utils.job_queue import JobQueue, Job, QueueFullError
+from utils.retrieval import ClauseIndex
+from utils.red_flags import scan_red_flags, summarize_red_flags
+from utils.batch import BatchRun
+from utils.chunking import PAGE_MARKER_PATTERN
+from utils.metrics import stage, start_trace, finish_trace, render_metrics, DOCUMENT_TOKENS
+from utils.token_budget import document_tokens
+from utils.model_router import parse_latency_budget, set_latency_budget
+from utils.similarity import set_similarity_owner, similarity_owner
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,97 +35,663 @@ app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key_for_hackathon"
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Configuration
-UPLOAD_FOLDER = tempfile.gettempdir()
 ALLOWED_EXTENSIONS = {'txt', 'pdf'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+MAX_QUESTIONS = 50  # questions per /ask_questions request
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
+# Extracted document text lives server-side; the session only holds its ID
+document_store = create_document_store()
+# Cached model contexts are deleted together with their document
+document_store.add_eviction_listener(context_cache.release)
+# Near-duplicate uploads are diffed against the stored text of the document they resemble
+set_document_source(document_store.get)
+
+# Extracted text with page offsets, keyed by upload hash, so identical uploads are never parsed twice
+extraction_store = create_extraction_store()
+
+# Every analysis, with its document, in a searchable local database
+history = create_history_store()
+
+# Uploads submitted through /jobs are analyzed on this pool instead of the request worker
+job_queue = JobQueue()
+
+# Bulk review runs keyed by job ID, for progress and partial results
+batch_runs = {}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class DocumentProcessingError(Exception):
+    """Raised when an uploaded document cannot be processed; the message is shown to the user."""
+
+def validate_upload_request():
+    """
+    Validate the upload form shared by /upload and /jobs.
+
+    Returns:
+        Optional[str]: Error message for the user, or None if the request is valid
+    """
+    if 'file' not in request.files:
+        return 'No file selected'
+
+    file = request.files['file']
+    action = request.form.get('action')
+    question = request.form.get('question', '').strip()
+
+    if file.filename == '':
+        return 'No file selected'
+
+    if not allowed_file(file.filename):
+        return 'File type not supported. Please upload PDF or TXT files only.'
+
+    if not action:
+        return 'Please select an action'
+
+    if action == 'question' and not question:
+        return 'Please enter a question'
+
+    return None
+
+def store_document(stream, filename, mimetype):
+    """
+    Extract an uploaded document straight from memory, store it, index its clauses
+    and pre-scan it for red flags.
+
+    Args:
+        stream: Binary stream of the upload
+        filename: Original (sanitized) filename
+        mimetype: Mimetype reported by the client
+
+    Returns:
+        Tuple[str, str, ClauseIndex]: Document ID, extracted text and clause index
+
+    Raises:
+        DocumentProcessingError: If no text could be extracted
+    """
+    # Extract text from the upload without writing it to disk
+    logger.info(f"Extracting text from {filename}")
+    with stage('extract'):
+        document_text, extraction_key = extract_with_store(extraction_store, stream, filename, mimetype)
+
+    if not document_text.strip():
+        raise DocumentProcessingError('Could not extract text from the document. Please check if the file is valid.')
+
+    # Store document text server-side so only its ID needs to go in the session
+    with stage('store'):
+        document_id = document_store.put(document_text)
+
+    # Counted once here; prompt planning reuses the cached count
+    DOCUMENT_TOKENS.observe(document_tokens(document_text, document_id))
+
+    # Remember which extraction artifact holds this document's pages
+    if extraction_key:
+        document_store.put_artifact(document_id, 'extraction', extraction_key)
+
+    # Index clauses once so follow-up questions only send relevant sections
+    with stage('index'):
+        clause_index = ClauseIndex.build(document_text)
+        document_store.put_artifact(document_id, 'clause_index', clause_index.to_json())
+
+    # Local lexicon scan, shown on the results page before the model has answered
+    with stage('scan'):
+        red_flags = summarize_red_flags(scan_red_flags(document_text))
+        document_store.put_artifact(document_id, 'red_flags', json.dumps(red_flags))
+
+    return document_id, document_text, clause_index
+
+def record_history(document_id, filename, document_text, analyses):
+    """
+    Save a document and its analyses to the searchable history.
+
+    Failures are logged and never affect the response.
+
+    Args:
+        document_id: The document's hash
+        filename: Original (sanitized) filename
+        document_text: Extracted document text
+        analyses: (action, question, result) tuples; failed results are skipped
+    """
+    # Recorded for the session the request or job runs for; without one nobody could read it back
+    owner = similarity_owner()
+    entries = [HistoryEntry(document_id, filename, document_text, action, question, result, owner)
+               for action, question, result in analyses if result and not result.get('error')]
+    if history is None or owner is None or not entries:
+        return
+    try:
+        with stage('history'):
+            history.record_many(entries)
+    except Exception as e:
+        logger.warning(f"Could not record analysis history: {str(e)}")
+
+def load_clause_index(document_id):
+    """Load the clause index stored alongside a document, if any."""
+    index_payload = document_store.get_artifact(document_id, 'clause_index')
+    return ClauseIndex.from_json(index_payload) if index_payload else None
+
+def load_red_flags(document_id):
+    """Load the red-flag scan stored alongside a document, or an empty list."""
+    payload = document_store.get_artifact(document_id, 'red_flags') if document_id else None
+    return json.loads(payload) if payload else []
+
+def process_document(stream, filename, mimetype, action, question):
+    """
+    Extract, store and analyze an uploaded document.
+
+    Args:
+        stream: Binary stream of the upload
+        filename: Original (sanitized) filename
+        mimetype: Mimetype reported by the client
+        action: One of 'simplify', 'summarize', 'analyze' or 'question'
+        question: User's question for the 'question' action
+
+    Returns:
+        Dict containing result, action, filename, question and document_id
+
+    Raises:
+        DocumentProcessingError: If no text could be extracted
+    """
+    document_id, document_text, clause_index = store_document(stream, filename, mimetype)
+
+    # Process based on action
+    result = None
+    with stage('analyze'):
+        if action == 'simplify':
+            logger.info("Simplifying legal text")
+            result = simplify_legal_text(document_text)
+        elif action == 'summarize':
+            logger.info("Summarizing document")
+            result = summarize_document(document_text)
+        elif action == 'analyze':
+            logger.info("Running full analysis")
+            result = analyze_document(document_text)
+        elif action == 'question':
+            logger.info(f"Answering question: {question}")
+            result = answer_question(document_text, question, clause_index)
+
+    record_history(document_id, filename, document_text,
+                   [(action, question if action == 'question' else None, result)])
+
+    return {
+        'result': result,
+        'action': action,
+        'filename': filename,
+        'question': question if action == 'question' else None,
+        'document_id': document_id
+    }
+
+def process_spooled_document(buffer, filename, mimetype, action, question):
+    """
+    Background-job wrapper around process_document() that releases the spooled upload.
+    """
+    try:
+        return process_document(buffer, filename, mimetype, action, question)
+    finally:
+        buffer.close()
+
+def render_analysis(analysis):
+    """
+    Render the results page for a processed document and remember it for follow-up Q&A.
+
+    Args:
+        analysis: Dict returned by process_document()
+    """
+    session['document_id'] = analysis['document_id']
+    session['filename'] = analysis['filename']
+
+    with stage('render'):
+        return render_template('results.html',
+                             result=analysis['result'],
+                             action=analysis['action'],
+                             filename=analysis['filename'],
+                             question=analysis['question'],
+                             red_flags=load_red_flags(analysis['document_id']))
+
+@app.route('/healthz')
+def healthz():
+    # Liveness only: no template rendering, storage or model access
+    return Response('ok', mimetype='text/plain')
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.before_request
+def begin_request_trace():
+    start_trace(request.endpoint or 'unknown')
+
+@app.before_request
+def apply_latency_budget():
+    # Clients may ask for faster answers per request; model calls are routed to fit (see model_router)
+    set_latency_budget(parse_latency_budget(request.headers.get('X-Latency-Budget')))
+
+@app.before_request
+def apply_session_owner():
+    # Near-duplicate reuse and the history are scoped to the session that uploaded the documents
+    if request.method == 'POST' and 'owner' not in session:
+        session['owner'] = uuid.uuid4().hex
+    set_similarity_owner(session.get('owner'))
+
+def queue_session_job(fn, *args) -> Job:
+    """
+    Queue fn(*args) on the job queue on behalf of the current session.
+
+    Raises:
+        QueueFullError: If the job queue is full
+    """
+    owner = session.get('owner')
+
+    def run():
+        set_similarity_owner(owner)
+        return fn(*args)
+    return job_queue.submit(run)
+
+@app.after_request
+def end_request_trace(response):
+    trace = finish_trace(response.status_code)
+    if trace is not None and trace.spans:
+        response.headers['Server-Timing'] = trace.server_timing()
+        logger.info(f"request_timing {json.dumps(trace.to_dict())}")
+    return response
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
-        if 'file' not in request.files:
-            flash('No file selected', 'error')
+        # Accessing the form makes Werkzeug read and parse the multipart upload
+        with stage('upload'):
+            error_message = validate_upload_request()
+        if error_message:
+            flash(error_message, 'error')
             return redirect(url_for('index'))
-        
+
         file = request.files['file']
         action = request.form.get('action')
         question = request.form.get('question', '').strip()
-        
-        if file.filename == '':
-            flash('No file selected', 'error')
+
+        filename = secure_filename(file.filename or '')
+        analysis = process_document(file.stream, filename, file.mimetype, action, question)
+        return render_analysis(analysis)
+
+    except DocumentProcessingError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+
+    except Exception as e:
+        logger.error(f"Error processing file: {str(e)}")
+        logger.error(traceback.format_exc())
+        flash(f'An error occurred while processing your document: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+def job_payload(job):
+    """Serialize a job for the JSON job API, including its polling and result URLs."""
+    payload = job.to_dict()
+    payload['status_url'] = url_for('job_status', job_id=job.id)
+    payload['result_url'] = url_for('job_result', job_id=job.id)
+    return payload
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    error_message = validate_upload_request()
+    if error_message:
+        return jsonify({'error': error_message}), 400
+
+    file = request.files['file']
+    action = request.form.get('action')
+    question = request.form.get('question', '').strip()
+
+    filename = secure_filename(file.filename or '')
+
+    # The request stream is closed once we respond, so copy the upload into an owned buffer
+    buffer = spool_stream(file.stream)
+
+    try:
+        job = queue_session_job(process_spooled_document, buffer, filename, file.mimetype, action, question)
+    except QueueFullError:
+        buffer.close()
+        logger.warning("Job queue full, rejecting upload")
+        response = jsonify({'error': 'The server is busy analyzing other documents. Please try again shortly.'})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    logger.info(f"Queued job {job.id} for {filename}")
+    return jsonify(job_payload(job)), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_payload(job))
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        flash('Analysis not found or expired. Please upload the document again.', 'error')
+        return redirect(url_for('index'))
+
+    if not job.finished:
+        flash('Your document is still being analyzed. Please wait a moment.', 'error')
+        return redirect(url_for('index'))
+
+    if job.status == Job.FAILED:
+        flash(f'An error occurred while processing your document: {job.error}', 'error')
+        return redirect(url_for('index'))
+
+    return render_analysis(job.result)
+
+@app.route('/documents', methods=['POST'])
+def upload_document():
+    error_message = validate_upload_request()
+    if error_message:
+        return jsonify({'error': error_message}), 400
+
+    file = request.files['file']
+    action = request.form.get('action')
+    question = request.form.get('question', '').strip()
+    filename = secure_filename(file.filename or '')
+
+    try:
+        document_id, _, _ = store_document(file.stream, filename, file.mimetype)
+    except DocumentProcessingError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error processing file: {str(e)}")
+        return jsonify({'error': f'An error occurred while processing your document: {str(e)}'}), 500
+
+    session['document_id'] = document_id
+    session['filename'] = filename
+
+    return jsonify({
+        'document_id': document_id,
+        'results_url': url_for('stream_results', action=action,
+                               question=question if action == 'question' else None)
+    }), 201
+
+def load_page_text(document_id, page):
+    """
+    Text of one page of a stored document.
+
+    Served from the memory-mapped extraction artifact when there is one;
+    otherwise the page is located in the stored text.
+
+    Args:
+        document_id: ID returned by the document store
+        page: 1-based page number
+
+    Returns:
+        Optional[str]: Page text, or None if the document or page is unknown
+    """
+    extraction_key = document_store.get_artifact(document_id, 'extraction')
+    if extraction_store is not None and extraction_key:
+        artifact = extraction_store.get(extraction_key)
+        if artifact is not None:
+            with artifact:
+                return artifact.page_text(page)
+
+    document_text = document_store.get(document_id)
+    if not document_text:
+        return None
+    markers = list(PAGE_MARKER_PATTERN.finditer(document_text))
+    for position, match in enumerate(markers):
+        if int(match.group(1)) == page:
+            end = markers[position + 1].start() if position + 1 < len(markers) else len(document_text)
+            return document_text[match.end():end].strip()
+    return None
+
+@app.route('/documents/<document_id>/pages/<int:page>')
+def document_page(document_id, page):
+    # Like follow-up questions, only the document uploaded in this session can be read
+    if document_id != session.get('document_id'):
+        return jsonify({'error': 'Page not found'}), 404
+    page_text = load_page_text(document_id, page)
+    if page_text is None:
+        return jsonify({'error': 'Page not found'}), 404
+    return jsonify({'document_id': document_id, 'page': page, 'text': page_text})
+
+@app.route('/search')
+def search_history():
+    """
+    Full-text search over the documents analyzed in this session and their results.
+
+    Query parameters: q (required), page, per_page and action ('document' to
+    search document text only, or an action name to search its results).
+    """
+    if history is None:
+        return jsonify({'error': 'Analysis history is disabled'}), 404
+    owner = session.get('owner')
+    if owner is None:
+        return jsonify({'error': 'No documents analyzed in this session'}), 404
+
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', HISTORY_PAGE_SIZE, type=int)
+    try:
+        with stage('search'):
+            results = history.search(query, page, per_page, request.args.get('action') or None, owner)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for hit in results['results']:
+        hit['history_url'] = url_for('document_history', document_id=hit['document_id'])
+    return jsonify(results)
+
+@app.route('/history/<document_id>')
+def document_history(document_id):
+    if history is None:
+        return jsonify({'error': 'Analysis history is disabled'}), 404
+
+    # Like /search, only documents analyzed in this session can be read
+    owner = session.get('owner')
+    document = history.document(document_id, owner) if owner else None
+    if document is None:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify(document)
+
+@app.route('/results/stream')
+def stream_results():
+    action = request.args.get('action')
+    question = request.args.get('question', '').strip() or None
+
+    if not session.get('document_id'):
+        flash('No document loaded. Please upload a document first.', 'error')
+        return redirect(url_for('index'))
+
+    if action not in STREAM_ACTIONS or (action == 'question' and not question):
+        flash('Please select an action', 'error')
+        return redirect(url_for('index'))
+
+    return render_template('results.html',
+                         result=None,
+                         streaming=True,
+                         stream_url=url_for('stream_analysis_events', action=action, question=question),
+                         action=action,
+                         filename=session.get('filename'),
+                         question=question,
+                         red_flags=load_red_flags(session.get('document_id')))
+
+def format_sse(event, payload):
+    """Encode one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def run_stream_job(events, document_id, filename, document_text, action, question, clause_index):
+    """
+    Background-job body for /stream: run the streamed analysis and hand its events to the request relaying them.
+
+    Args:
+        events: Queue the events are put on, followed by None when the analysis ends
+        document_id: ID of the stored document
+        filename: Original filename, for the history
+        document_text: Extracted document text
+        action: One of the STREAM_ACTIONS
+        question: User's question for the 'question' action
+        clause_index: Clause index for questions about long documents
+    """
+    try:
+        logger.info(f"Streaming {action} for {document_id[:12]}")
+        for event, payload in stream_analysis(document_text, action, question, clause_index):
+            events.put((event, payload))
+            if event == 'done':
+                record_history(document_id, filename, document_text,
+                               [(action, question if action == 'question' else None, payload)])
+    except Exception as e:
+        logger.error(f"Stream job failed: {str(e)}")
+        events.put(('error', {'error': f"Failed to analyze document: {str(e)}"}))
+    finally:
+        events.put(None)
+
+@app.route('/stream')
+def stream_analysis_events():
+    action = request.args.get('action')
+    question = request.args.get('question', '').strip() or None
+    document_id = session.get('document_id')
+    document_text = document_store.get(document_id) if document_id else None
+
+    if action not in STREAM_ACTIONS or (action == 'question' and not question):
+        return jsonify({'error': 'Unsupported action'}), 400
+
+    if not document_text:
+        return jsonify({'error': 'No document loaded. Please upload a document first.'}), 404
+
+    clause_index = load_clause_index(document_id) if action == 'question' else None
+
+    # The model call runs on the bounded job pool like /jobs; this request only relays its events
+    events = queue.Queue()
+    try:
+        queue_session_job(run_stream_job, events, document_id, session.get('filename'), document_text,
+                          action, question, clause_index)
+    except QueueFullError:
+        logger.warning("Job queue full, rejecting stream")
+        events.put(('error', {'error': 'The server is busy analyzing other documents. Please try again shortly.'}))
+        events.put(None)
+
+    def generate():
+        for item in iter(events.get, None):
+            yield format_sse(*item)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/batch', methods=['POST'])
+def submit_batch():
+    files = [file for file in request.files.getlist('files') if file.filename]
+    action = request.form.get('action', 'summarize')
+    question = request.form.get('question', '').strip() or None
+
+    if not files:
+        return jsonify({'error': 'No files selected'}), 400
+
+    unsupported = [file.filename for file in files if not allowed_file(file.filename)]
+    if unsupported:
+        return jsonify({'error': f"File type not supported: {', '.join(unsupported)}"}), 400
+
+    try:
+        # Documents are extracted in the job's threads; a process pool is left to the CLI
+        run = BatchRun(action=action, question=question, extract_processes=0, history=history,
+                       owner=session.get('owner'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sources = [(secure_filename(file.filename), file.read()) for file in files]
+
+    try:
+        job = queue_session_job(run.run, sources)
+    except QueueFullError:
+        response = jsonify({'error': 'The server is busy analyzing other documents. Please try again shortly.'})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    # Forget runs whose jobs have expired from the queue
+    for job_id in [job_id for job_id in batch_runs if job_queue.get(job_id) is None]:
+        del batch_runs[job_id]
+    batch_runs[job.id] = run
+
+    logger.info(f"Queued batch job {job.id} with {len(sources)} documents")
+    return jsonify(batch_payload(job, run)), 202
+
+def batch_payload(job, run):
+    """Serialize a batch job with its progress and URLs."""
+    payload = job.to_dict()
+    payload['progress'] = run.progress
+    payload['status_url'] = url_for('batch_status', job_id=job.id)
+    payload['results_url'] = url_for('batch_results', job_id=job.id)
+    return payload
+
+@app.route('/batch/<job_id>')
+def batch_status(job_id):
+    job = job_queue.get(job_id)
+    run = batch_runs.get(job_id)
+    if job is None or run is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(batch_payload(job, run))
+
+@app.route('/batch/<job_id>/results.jsonl')
+def batch_results(job_id):
+    run = batch_runs.get(job_id)
+    if run is None or job_queue.get(job_id) is None:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    # Records finished so far, one JSON object per line
+    body = "".join(json.dumps(record) + "\n" for record in list(run.records))
+    return Response(body, mimetype='application/x-ndjson')
+
+@app.route('/compare', methods=['POST'])
+def compare_revision():
+    try:
+        previous_id = session.get('document_id')
+        previous_text = document_store.get(previous_id) if previous_id else None
+        if not previous_text:
+            flash('No earlier version loaded. Please upload the original document first.', 'error')
+            return redirect(url_for('index'))
+
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            flash('Please select the revised document', 'error')
             return redirect(url_for('index'))
-        
         if not allowed_file(file.filename):
             flash('File type not supported. Please upload PDF or TXT files only.', 'error')
             return redirect(url_for('index'))
-        
-        if not action:
-            flash('Please select an action', 'error')
-            return redirect(url_for('index'))
-        
-        if action == 'question' and not question:
-            flash('Please enter a question', 'error')
-            return redirect(url_for('index'))
-        
-        # Save uploaded file
-        filename = secure_filename(file.filename or '')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Extract text from file
-        logger.info(f"Extracting text from {filename}")
-        document_text = extract_text_from_file(filepath)
-        
-        if not document_text.strip():
-            flash('Could not extract text from the document. Please check if the file is valid.', 'error')
-            os.remove(filepath)
-            return redirect(url_for('index'))
-        
-        # Store document text in session for Q&A
-        session['document_text'] = document_text
-        session['filename'] = filename
-        
-        # Process based on action
-        result = None
-        if action == 'simplify':
-            logger.info("Simplifying legal text")
-            result = simplify_legal_text(document_text)
-        elif action == 'summarize':
-            logger.info("Summarizing document")
-            result = summarize_document(document_text)
-        elif action == 'question':
-            logger.info(f"Answering question: {question}")
-            result = answer_question(document_text, question)
-        
-        # Clean up uploaded file
-        os.remove(filepath)
-        
-        return render_template('results.html', 
-                             result=result, 
-                             action=action, 
-                             filename=filename,
-                             question=question if action == 'question' else None)
-    
+
+        filename = secure_filename(file.filename)
+        document_id, document_text, _ = store_document(file.stream, filename, file.mimetype)
+
+        logger.info(f"Comparing {filename} with {session.get('filename')}")
+        with stage('analyze'):
+            result = review_revision(previous_text, document_text)
+        record_history(document_id, filename, document_text, [('compare', None, result)])
+
+        # The revision becomes the base for the next comparison and for follow-up questions
+        return render_analysis({
+            'result': result,
+            'action': 'compare',
+            'filename': filename,
+            'question': None,
+            'document_id': document_id
+        })
+
+    except DocumentProcessingError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}")
+        logger.error(f"Error comparing versions: {str(e)}")
         logger.error(traceback.format_exc())
-        flash(f'An error occurred while processing your document: {str(e)}', 'error')
+        flash(f'An error occurred while comparing versions: {str(e)}', 'error')
         return redirect(url_for('index'))
 
 @app.route('/ask_question', methods=['POST'])
 def ask_question():
     try:
         question = request.form.get('question', '').strip()
-        document_text = session.get('document_text')
+        document_id = session.get('document_id')
+        with stage('load_document'):
+            document_text = document_store.get(document_id) if document_id else None
         filename = session.get('filename')
         
         if not question:
@@ -120,14 +702,20 @@ def ask_question():
             flash('No document loaded. Please upload a document first.', 'error')
             return redirect(url_for('index'))
         
+        with stage('load_index'):
+            clause_index = load_clause_index(document_id)
+
         logger.info(f"Answering follow-up question: {question}")
-        result = answer_question(document_text, question)
+        with stage('analyze'):
+            result = answer_question(document_text, question, clause_index)
+        record_history(document_id, filename, document_text, [('question', question, result)])
         
-        return render_template('results.html',
-                             result=result,
-                             action='question',
-                             filename=filename,
-                             question=question)
+        with stage('render'):
+            return render_template('results.html',
+                                 result=result,
+                                 action='question',
+                                 filename=filename,
+                                 question=question)
     
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
@@ -135,6 +723,84 @@ def ask_question():
         flash(f'An error occurred while processing your question: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+def parse_questions(raw_questions):
+    """
+    Normalize a question list from a form (one question per line) or a JSON array.
+
+    Args:
+        raw_questions: Newline-separated string or list of strings
+
+    Returns:
+        List[str]: Non-empty questions in order, without duplicates
+    """
+    if isinstance(raw_questions, str):
+        raw_questions = raw_questions.splitlines()
+    questions = (question.strip() for question in raw_questions or [] if isinstance(question, str))
+    return list(dict.fromkeys(question for question in questions if question))
+
+@app.route('/ask_questions', methods=['POST'])
+def ask_questions():
+    """
+    Answer a checklist of questions about the current document in as few model calls as possible.
+
+    Form posts (one question per line in 'questions') render the results page;
+    JSON posts ({"questions": [...], "document_id": optional}) get JSON answers.
+    Only the document uploaded in this session can be asked about; a JSON
+    document_id must name that document.
+    """
+    payload = request.get_json(silent=True) if request.is_json else None
+    document_id = session.get('document_id')
+    if payload is not None:
+        questions = parse_questions(payload.get('questions'))
+        requested_id = payload.get('document_id')
+    else:
+        questions = parse_questions(request.form.get('questions', ''))
+        requested_id = None
+
+    def fail(message, status):
+        if payload is not None:
+            return jsonify({'error': message}), status
+        flash(message, 'error')
+        return redirect(url_for('index'))
+
+    if not questions:
+        return fail('Please enter at least one question', 400)
+    if len(questions) > MAX_QUESTIONS:
+        return fail(f'Please ask at most {MAX_QUESTIONS} questions at a time', 400)
+
+    if requested_id and requested_id != document_id:
+        return fail('Document not found', 404)
+
+    with stage('load_document'):
+        document_text = document_store.get(document_id) if document_id else None
+    if not document_text:
+        return fail('No document loaded. Please upload a document first.', 404)
+
+    try:
+        with stage('load_index'):
+            clause_index = load_clause_index(document_id)
+
+        logger.info(f"Answering {len(questions)} questions")
+        with stage('analyze'):
+            results = answer_questions(document_text, questions, clause_index)
+        record_history(document_id, session.get('filename'), document_text,
+                       [('question', question, result) for question, result in zip(questions, results)])
+    except Exception as e:
+        logger.error(f"Error answering questions: {str(e)}")
+        logger.error(traceback.format_exc())
+        return fail(f'An error occurred while processing your questions: {str(e)}', 500)
+
+    answers = [dict(result, question=question) for question, result in zip(questions, results)]
+    if payload is not None:
+        return jsonify({'document_id': document_id, 'answers': answers})
+
+    with stage('render'):
+        return render_template('results.html',
+                             result={'answers': answers},
+                             action='questions',
+                             filename=session.get('filename'),
+                             question=None)
+
 @app.errorhandler(413)
 def too_large(e):
     flash('File too large. Please upload a file smaller than 16MB.', 'error')
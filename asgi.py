@@ -0,0 +1,268 @@
+"""
+ASGI entry point: the same application with non-blocking model calls.
+
+Run next to (or instead of) the gunicorn deployment with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --proxy-headers
+
+/upload and /ask_question are served natively async: the request is
+parsed with Flask's own request context, text extraction runs on a worker
+thread, and the model call awaits client.aio, so a single process can
+hold hundreds of analyses in flight. Every other route is passed through
+to the WSGI app on a worker thread, unchanged.
+"""
+import io
+import sys
+import asyncio
+import logging
+import traceback
+
+from flask import request, session, flash, redirect, render_template, url_for
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import secure_filename
+
+import app as wsgi
+from utils.ai_processor import run_action_async
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+flask_app = wsgi.app
+
+def _forwarded_environ(environ: dict, start_response) -> dict:
+    return environ
+
+# Async views bypass flask_app.wsgi_app, so they get the same ProxyFix handling of forwarded headers here
+_wsgi_proxy_fix = flask_app.wsgi_app
+proxy_fix = ProxyFix(_forwarded_environ, x_for=_wsgi_proxy_fix.x_for, x_proto=_wsgi_proxy_fix.x_proto,
+                     x_host=_wsgi_proxy_fix.x_host, x_port=_wsgi_proxy_fix.x_port,
+                     x_prefix=_wsgi_proxy_fix.x_prefix)
+
+def build_environ(scope: dict, body: bytes) -> dict:
+    """
+    Build a WSGI environ for an ASGI HTTP request whose body has been read.
+
+    Args:
+        scope: ASGI connection scope
+        body: Complete request body
+
+    Returns:
+        dict: WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def read_body(receive, limit: int) -> bytes:
+    """
+    Read the request body, stopping once it exceeds limit bytes.
+
+    At most limit + 1 bytes are kept, enough for Flask to reject an
+    oversized request with 413 exactly as under WSGI.
+    """
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')[:limit + 1 - size]
+        chunks.append(chunk)
+        size += len(chunk)
+        more_body = message.get('more_body', False)
+    return b"".join(chunks)
+
+async def send_response(send, response) -> None:
+    """Send a buffered Flask response over ASGI."""
+    body = response.get_data()
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+               for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def call_wsgi(environ: dict, send) -> None:
+    """
+    Serve a request with the WSGI app on a worker thread.
+
+    The response body is iterated on the worker thread too, so streamed
+    responses such as /stream are forwarded chunk by chunk.
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in headers]
+
+    body = await asyncio.to_thread(flask_app, environ, start_response)
+    iterator = iter(body)
+    try:
+        first = await asyncio.to_thread(next, iterator, None)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        chunk = first
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await asyncio.to_thread(next, iterator, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(body, 'close'):
+            await asyncio.to_thread(body.close)
+
+async def upload_file():
+    try:
+        with stage('upload'):
+            error_message = wsgi.validate_upload_request()
+        if error_message:
+            flash(error_message, 'error')
+            return redirect(url_for('index'))
+
+        file = request.files['file']
+        action = request.form.get('action')
+        question = request.form.get('question', '').strip()
+        filename = secure_filename(file.filename or '')
+
+        # Extraction is CPU-bound; keep it off the event loop
+        document_id, document_text, clause_index = await asyncio.to_thread(
+            wsgi.store_document, file.stream, filename, file.mimetype
+        )
+
+        with stage('analyze'):
+            result = await run_action_async(document_text, action,
+                                            question if action == 'question' else None, clause_index)
+        await asyncio.to_thread(wsgi.record_history, document_id, filename, document_text,
+                                [(action, question if action == 'question' else None, result)])
+
+        # Template rendering is blocking work too
+        return await asyncio.to_thread(wsgi.render_analysis, {
+            'result': result,
+            'action': action,
+            'filename': filename,
+            'question': question if action == 'question' else None,
+            'document_id': document_id
+        })
+
+    except wsgi.DocumentProcessingError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('index'))
+    except Exception as e:
+        logger.error(f"Error processing file: {str(e)}")
+        logger.error(traceback.format_exc())
+        flash(f'An error occurred while processing your document: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+async def ask_question():
+    try:
+        question = request.form.get('question', '').strip()
+        document_id = session.get('document_id')
+        with stage('load_document'):
+            document_text = await asyncio.to_thread(wsgi.document_store.get, document_id) if document_id else None
+        filename = session.get('filename')
+
+        if not question:
+            flash('Please enter a question', 'error')
+            return redirect(url_for('index'))
+
+        if not document_text:
+            flash('No document loaded. Please upload a document first.', 'error')
+            return redirect(url_for('index'))
+
+        with stage('load_index'):
+            clause_index = await asyncio.to_thread(wsgi.load_clause_index, document_id)
+
+        logger.info(f"Answering follow-up question: {question}")
+        with stage('analyze'):
+            result = await run_action_async(document_text, 'question', question, clause_index)
+        await asyncio.to_thread(wsgi.record_history, document_id, filename, document_text,
+                                [('question', question, result)])
+
+        with stage('render'):
+            return await asyncio.to_thread(render_template, 'results.html',
+                                           result=result,
+                                           action='question',
+                                           filename=filename,
+                                           question=question)
+
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        logger.error(traceback.format_exc())
+        flash(f'An error occurred while processing your question: {str(e)}', 'error')
+        return redirect(url_for('index'))
+
+# Routes served natively async; everything else goes to the WSGI app
+ASYNC_ROUTES = {
+    ('POST', '/upload'): upload_file,
+    ('POST', '/ask_question'): ask_question
+}
+
+async def dispatch_async(view, environ: dict):
+    """
+    Run an async view inside a Flask request context.
+
+    Forwarded headers are applied as by the WSGI app's ProxyFix, and
+    before_request/after_request hooks, error handlers and the session
+    cookie work exactly as for the WSGI routes.
+    """
+    with flask_app.request_context(proxy_fix(environ, None)):
+        try:
+            response = flask_app.preprocess_request()
+            if response is None:
+                response = await view()
+        except HTTPException as e:
+            response = flask_app.handle_http_exception(e)
+        response = flask_app.make_response(response)
+        return flask_app.process_response(response)
+
+async def app(scope, receive, send):
+    """ASGI application callable."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    body = await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+    environ = build_environ(scope, body)
+
+    view = ASYNC_ROUTES.get((scope['method'], scope['path']))
+    if view is None:
+        await call_wsgi(environ, send)
+        return
+
+    await send_response(send, await dispatch_async(view, environ))
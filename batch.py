@@ -0,0 +1,54 @@
+import argparse
+import logging
+import sys
+
+from utils.batch import (BatchRun, find_documents, BATCH_ACTIONS, BATCH_CONCURRENCY, BATCH_EXTRACT_PROCESSES,
+                         BATCH_HISTORY_OWNER)
+from utils.history import create_history_store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze many legal documents and write one JSON result per line."
+    )
+    parser.add_argument('inputs', nargs='+', help="PDF/TXT files or directories to search recursively")
+    parser.add_argument('--action', default='summarize', choices=sorted(BATCH_ACTIONS) + ['question'],
+                        help="Analysis to run on every document (default: summarize)")
+    parser.add_argument('--question', help="Question to ask about every document (for --action question)")
+    parser.add_argument('--output', default='results.jsonl', help="JSONL results file (default: results.jsonl)")
+    parser.add_argument('--processes', type=int, default=BATCH_EXTRACT_PROCESSES,
+                        help="Processes used for text extraction")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help="Documents analyzed by the model at the same time")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Overwrite the output file instead of skipping documents already analyzed")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Do not save the analyses to the searchable history")
+    parser.add_argument('--owner', default=BATCH_HISTORY_OWNER,
+                        help=f"History owner the analyses are saved for, searched with search_history.py "
+                             f"(default: {BATCH_HISTORY_OWNER})")
+    args = parser.parse_args(argv)
+
+    if args.action == 'question' and not args.question:
+        parser.error("--question is required with --action question")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    paths = find_documents(args.inputs)
+    if not paths:
+        parser.error("No PDF or TXT documents found")
+
+    history = None if args.no_history else create_history_store()
+    run = BatchRun(action=args.action, question=args.question, output_path=args.output,
+                   resume=not args.no_resume, extract_processes=args.processes,
+                   concurrency=args.concurrency, history=history, owner=args.owner)
+    records = run.run([(path, path) for path in paths])
+
+    failed = sum(1 for record in records if record.get('error'))
+    print(f"Analyzed {len(records) - failed} documents, {failed} failed, "
+          f"{run.skipped} skipped (already done). Results in {args.output}")
+    if history is not None:
+        print(f"Saved to the history for owner '{args.owner}': python search_history.py --owner {args.owner} <query>")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
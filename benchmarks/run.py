@@ -0,0 +1,256 @@
+"""
+Benchmark suite for document extraction, formatting and request throughput.
+
+Runs entirely offline against the fake model backend and writes a JSON
+report with throughput and p50/p95/p99 latency per scenario. Passing
+--baseline compares p95 latencies against an earlier report and exits
+non-zero when any scenario regressed by more than --max-regression.
+
+Usage:
+    python -m benchmarks.run --output benchmark.json
+    python -m benchmarks.run --quick --baseline benchmark.json
+"""
+import os
+
+# Benchmarks never call the live API; client-side rate limits would dominate the measurements
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("RESULT_CACHE_BACKEND", "memory")
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_MAX_IN_FLIGHT", "64")
+
+import io
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import platform
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from tests.pdf_fixtures import make_pdf
+from utils.document_processor import extract_text_from_pdf, extract_text_from_txt
+from utils.ai_processor import format_text_with_paragraphs
+from utils import model_backend
+
+CLAUSE = ("The Tenant shall pay the Landlord the monthly rent on or before the first day of each month "
+          "and shall indemnify the Landlord against all claims arising from the Tenant's use of the premises. ")
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of measurements.
+
+    Args:
+        values: Measurements
+        fraction: Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        float: The percentile value (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Throughput and latency statistics for one scenario, in operations/second and milliseconds."""
+    return {
+        "operations": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 3),
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 3),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 3)
+    }
+
+def measure(operation: Callable[[int], Any], iterations: int, concurrency: int = 1) -> Dict[str, float]:
+    """
+    Run an operation repeatedly and collect its latency distribution.
+
+    Args:
+        operation: Called with the iteration number; raising or returning False counts as an error
+        iterations: Total number of calls
+        concurrency: Number of threads issuing calls
+
+    Returns:
+        Dict[str, float]: Statistics from summarize()
+    """
+    latencies = []
+    errors = 0
+
+    def timed(iteration):
+        started = time.perf_counter()
+        try:
+            ok = operation(iteration) is not False
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(timed, range(iterations)))
+    else:
+        outcomes = [timed(iteration) for iteration in range(iterations)]
+    elapsed = time.perf_counter() - started
+
+    for ok, latency in outcomes:
+        if ok:
+            latencies.append(latency)
+        else:
+            errors += 1
+    return summarize(latencies, elapsed, errors)
+
+def legal_text(size: int) -> str:
+    """Clause-like text of roughly size characters, split into paragraphs."""
+    paragraphs = []
+    total = 0
+    for number in itertools.count(1):
+        paragraph = f"{number}. {CLAUSE * 3}"
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+        if total >= size:
+            break
+    return "\n\n".join(paragraphs)
+
+def bench_extraction(iterations: int, pdf_pages: List[int], txt_sizes: List[int]) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for pages in pdf_pages:
+        pdf = make_pdf([f"Page {page} {CLAUSE}" for page in range(pages)])
+        results[f"extract_pdf_{pages}_pages"] = measure(lambda _: extract_text_from_pdf(pdf), iterations)
+    for size in txt_sizes:
+        data = legal_text(size).encode('utf-8')
+        results[f"extract_txt_{size // 1024}kb"] = measure(lambda _: extract_text_from_txt(data), iterations)
+    return results
+
+def bench_formatting(iterations: int, sizes: List[int]) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        text = legal_text(size)
+        results[f"format_paragraphs_{size // 1024}kb"] = measure(lambda _: format_text_with_paragraphs(text), iterations)
+    return results
+
+def bench_requests(requests: int, concurrency: int, document_size: int) -> Dict[str, Dict[str, float]]:
+    import app as app_module
+
+    app_module.app.config['TESTING'] = True
+    document = legal_text(document_size)
+
+    def upload(iteration):
+        # Each upload is a distinct document so the result cache never short-circuits the model
+        data = f"Agreement {iteration}\n\n{document}".encode('utf-8')
+        with app_module.app.test_client() as client:
+            response = client.post('/upload', data={
+                'file': (io.BytesIO(data), f'contract-{iteration}.txt'),
+                'action': 'summarize'
+            }, content_type='multipart/form-data')
+        return response.status_code == 200
+
+    clients = {}
+
+    def ask(iteration):
+        client = clients.get(iteration % concurrency)
+        if client is None:
+            client = clients[iteration % concurrency] = app_module.app.test_client()
+            client.post('/upload', data={
+                'file': (io.BytesIO(document.encode('utf-8')), 'contract.txt'),
+                'action': 'summarize'
+            }, content_type='multipart/form-data')
+        response = client.post('/ask_question', data={'question': f"What is the notice period? ({iteration})"})
+        return response.status_code == 200
+
+    # Prime one session per thread before measuring questions
+    for slot in range(concurrency):
+        ask(slot)
+
+    return {
+        f"upload_c{concurrency}": measure(upload, requests, concurrency),
+        f"ask_question_c{concurrency}": measure(ask, requests, concurrency)
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Find scenarios whose p95 latency regressed beyond the allowed fraction.
+
+    Args:
+        report: Current benchmark report
+        baseline: Earlier benchmark report
+        max_regression: Allowed slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        List[str]: Human-readable regression descriptions
+    """
+    regressions = []
+    for name, stats in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        change = stats["p95_ms"] / previous["p95_ms"] - 1
+        if change > max_regression:
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {stats['p95_ms']}ms (+{change:.0%})")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extraction, formatting and request throughput.")
+    parser.add_argument('--output', default='benchmark.json', help="JSON report path (default: benchmark.json)")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations and smaller documents")
+    parser.add_argument('--iterations', type=int, help="Iterations per extraction/formatting scenario")
+    parser.add_argument('--requests', type=int, help="Requests per endpoint scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients for endpoint scenarios")
+    parser.add_argument('--baseline', help="Earlier report to compare p95 latencies against")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Allowed p95 slowdown before failing (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    iterations = args.iterations or (5 if args.quick else 30)
+    requests = args.requests or (4 * args.concurrency if args.quick else 25 * args.concurrency)
+    pdf_pages = [1, 10] if args.quick else [1, 20, 200]
+    sizes = [10 * 1024, 100 * 1024] if args.quick else [10 * 1024, 100 * 1024, 1024 * 1024]
+
+    results = {}
+    results.update(bench_extraction(iterations, pdf_pages, sizes))
+    results.update(bench_formatting(iterations, sizes))
+    results.update(bench_requests(requests, args.concurrency, sizes[0]))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model_backend": model_backend.MODEL_BACKEND,
+            "fake_model_latency": model_backend.FAKE_MODEL_LATENCY,
+            "fake_model_response_chars": model_backend.FAKE_MODEL_RESPONSE_CHARS,
+            "iterations": iterations,
+            "requests": requests,
+            "concurrency": args.concurrency
+        },
+        "results": results
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:32} {stats['throughput']:>10.2f}/s  p50 {stats['p50_ms']:>9.3f}ms  "
+              f"p95 {stats['p95_ms']:>9.3f}ms  p99 {stats['p99_ms']:>9.3f}ms  errors {stats['errors']}")
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Startup-time benchmark.
+
+Measures, in fresh interpreter processes, how long importing the app and
+serving the first /healthz request take, and records per-module import
+cost from `python -X importtime`. Exits non-zero when the median time to
+the first health check response exceeds --max-seconds.
+
+Usage:
+    python -m benchmarks.startup --output startup.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+# Runs in the child process: import the app, then answer one health check
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/healthz')
+responded = time.perf_counter()
+print(json.dumps({"import_seconds": imported - started, "first_response_seconds": responded - started,
+                  "status": response.status_code}))
+"""
+
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(output: str) -> List[Dict[str, object]]:
+    """
+    Parse `python -X importtime` output.
+
+    Args:
+        output: stderr of the interpreter
+
+    Returns:
+        List[Dict[str, object]]: module, self_ms, cumulative_ms and depth per import
+    """
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                "module": module,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2
+            })
+    return modules
+
+def run_probe(env: Dict[str, str]) -> Dict[str, float]:
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - started
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark application startup and import cost.")
+    parser.add_argument('--output', default='startup.json', help="JSON report path (default: startup.json)")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh processes to start (default: 5)")
+    parser.add_argument('--top', type=int, default=25, help="Slowest imports to report (default: 25)")
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help="Fail if the median time to the first /healthz response exceeds this")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "startup-benchmark")
+
+    runs = [run_probe(env) for _ in range(args.runs)]
+
+    profile = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+    modules = parse_importtime(profile.stderr)
+    # Modules imported directly by this repository, plus the slowest imports overall
+    own_modules = [module for module in modules if module["module"].split('.')[0] in ('app', 'main', 'utils')]
+    slowest = sorted(modules, key=lambda module: module["self_ms"], reverse=True)[:args.top]
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "runs": args.runs
+        },
+        "startup": {
+            key: {
+                "median": round(statistics.median(run[key] for run in runs), 4),
+                "max": round(max(run[key] for run in runs), 4)
+            }
+            for key in ("import_seconds", "first_response_seconds", "process_seconds")
+        },
+        "heavy_modules_loaded": [name for name in ("google.genai", "PyPDF2", "httpx", "openai",
+                                                   "psycopg2", "sqlalchemy")
+                                 if any(module["module"] == name for module in modules)],
+        "own_modules": own_modules,
+        "slowest_imports": slowest
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    for key, stats in report["startup"].items():
+        print(f"{key:24} median {stats['median'] * 1000:8.1f}ms  max {stats['max'] * 1000:8.1f}ms")
+    print("Slowest imports (self time):")
+    for module in slowest[:10]:
+        print(f"  {module['module']:40} {module['self_ms']:8.1f}ms  (cumulative {module['cumulative_ms']:.1f}ms)")
+    print(f"Report written to {args.output}")
+
+    if report["startup"]["first_response_seconds"]["median"] > args.max_seconds:
+        print(f"REGRESSION startup exceeded {args.max_seconds}s")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import argparse
+import json
+import sys
+
+from utils.batch import BATCH_HISTORY_OWNER
+from utils.history import create_history_store, HISTORY_PAGE_SIZE
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Search the analysis history of batch runs, or show one document's analyses, as JSON."
+    )
+    parser.add_argument('query', nargs='?', help="Words to search document text and results for")
+    parser.add_argument('--owner', default=BATCH_HISTORY_OWNER,
+                        help=f"History owner to search, as given to batch.py --owner (default: {BATCH_HISTORY_OWNER})")
+    parser.add_argument('--action', help="Only search this source: 'document' for document text or an action name")
+    parser.add_argument('--page', type=int, default=1, help="Result page (default: 1)")
+    parser.add_argument('--per-page', type=int, default=HISTORY_PAGE_SIZE,
+                        help=f"Hits per page (default: {HISTORY_PAGE_SIZE})")
+    parser.add_argument('--document', help="Show the recorded analyses of this document ID instead of searching")
+    args = parser.parse_args(argv)
+
+    if not args.query and not args.document:
+        parser.error("a query or --document is required")
+
+    history = create_history_store()
+    if history is None:
+        parser.error("Analysis history is disabled; set HISTORY_BACKEND=sqlite")
+
+    if args.document:
+        document = history.document(args.document, args.owner)
+        if document is None:
+            print(f"Document {args.document} not found for owner '{args.owner}'", file=sys.stderr)
+            return 1
+        print(json.dumps(document, indent=2))
+        return 0
+
+    try:
+        results = history.search(args.query, args.page, args.per_page, args.action, args.owner)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
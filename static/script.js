@@ -98,6 +98,147 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Show loading state
             showLoadingState();
+
+            // Prefer streaming results, then a background job with polling;
+            // otherwise fall back to the regular synchronous form post
+            if (window.fetch && window.FormData && window.EventSource && uploadForm.dataset.documentsUrl) {
+                e.preventDefault();
+                submitStreamingAnalysis(uploadForm);
+            } else if (window.fetch && window.FormData && uploadForm.dataset.jobsUrl) {
+                e.preventDefault();
+                submitAnalysisJob(uploadForm);
+            }
+        });
+    }
+
+    function submitStreamingAnalysis(form) {
+        fetch(form.dataset.documentsUrl, {
+            method: 'POST',
+            body: new FormData(form)
+        })
+            .then(response => response.json().then(data => ({ status: response.status, data: data })))
+            .then(({ status, data }) => {
+                if (status === 201) {
+                    window.location.href = data.results_url;
+                } else {
+                    resetLoadingState();
+                    showAlert(data.error || 'Could not upload the document. Please try again.', 'error');
+                }
+            })
+            .catch(() => {
+                resetLoadingState();
+                showAlert('Could not reach the server. Please try again.', 'error');
+            });
+    }
+
+    function submitAnalysisJob(form) {
+        fetch(form.dataset.jobsUrl, {
+            method: 'POST',
+            body: new FormData(form)
+        })
+            .then(response => response.json().then(data => ({ status: response.status, data: data })))
+            .then(({ status, data }) => {
+                if (status === 202) {
+                    pollJobStatus(data.status_url, data.result_url);
+                } else {
+                    resetLoadingState();
+                    showAlert(data.error || 'Could not start the analysis. Please try again.', 'error');
+                }
+            })
+            .catch(() => {
+                resetLoadingState();
+                showAlert('Could not reach the server. Please try again.', 'error');
+            });
+    }
+
+    function pollJobStatus(statusUrl, resultUrl) {
+        fetch(statusUrl)
+            .then(response => response.json())
+            .then(job => {
+                if (job.status === 'done' || job.status === 'failed') {
+                    window.location.href = resultUrl;
+                } else if (job.error) {
+                    resetLoadingState();
+                    showAlert(job.error, 'error');
+                } else {
+                    setTimeout(() => pollJobStatus(statusUrl, resultUrl), 1000);
+                }
+            })
+            .catch(() => {
+                setTimeout(() => pollJobStatus(statusUrl, resultUrl), 2000);
+            });
+    }
+
+    // Progressive results page: render each field as the analysis streams in
+    const streamingResults = document.getElementById('streamingResults');
+    if (streamingResults && window.EventSource) {
+        const source = new EventSource(streamingResults.dataset.streamUrl);
+        const streamingStatus = document.getElementById('streamingStatus');
+        let finished = false;
+
+        const showStreamField = function(field, value, isHtml) {
+            const section = streamingResults.querySelector(`[data-stream-field="${field}"]`);
+            if (!section || !value) {
+                return;
+            }
+            const content = section.querySelector('[data-stream-content]');
+            if (isHtml) {
+                content.innerHTML = value;
+            } else {
+                content.textContent = value;
+            }
+            section.classList.remove('d-none');
+        };
+
+        const finishStream = function(errorMessage) {
+            finished = true;
+            source.close();
+            if (streamingStatus) {
+                streamingStatus.classList.add('d-none');
+            }
+            if (errorMessage) {
+                const errorBox = document.getElementById('streamingError');
+                errorBox.querySelector('[data-stream-error]').textContent = errorMessage;
+                errorBox.classList.remove('d-none');
+            }
+        };
+
+        source.addEventListener('value', function(e) {
+            const data = JSON.parse(e.data);
+            showStreamField(data.field, data.value, false);
+        });
+
+        source.addEventListener('item', function(e) {
+            const data = JSON.parse(e.data);
+            const list = streamingResults.querySelector(`[data-stream-list="${data.field}"]`);
+            if (!list || typeof data.value !== 'string') {
+                return;
+            }
+            const item = document.createElement('li');
+            item.className = 'mb-2';
+            const bullet = document.createElement('i');
+            bullet.className = `fas fa-circle ${list.dataset.itemClass} me-2`;
+            bullet.style.fontSize = '0.5em';
+            item.appendChild(bullet);
+            item.appendChild(document.createTextNode(data.value));
+            list.querySelector('[data-stream-items]').appendChild(item);
+            list.classList.remove('d-none');
+        });
+
+        source.addEventListener('done', function(e) {
+            // Swap streamed plain text for the server-formatted HTML
+            const result = JSON.parse(e.data);
+            ['simplified_text', 'summary', 'answer'].forEach(field => showStreamField(field, result[field], true));
+            finishStream(result.error);
+        });
+
+        source.addEventListener('error', function(e) {
+            if (finished) {
+                return;
+            }
+            // Server-sent error events carry data; connection failures do not
+            const message = e.data ? JSON.parse(e.data).error : 'Lost connection while analyzing the document. Please try again.';
+            finishStream(message);
         });
     }
 
@@ -118,6 +259,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const actionTexts = {
             'simplify': 'Simplify Document',
             'summarize': 'Summarize Document',
+            'analyze': 'Analyze Document',
             'question': 'Get Answer'
         };
         
@@ -135,6 +277,16 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    function resetLoadingState() {
+        if (submitBtn && submitText && loadingSpinner) {
+            submitBtn.disabled = false;
+            submitBtn.classList.remove('loading');
+            const selectedAction = document.querySelector('input[name="action"]:checked');
+            updateSubmitButtonText(selectedAction ? selectedAction.value : null);
+            loadingSpinner.classList.add('d-none');
+        }
+    }
+
     function showAlert(message, type = 'info') {
         // Create alert element
         const alertDiv = document.createElement('div');
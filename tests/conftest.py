@@ -0,0 +1,10 @@
+import os
+
+# Module-level stores are built when app is first imported. Keep test runs from writing
+# shared files under the temp directory, so runs cannot leak results into each other;
+# tests that need a store build one under tmp_path.
+os.environ['HISTORY_BACKEND'] = 'none'
+os.environ['SIMILARITY_INDEX_BACKEND'] = 'none'
+os.environ['EXTRACTION_STORE_BACKEND'] = 'none'
+os.environ['RESULT_CACHE_BACKEND'] = 'memory'
+os.environ['DOCUMENT_STORE_BACKEND'] = 'memory'
@@ -1,6 +1,8 @@
+import io
 import pytest
 import os
 import tempfile
+import app as app_module
 from app import app
 
 @pytest.fixture
@@ -74,4 +76,103 @@ def test_file_too_large_handler(client):
         error = RequestEntityTooLarge()
         response = app.handle_http_exception(error)
         # The handler should redirect, so we expect a 302 status code
-        assert response.status_code == 302
\ No newline at end of file
+        assert response.status_code == 302
+
+def test_session_stores_document_id_not_text(client, monkeypatch):
+    """Test that uploads keep only a document ID in the session cookie"""
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'ok'})
+    monkeypatch.setattr(app_module, 'answer_question', lambda text, question, clause_index=None: {'answer': text})
+
+    document_text = "This lease agreement is made between the landlord and the tenant. " * 50
+    data = {
+        'file': (io.BytesIO(document_text.encode('utf-8')), 'lease.txt'),
+        'action': 'summarize'
+    }
+    response = client.post('/upload', data=data)
+    assert response.status_code == 200
+
+    with client.session_transaction() as sess:
+        assert 'document_text' not in sess
+        assert sess['document_id'] == app_module.document_store.put(document_text.strip())
+
+    response = client.post('/ask_question', data={'question': 'Who are the parties?'})
+    assert response.status_code == 200
+    assert b'landlord and the tenant' in response.data
+
+def test_job_api_runs_analysis_in_background(client, monkeypatch):
+    """Test submitting an upload as a job, polling it and rendering the result"""
+    from utils.job_queue import JobQueue
+    monkeypatch.setattr(app_module, 'simplify_legal_text', lambda text: {'simplified_text': '<p>Plain words</p>'})
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=1, max_pending=2))
+
+    data = {
+        'file': (io.BytesIO(b"The lessee shall indemnify the lessor against all claims."), 'lease.txt'),
+        'action': 'simplify'
+    }
+    response = client.post('/jobs', data=data)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    assert app_module.job_queue.get(job_id).wait(timeout=5)
+    status = client.get(f'/jobs/{job_id}').get_json()
+    assert status['status'] == 'done'
+
+    response = client.get(status['result_url'])
+    assert response.status_code == 200
+    assert b'Plain words' in response.data
+    with client.session_transaction() as sess:
+        assert 'document_id' in sess
+
+def test_job_api_returns_429_when_queue_full(client, monkeypatch):
+    """Test backpressure when no more jobs can be queued"""
+    from utils.job_queue import JobQueue
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=1, max_pending=0))
+
+    data = {
+        'file': (io.BytesIO(b"Contract text"), 'contract.txt'),
+        'action': 'summarize'
+    }
+    response = client.post('/jobs', data=data)
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+
+def test_job_api_validates_request(client):
+    """Test that invalid job submissions are rejected with a JSON error"""
+    response = client.post('/jobs', data={'action': 'simplify'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No file selected'
+
+def test_full_analysis_renders_both_views(client, monkeypatch):
+    """Test that the analyze action renders summary and plain language tabs"""
+    monkeypatch.setattr(app_module, 'analyze_document', lambda text: {
+        'summary': '<p>Exec summary</p>',
+        'simplified_text': '<p>Plain words</p>',
+        'risks': [], 'obligations': [], 'key_points': []
+    })
+
+    data = {
+        'file': (io.BytesIO(b"Vendor agreement between the parties."), 'vendor.txt'),
+        'action': 'analyze'
+    }
+    response = client.post('/upload', data=data)
+    assert response.status_code == 200
+    assert b'Exec summary' in response.data
+    assert b'Plain words' in response.data
+    assert b'resultSummaryPane' in response.data
+
+def test_healthz_is_lightweight(client):
+    """Test that the health check answers without rendering templates"""
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.data == b'ok'
+    assert response.mimetype == 'text/plain'
+
+def test_import_defers_heavy_modules():
+    """Test that importing the app does not load the model SDK or PDF parser"""
+    import subprocess
+    import sys
+    probe = "import sys, app; print(','.join(m for m in ('google.genai', 'PyPDF2') if m in sys.modules))"
+    completed = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               env=dict(os.environ, GEMINI_API_KEY='dummy'))
+    assert completed.stdout.strip() == ''
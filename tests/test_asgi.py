@@ -0,0 +1,100 @@
+import asyncio
+import httpx
+import pytest
+import asgi
+from utils import ai_processor
+from utils.model_backend import FakeClient
+from utils.gemini_client import ResilientClient
+from utils.result_cache import ResultCache, MemoryResultCache
+
+LEASE = "This lease agreement is made between the landlord and the tenant for the premises. " * 20
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Route model calls through the resilient wrapper to a fake backend with some latency"""
+    fake = FakeClient(latency=0.2)
+    monkeypatch.setattr(ai_processor, 'client', ResilientClient(fake, requests_per_minute=0, tokens_per_minute=0))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    return fake.models
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_async_upload_and_question_render_results(fake_models):
+    """Test the async routes end to end, including the session cookie"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            response = await client.post('/upload', data={'action': 'summarize'},
+                                         files={'file': ('lease.txt', LEASE.encode(), 'text/plain')})
+            assert response.status_code == 200
+            assert 'Executive Summary' in response.text
+
+            response = await client.post('/ask_question', data={'question': 'Who are the parties?'})
+            assert response.status_code == 200
+            assert 'Answer' in response.text
+
+            # Other routes are served by the WSGI app
+            response = await client.get('/healthz')
+            assert response.text == 'ok'
+    run(scenario())
+    assert fake_models.calls == 2
+
+def test_async_uploads_run_concurrently(fake_models):
+    """Test that model waits overlap instead of holding a thread each"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            async def upload(number):
+                document = f"Agreement {number}. {LEASE}".encode()
+                return await client.post('/upload', data={'action': 'simplify'},
+                                         files={'file': (f'lease{number}.txt', document, 'text/plain')})
+            started = asyncio.get_running_loop().time()
+            responses = await asyncio.gather(*(upload(number) for number in range(20)))
+            return responses, asyncio.get_running_loop().time() - started
+
+    responses, elapsed = run(scenario())
+    assert all(response.status_code == 200 for response in responses)
+    assert fake_models.calls == 20
+    # 20 calls of 0.2s each would take 4s if they ran one after another
+    assert elapsed < 2
+
+def test_async_upload_validation_redirects():
+    """Test that validation errors behave like the WSGI route"""
+    async def scenario():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            response = await client.post('/upload', data={'action': 'summarize'},
+                                         files={'file': ('notes.docx', b'data', 'application/octet-stream')})
+            assert response.status_code == 302
+            assert response.headers['location'] == '/'
+    run(scenario())
+
+def test_async_routes_honor_forwarded_headers():
+    """Test that async views see the same proxied scheme and host as the WSGI app"""
+    scope = {'type': 'http', 'method': 'POST', 'path': '/upload', 'client': ('10.0.0.1', 5000),
+             'headers': [(b'host', b'internal:8000'), (b'x-forwarded-proto', b'https'),
+                         (b'x-forwarded-host', b'legal.example.com')]}
+    environ = asgi.proxy_fix(asgi.build_environ(scope, b''), None)
+    assert environ['wsgi.url_scheme'] == 'https'
+    assert environ['HTTP_HOST'] == 'legal.example.com'
+
+def test_async_action_matches_blocking_result_shape(monkeypatch):
+    """Test that async failures use the same error dicts as the blocking functions"""
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    class FailingModels:
+        async def generate_content(self, **kwargs):
+            raise ValueError("bad request")
+
+    class FailingClient:
+        aio = type('Aio', (), {'models': FailingModels()})()
+
+        class models:
+            @staticmethod
+            def generate_content(**kwargs):
+                raise ValueError("bad request")
+
+    monkeypatch.setattr(ai_processor, 'client', FailingClient())
+    async_result = run(ai_processor.run_action_async("Lease text", 'question', "Can I sublet?"))
+    assert async_result == ai_processor.answer_question("Lease text", "Can I sublet?")
@@ -0,0 +1,116 @@
+import io
+import os
+import json
+import tempfile
+from utils import batch
+from utils.batch import BatchRun, find_documents, read_completed
+
+def fake_summary(text):
+    if 'broken' in text:
+        return {'error': 'Failed to summarize document', 'summary': None}
+    return {'summary': f"<p>{text[:10]}</p>"}
+
+def write_documents(tmpdir, names):
+    paths = []
+    for name in names:
+        path = os.path.join(tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f"Agreement {name} between the parties.")
+        paths.append(path)
+    return paths
+
+def test_find_documents_walks_directories():
+    """Test that directories are searched for supported documents only"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.makedirs(os.path.join(tmpdir, 'leases'))
+        write_documents(tmpdir, ['a.txt', 'notes.docx'])
+        write_documents(os.path.join(tmpdir, 'leases'), ['b.TXT'])
+
+        found = find_documents([tmpdir])
+        assert [os.path.basename(path) for path in found] == ['a.txt', 'b.TXT']
+
+def test_batch_run_writes_records_and_resumes(monkeypatch):
+    """Test that records are written per document and a rerun skips successes"""
+    monkeypatch.setitem(batch.BATCH_ACTIONS, 'summarize', fake_summary)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_documents(tmpdir, ['one.txt', 'two.txt'])
+        output_path = os.path.join(tmpdir, 'results.jsonl')
+
+        first = BatchRun(output_path=output_path, extract_processes=0, concurrency=2)
+        records = first.run([(path, path) for path in paths])
+        assert sorted(record['document'] for record in records) == sorted(paths)
+        assert all(record['error'] is None for record in records)
+        assert read_completed(output_path) == set(paths)
+
+        extra = write_documents(tmpdir, ['three.txt'])
+        second = BatchRun(output_path=output_path, extract_processes=0)
+        records = second.run([(path, path) for path in paths + extra])
+        assert [record['document'] for record in records] == extra
+        assert second.progress == {'total': 1, 'completed': 1, 'skipped': 2}
+
+        with open(output_path, encoding='utf-8') as file:
+            assert len(file.readlines()) == 3
+
+def test_batch_run_records_failures(monkeypatch):
+    """Test that extraction and model failures become error records and are retried on resume"""
+    monkeypatch.setitem(batch.BATCH_ACTIONS, 'summarize', fake_summary)
+
+    records = BatchRun(extract_processes=0).run([
+        ('good.txt', b"Plain lease text"),
+        ('broken.txt', b"broken contract"),
+        ('empty.txt', b"")
+    ])
+    errors = {record['document']: record['error'] for record in records}
+    assert errors['good.txt'] is None
+    assert errors['broken.txt'] == 'Failed to summarize document'
+    assert errors['empty.txt']
+
+def test_batch_endpoint_reports_progress_and_results(monkeypatch):
+    """Test the HTTP batch API end to end"""
+    import app as app_module
+    from utils.job_queue import JobQueue
+
+    monkeypatch.setitem(batch.BATCH_ACTIONS, 'summarize', fake_summary)
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=1, max_pending=2))
+    app_module.app.config['TESTING'] = True
+
+    with app_module.app.test_client() as client:
+        response = client.post('/batch', data={
+            'action': 'summarize',
+            'files': [(io.BytesIO(b"Lease one"), 'one.txt'), (io.BytesIO(b"Lease two"), 'two.txt')]
+        }, content_type='multipart/form-data')
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+
+        app_module.job_queue.get(job_id).wait(5)
+        status = client.get(f'/batch/{job_id}').get_json()
+        assert status['status'] == 'done'
+        assert status['progress'] == {'total': 2, 'completed': 2, 'skipped': 0}
+
+        lines = client.get(f'/batch/{job_id}/results.jsonl').get_data(as_text=True).splitlines()
+        assert sorted(json.loads(line)['document'] for line in lines) == ['one.txt', 'two.txt']
+
+        assert client.post('/batch', data={'action': 'summarize'}).status_code == 400
+
+def test_cli_batch_history_is_searchable(tmp_path, monkeypatch, capsys):
+    """Test that command-line runs are saved for an owner the search CLI can query"""
+    import batch as batch_cli
+    import search_history
+    from utils.history import HistoryStore
+    monkeypatch.setitem(batch.BATCH_ACTIONS, 'summarize', fake_summary)
+    history = HistoryStore(str(tmp_path / "history.db"))
+    monkeypatch.setattr(batch_cli, 'create_history_store', lambda: history)
+    monkeypatch.setattr(search_history, 'create_history_store', lambda: history)
+    paths = write_documents(str(tmp_path), ['lease.txt'])
+
+    assert batch_cli.main(paths + ['--output', str(tmp_path / 'results.jsonl'), '--processes', '0',
+                                   '--owner', 'q3-review']) == 0
+    capsys.readouterr()
+
+    assert search_history.main(['--owner', 'q3-review', '--action', 'document', 'agreement']) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert [hit['filename'] for hit in results['results']] == ['lease.txt']
+
+    assert search_history.main(['agreement']) == 0
+    assert json.loads(capsys.readouterr().out)['total'] == 0
@@ -0,0 +1,30 @@
+from benchmarks.run import percentile, summarize, compare
+
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles"""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+def test_compare_flags_p95_regressions():
+    """Test that only scenarios slower than the allowed margin are reported"""
+    baseline = {'results': {'upload': summarize([0.1] * 10, 1.0), 'extract': summarize([0.01] * 10, 1.0)}}
+    report = {'results': {'upload': summarize([0.2] * 10, 1.0), 'extract': summarize([0.011] * 10, 1.0),
+                          'new_scenario': summarize([1.0], 1.0)}}
+    regressions = compare(report, baseline, 0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('upload')
+
+def test_parse_importtime_output():
+    """Test parsing of python -X importtime lines"""
+    from benchmarks.startup import parse_importtime
+    output = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |     utils.chunking\n"
+              "import time:      2000 |       5120 |   utils.ai_processor\n")
+    modules = parse_importtime(output)
+    assert [module['module'] for module in modules] == ['utils.chunking', 'utils.ai_processor']
+    assert modules[1]['self_ms'] == 2.0
+    assert modules[1]['cumulative_ms'] == 5.12
+    assert modules[0]['depth'] == 2
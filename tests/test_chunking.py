@@ -0,0 +1,100 @@
+import json
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.chunking import split_into_sections, chunk_text
+from utils.token_budget import count_tokens
+from utils.result_cache import ResultCache, MemoryResultCache
+from utils.similarity import SimilarityIndex
+
+SAMPLE_CONTRACT = """--- Page 1 ---
+SERVICE AGREEMENT
+1. Definitions
+In this Agreement the following terms apply.
+2. Term
+This Agreement renews automatically each year.
+--- Page 2 ---
+continued from the previous page.
+ARTICLE III Payment
+Fees are due within 30 days.
+3.1 Late payment incurs interest."""
+
+class ChunkEchoModels:
+    """Fake client.models that answers each chunk with a canned analysis"""
+
+    def __init__(self, failing_part=None):
+        self.calls = 0
+        self.failing_part = failing_part
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        prompt = kwargs['contents'][0].parts[0].text
+        part = prompt.split('(part ')[1].split(' ')[0]
+        if part == self.failing_part:
+            raise RuntimeError("quota exceeded")
+        return SimpleNamespace(text=json.dumps({
+            "summary": f"Summary of part {part}",
+            "risks": ["Automatic renewal", f"Risk from part {part}"],
+            "obligations": ["Pay fees on time"],
+            "key_points": []
+        }))
+
+def test_split_into_sections_tracks_pages_and_clauses():
+    """Test splitting on page markers and clause headings"""
+    sections = split_into_sections(SAMPLE_CONTRACT)
+    headings = [section.heading for section in sections]
+
+    assert "1. Definitions" in headings
+    assert "2. Term" in headings
+    assert "ARTICLE III Payment" in headings
+    assert "3.1 Late payment incurs interest." in headings
+    assert sections[0].page == 1
+    assert [s for s in sections if s.heading.startswith("ARTICLE III")][0].page == 2
+    assert "".join(section.text for section in sections).strip() == SAMPLE_CONTRACT.strip()
+
+def test_chunk_text_respects_budget():
+    """Test that chunks stay within the token budget and preserve all text"""
+    text = "\n".join(f"{i}. Clause {i} " + "obligation " * 40 for i in range(1, 60))
+    chunks = chunk_text(text, max_tokens=300)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks) == text
+
+    assert chunk_text("Short agreement.", max_tokens=300) == ["Short agreement."]
+
+def test_large_document_is_map_reduced(monkeypatch):
+    """Test that oversized documents are analyzed per chunk and merged"""
+    fake_models = ChunkEchoModels()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'CHUNK_MAX_TOKENS', 300)
+
+    text = "\n".join(f"{i}. Clause {i} " + "obligation " * 40 for i in range(1, 30))
+    result = ai_processor.summarize_document(text)
+
+    assert fake_models.calls > 1
+    assert result['risks'].count("Automatic renewal") == 1
+    assert "Risk from part 2" in result['risks']
+    assert result['obligations'] == ["Pay fees on time"]
+    assert result['summary'].index("part 1") < result['summary'].index("part 2")
+
+def test_partial_results_are_not_cached_or_indexed(monkeypatch):
+    """Test that a result with failed chunks is returned but retried on the next request"""
+    fake_models = ChunkEchoModels(failing_part='2')
+    similarity_index = SimilarityIndex()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'similarity_index', similarity_index)
+    monkeypatch.setattr(ai_processor, 'CHUNK_MAX_TOKENS', 300)
+
+    text = "\n".join(f"{i}. Clause {i} " + "obligation " * 40 for i in range(1, 30))
+    result = ai_processor.analyze_document(text)
+    assert result['partial'] is True
+    assert "could not be analyzed" in result['key_points'][-1]
+    assert len(similarity_index) == 0
+
+    calls = fake_models.calls
+    fake_models.failing_part = None
+    assert 'partial' not in ai_processor.summarize_document(text)
+    assert fake_models.calls > calls
+    assert len(similarity_index) == 1
@@ -0,0 +1,111 @@
+import time
+from utils import ai_processor
+from utils.context_cache import ContextCache
+from utils.document_store import MemoryDocumentStore, compute_document_id
+from utils.model_backend import FakeClient
+from utils.result_cache import ResultCache, MemoryResultCache
+
+CONTRACT = "\n".join(f"{i}. Clause {i}. The supplier shall deliver the goods and the buyer shall pay on time."
+                     for i in range(1, 80))
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def use_fake_backend(monkeypatch, **options):
+    fake_client = FakeClient(latency=0)
+    prompts = []
+    generate_content = fake_client.models.generate_content
+
+    def recording_generate_content(**kwargs):
+        prompts.append(kwargs['contents'][0].parts[0].text)
+        return generate_content(**kwargs)
+
+    fake_client.models.generate_content = recording_generate_content
+    cache = ContextCache(lambda: fake_client.caches, ai_processor.model_router.standard, ai_processor.QUESTION_SYSTEM_PROMPT,
+                         min_tokens=100, **options)
+    monkeypatch.setattr(ai_processor, 'client', fake_client)
+    monkeypatch.setattr(ai_processor, 'context_cache', cache)
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    return fake_client, cache, prompts
+
+def test_follow_up_questions_reuse_the_cached_context(monkeypatch):
+    """Test that a document is cached once and later questions send only the question"""
+    fake_client, cache, prompts = use_fake_backend(monkeypatch)
+
+    answers = [ai_processor.answer_question(CONTRACT, question)
+               for question in ("Who delivers?", "When is payment due?", "Can the buyer terminate?")]
+
+    assert fake_client.caches.created == 1
+    assert len(cache) == 1
+    assert prompts == ["Question: Who delivers?", "Question: When is payment due?",
+                       "Question: Can the buyer terminate?"]
+    assert all('error' not in answer for answer in answers)
+
+    # Documents below the model's minimum are sent inline as before
+    ai_processor.answer_question("1. Term. One year.", "How long?")
+    assert fake_client.caches.created == 1
+    assert "One year" in prompts[-1]
+
+def test_handles_are_extended_and_recreated_by_ttl(monkeypatch):
+    """Test that handles are extended past half their TTL and recreated after expiry"""
+    clock = Clock()
+    fake_client, cache, _ = use_fake_backend(monkeypatch, ttl=600, clock=clock)
+    updates = []
+    fake_client.caches.update = lambda name=None, config=None: updates.append(name)
+    document_id = compute_document_id(CONTRACT)
+
+    first = cache.handle(document_id, CONTRACT)
+    clock.now += 400
+    assert cache.handle(document_id, CONTRACT) == first
+    assert updates == [first]
+
+    clock.now += 601
+    assert cache.handle(document_id, CONTRACT) != first
+    assert fake_client.caches.created == 2
+
+def test_rejected_context_falls_back_to_sending_the_document(monkeypatch):
+    """Test that a context the backend no longer has is dropped and the question still answered"""
+    fake_client, cache, prompts = use_fake_backend(monkeypatch)
+    ai_processor.answer_question(CONTRACT, "Who delivers?")
+    fake_client.models.cached_contents.clear()
+
+    answer = ai_processor.answer_question(CONTRACT, "Who pays?")
+
+    assert 'error' not in answer
+    assert "The supplier shall deliver" in prompts[-1]
+    assert len(cache) == 0
+
+def test_eviction_deletes_the_cached_context(monkeypatch):
+    """Test that evicting a document from the store deletes its cached context"""
+    fake_client, cache, _ = use_fake_backend(monkeypatch)
+    store = MemoryDocumentStore(max_bytes=len(CONTRACT) + 10)
+    store.add_eviction_listener(cache.release)
+
+    document_id = store.put(CONTRACT)
+    cache.handle(document_id, CONTRACT)
+    assert len(fake_client.models.cached_contents) == 1
+
+    store.put(CONTRACT.replace("supplier", "vendor"))
+
+    deadline = time.monotonic() + 2
+    while fake_client.models.cached_contents and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_client.models.cached_contents == {}
+    assert len(cache) == 0
+
+def test_documents_within_the_inline_budget_are_not_cached(monkeypatch):
+    """Test that documents retrieval and the light model handle inline never get a cached context"""
+    min_tokens = ai_processor.context_cache.min_tokens
+    assert min_tokens >= ai_processor.RETRIEVAL_MIN_TOKENS
+    fake_client, _, prompts = use_fake_backend(monkeypatch)
+    monkeypatch.setattr(ai_processor, 'context_cache', ContextCache(
+        lambda: fake_client.caches, ai_processor.model_router.standard, ai_processor.QUESTION_SYSTEM_PROMPT,
+        min_tokens=min_tokens))
+
+    ai_processor.answer_question(CONTRACT, "Who delivers?")
+    assert fake_client.caches.created == 0
+    assert "The supplier shall deliver" in prompts[-1]
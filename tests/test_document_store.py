@@ -0,0 +1,106 @@
+import os
+import tempfile
+from utils import document_store
+from utils.document_store import (
+    compute_document_id,
+    create_document_store,
+    MemoryDocumentStore,
+    SQLiteDocumentStore,
+    TieredDocumentStore
+)
+
+def test_memory_store_roundtrip():
+    """Test storing and fetching a document by its content hash"""
+    store = MemoryDocumentStore(max_bytes=1024)
+    document_id = store.put("This agreement is made between the parties.")
+    assert document_id == compute_document_id("This agreement is made between the parties.")
+    assert store.get(document_id) == "This agreement is made between the parties."
+    assert store.get("unknown") is None
+
+def test_memory_store_evicts_least_recently_used():
+    """Test byte-size bounded LRU eviction"""
+    store = MemoryDocumentStore(max_bytes=250)
+    first = store.put("a" * 100)
+    second = store.put("b" * 100)
+    # Touch the first document so the second becomes least recently used
+    store.get(first)
+    third = store.put("c" * 100)
+
+    assert store.get(first) is not None
+    assert store.get(second) is None
+    assert store.get(third) is not None
+    assert store.total_bytes <= 250
+
+def test_sqlite_store_shared_between_instances():
+    """Test that separate store instances (e.g. workers) share documents on disk"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'documents.sqlite3')
+        writer = SQLiteDocumentStore(path)
+        reader = SQLiteDocumentStore(path)
+
+        document_id = writer.put("Shared contract text")
+        assert reader.get(document_id) == "Shared contract text"
+
+        reader.delete(document_id)
+        assert writer.get(document_id) is None
+
+def test_tiered_store_repopulates_memory():
+    """Test that the memory tier is filled from disk on a miss"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        disk = SQLiteDocumentStore(os.path.join(tmpdir, 'documents.sqlite3'))
+        document_id = disk.put("Lease agreement text")
+
+        store = TieredDocumentStore(MemoryDocumentStore(max_bytes=1024), disk)
+        assert store.memory.get(document_id) is None
+        assert store.get(document_id) == "Lease agreement text"
+        assert store.memory.get(document_id) == "Lease agreement text"
+
+def test_artifacts_are_evicted_with_document():
+    """Test that artifacts count toward the budget and leave with their document"""
+    store = MemoryDocumentStore(max_bytes=300)
+    first = store.put("a" * 100)
+    store.put_artifact(first, 'clause_index', "i" * 50)
+    assert store.get_artifact(first, 'clause_index') == "i" * 50
+    assert store.total_bytes == 150
+
+    store.put("b" * 100)
+    store.put("c" * 100)
+    assert store.get(first) is None
+    assert store.get_artifact(first, 'clause_index') is None
+
+def test_sqlite_artifacts_roundtrip():
+    """Test artifact storage in the shared SQLite store"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = SQLiteDocumentStore(os.path.join(tmpdir, 'documents.sqlite3'))
+        document_id = store.put("Contract text")
+        store.put_artifact(document_id, 'clause_index', '{"sections": []}')
+        assert store.get_artifact(document_id, 'clause_index') == '{"sections": []}'
+
+        store.delete(document_id)
+        assert store.get_artifact(document_id, 'clause_index') is None
+
+def test_disk_backends_are_size_bounded(monkeypatch, tmp_path):
+    """Test that the configured on-disk stores evict past DOCUMENT_STORE_DISK_MAX_BYTES"""
+    monkeypatch.setattr(document_store, 'DOCUMENT_STORE_PATH', str(tmp_path / 'documents.sqlite3'))
+    monkeypatch.setattr(document_store, 'DOCUMENT_STORE_DISK_MAX_BYTES', 250)
+    store = create_document_store('sqlite')
+    first = store.put("a" * 100)
+    store.put("b" * 100)
+    store.put("c" * 100)
+    assert store.get(first) is None
+    assert create_document_store('tiered').disk.max_bytes == 250
+
+def test_tiered_store_evicts_both_tiers_together(tmp_path):
+    """Test that artifacts count toward the disk budget and disk eviction also clears the memory tier"""
+    disk = SQLiteDocumentStore(str(tmp_path / 'documents.sqlite3'), max_bytes=250)
+    store = TieredDocumentStore(MemoryDocumentStore(max_bytes=1024), disk)
+    evicted = []
+    store.add_eviction_listener(lambda document_id, artifacts: evicted.append(document_id))
+
+    first = store.put("a" * 100)
+    store.put_artifact(first, 'clause_index', "i" * 100)
+    second = store.put("b" * 100)
+
+    assert evicted == [first]
+    assert store.get(first) is None
+    assert store.get(second) == "b" * 100
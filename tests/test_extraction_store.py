@@ -0,0 +1,117 @@
+import io
+import os
+from utils import extraction_store as extraction_module
+from utils.extraction_store import ExtractionStore, encode_artifact, extract_with_store
+from tests.pdf_fixtures import make_pdf
+
+TEXT = """--- Page 1 ---
+1. Term. The lease runs for twelve months.
+--- Page 2 ---
+2. Rent. The tenant pays 1 200 € per month — in advance.
+3. Deposit. A deposit of two months' rent is held.
+--- Page 4 ---
+4. Notices. Notices are sent by post."""
+
+def test_artifact_slices_pages_and_sections_without_copying(tmp_path):
+    """Test that stored artifacts give the full text plus zero-copy page and section views"""
+    store = ExtractionStore(str(tmp_path))
+    store.put('lease.txt', TEXT)
+
+    with store.get('lease.txt') as artifact:
+        assert artifact.text == TEXT
+        assert artifact.page_numbers == [1, 2, 4]
+        assert artifact.page_text(2) == "2. Rent. The tenant pays 1 200 € per month — in advance.\n" \
+                                         "3. Deposit. A deposit of two months' rent is held."
+        assert artifact.page_text(3) is None
+
+        view = artifact.page(4)
+        assert isinstance(view, memoryview)
+        assert bytes(view).decode('utf-8').strip() == "4. Notices. Notices are sent by post."
+        view.release()
+
+        assert artifact.section_count == 7
+        with artifact.section(4) as section:
+            assert bytes(section).decode('utf-8').startswith("3. Deposit.")
+
+    assert store.get('missing.txt') is None
+
+def test_repeat_upload_skips_parsing(tmp_path, monkeypatch):
+    """Test that identical bytes are extracted once and then served from the artifact"""
+    calls = []
+    real_extract = extraction_module.extract_text_from_stream
+
+    def counting_extract(stream, filename=None, mimetype=None):
+        calls.append(filename)
+        return real_extract(stream, filename, mimetype)
+
+    monkeypatch.setattr(extraction_module, 'extract_text_from_stream', counting_extract)
+    store = ExtractionStore(str(tmp_path))
+    pdf = make_pdf(["Indemnity applies.", "Arbitration is binding."])
+
+    first, key = extract_with_store(store, io.BytesIO(pdf), 'contract.pdf')
+    second, second_key = extract_with_store(store, io.BytesIO(pdf), 'renamed.pdf')
+
+    assert calls == ['contract.pdf']
+    assert second == first and second_key == key
+    with store.get(key) as artifact:
+        assert artifact.page_text(2) == "Arbitration is binding."
+
+    # The same bytes declared as text are parsed differently, so they get their own artifact
+    extract_with_store(store, io.BytesIO(b"Plain text lease terms."), 'lease.txt')
+    assert calls == ['contract.pdf', 'lease.txt']
+
+def test_store_evicts_least_recently_used(tmp_path):
+    """Test that the artifact directory is kept under its byte budget"""
+    size = len(encode_artifact(TEXT))
+    # Three artifacts pass the budget; trimming to the low-water mark removes one
+    store = ExtractionStore(str(tmp_path), max_bytes=size * 3 - 1)
+
+    store.put('a.txt', TEXT)
+    store.put('b.txt', TEXT)
+    os.utime(tmp_path / 'a.txt.ldx', (1, 1))
+    store.put('c.txt', TEXT)
+
+    assert sorted(os.listdir(tmp_path)) == ['b.txt.ldx', 'c.txt.ldx']
+
+def test_store_only_scans_once_over_budget(tmp_path, monkeypatch):
+    """Test that writes under the byte budget do not rescan the directory"""
+    import utils.extraction_store as extraction_store_module
+    size = len(encode_artifact(TEXT))
+    store = ExtractionStore(str(tmp_path), max_bytes=size * 10)
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(extraction_store_module.os, 'scandir', lambda path: scans.append(path) or real_scandir(path))
+
+    for name in 'abcdefghi':
+        store.put(f'{name}.txt', TEXT)
+    assert len(scans) == 1
+
+    store.put('j.txt', TEXT)
+    store.put('k.txt', TEXT)
+    assert len(scans) == 2
+    assert len(os.listdir(tmp_path)) == 9
+
+def test_page_endpoint_serves_pages(tmp_path, monkeypatch):
+    """Test that a stored document's pages can be fetched by number"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'extraction_store', ExtractionStore(str(tmp_path)))
+
+    with app_module.app.test_client() as client:
+        response = client.post('/documents', data={
+            'file': (io.BytesIO(make_pdf(["Payment is due monthly.", "Late fees apply."])), 'terms.pdf'),
+            'action': 'summarize'
+        })
+        document_id = response.get_json()['document_id']
+
+        page = client.get(f'/documents/{document_id}/pages/2')
+        assert page.status_code == 200
+        assert page.get_json()['text'] == "Late fees apply."
+        assert client.get(f'/documents/{document_id}/pages/9').status_code == 404
+
+        # Other sessions cannot read the document
+        with app_module.app.test_client() as other_client:
+            assert other_client.get(f'/documents/{document_id}/pages/2').status_code == 404
+
+        # Without the artifact the page is found in the stored text
+        monkeypatch.setattr(app_module, 'extraction_store', None)
+        assert client.get(f'/documents/{document_id}/pages/1').get_json()['text'] == "Payment is due monthly."
@@ -0,0 +1,145 @@
+import pytest
+from types import SimpleNamespace
+from google.genai import types
+from utils.gemini_client import (
+    ResilientClient,
+    ResilientModels,
+    CircuitBreaker,
+    TokenBucket,
+    GeminiUnavailableError
+)
+
+class FakeClock:
+    """Deterministic clock whose sleep advances time instantly"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class FlakyBackend:
+    """Local fake backend that fails a set number of times before succeeding"""
+
+    def __init__(self, failures, error_code=503):
+        self.failures = failures
+        self.error_code = error_code
+        self.calls = []
+
+    def generate_content(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) <= self.failures:
+            raise StatusError(self.error_code)
+        return SimpleNamespace(text='{"summary": "ok"}')
+
+    def generate_content_stream(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) <= self.failures:
+            raise StatusError(self.error_code)
+        yield SimpleNamespace(text='{"summary": ')
+        yield SimpleNamespace(text='"ok"}')
+
+def make_models(backend, clock, **policy):
+    policy.setdefault('requests_per_minute', 0)
+    policy.setdefault('tokens_per_minute', 0)
+    return ResilientModels(backend, clock=clock, sleep=clock.sleep, **policy)
+
+def test_retries_transient_errors_with_backoff():
+    """Test jittered exponential backoff on retryable errors"""
+    clock = FakeClock()
+    backend = FlakyBackend(failures=2)
+    models = make_models(backend, clock, max_retries=3, backoff_base=1, backoff_max=10)
+
+    config = types.GenerateContentConfig(system_instruction="Summarize")
+    response = models.generate_content(model="m", contents="Contract", config=config)
+    assert response.text == '{"summary": "ok"}'
+    assert len(backend.calls) == 3
+    assert all(0 <= delay <= 1 * 2 ** attempt for attempt, delay in enumerate(clock.sleeps))
+    # The remaining deadline is passed down as an HTTP timeout
+    assert backend.calls[0]['config'].http_options.timeout == 60000
+
+def test_does_not_retry_client_errors():
+    """Test that non-retryable errors surface immediately"""
+    clock = FakeClock()
+    backend = FlakyBackend(failures=1, error_code=400)
+    models = make_models(backend, clock)
+
+    with pytest.raises(StatusError):
+        models.generate_content(model="m", contents="Contract")
+    assert len(backend.calls) == 1
+
+def test_circuit_opens_and_recovers():
+    """Test that repeated failures open the circuit until the cooldown passes"""
+    clock = FakeClock()
+    backend = FlakyBackend(failures=2)
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=30, clock=clock)
+    models = make_models(backend, clock, max_retries=0, circuit_breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(StatusError):
+            models.generate_content(model="m", contents="Contract")
+    with pytest.raises(GeminiUnavailableError):
+        models.generate_content(model="m", contents="Contract")
+    assert len(backend.calls) == 2
+
+    clock.now += 31
+    assert models.generate_content(model="m", contents="Contract").text == '{"summary": "ok"}'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_token_bucket_waits_and_respects_deadline():
+    """Test that the rate limiter delays calls and gives up past the deadline"""
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)
+    bucket.acquire(60)
+    bucket.acquire(1)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    with pytest.raises(GeminiUnavailableError):
+        bucket.acquire(30, deadline=clock.now + 5)
+
+def test_stream_retries_before_first_chunk_and_releases_slot():
+    """Test streaming through the wrapper with the in-flight cap"""
+    clock = FakeClock()
+    backend = FlakyBackend(failures=1)
+    models = make_models(backend, clock, max_in_flight=1)
+
+    chunks = [chunk.text for chunk in models.generate_content_stream(model="m", contents="Contract")]
+    assert "".join(chunks) == '{"summary": "ok"}'
+    # The single in-flight slot was released after the stream finished
+    assert models.generate_content(model="m", contents="Contract").text == '{"summary": "ok"}'
+
+def test_cache_calls_share_the_model_call_policies():
+    """Test that client.caches calls are retried and counted by the same circuit breaker"""
+    clock = FakeClock()
+    created = []
+
+    class FlakyCaches:
+        def create(self, **kwargs):
+            created.append(kwargs)
+            if len(created) == 1:
+                raise StatusError(503)
+            return SimpleNamespace(name="cachedContents/1")
+
+    backend = SimpleNamespace(models=FlakyBackend(failures=0), caches=FlakyCaches())
+    client = ResilientClient(backend, requests_per_minute=0, tokens_per_minute=0, clock=clock, sleep=clock.sleep)
+
+    config = types.CreateCachedContentConfig(system_instruction="Answer questions", ttl="60s")
+    assert client.caches.create(model="m", config=config).name == "cachedContents/1"
+    assert len(created) == 2
+    assert created[0]['config'].http_options.timeout == 60000
+
+    client.models.circuit_breaker.state = CircuitBreaker.OPEN
+    client.models.circuit_breaker.opened_at = clock.now
+    with pytest.raises(GeminiUnavailableError):
+        client.caches.create(model="m", config=config)
+    assert len(created) == 2
@@ -0,0 +1,106 @@
+import io
+import os
+import pytest
+from utils import batch
+from utils.batch import BatchRun
+from utils.document_store import compute_document_id
+from utils.history import HistoryEntry, HistoryStore, fts_query
+
+def contract(number, renewal):
+    term = ("This agreement renews automatically for successive one-year terms unless either party "
+            "gives notice.") if renewal else "This agreement ends after one year."
+    return f"Vendor agreement {number} between the company and Supplier {number}. {term}"
+
+def entry(number, renewal, action='summarize', result=None):
+    text = contract(number, renewal)
+    return HistoryEntry(compute_document_id(text), f"vendor-{number}.txt", text, action, None,
+                        result or {'summary': f"<p>Supplier {number} services.</p>",
+                                   'risks': ['Auto-renewal clause'] if renewal else []})
+
+def test_fts_query_escapes_user_input():
+    """Test that punctuation, prefixes and OR are turned into valid FTS5 syntax"""
+    assert fts_query("auto-renewal") == '"auto renewal"'
+    assert fts_query('renew* OR "terminate"') == '"renew"* OR "terminate"'
+    assert fts_query("indemnity OR") == '"indemnity"'
+    with pytest.raises(ValueError):
+        fts_query(" -- ")
+
+def test_search_covers_documents_and_results(tmp_path):
+    """Test bulk recording, ranked paginated search, source filters and replacing an analysis"""
+    history = HistoryStore(str(tmp_path / "history.db"))
+    history.record_many([entry(number, renewal=number % 3 == 0) for number in range(1, 31)])
+
+    page = history.search("renews automatically", per_page=4)
+    assert page['total'] == 10 and len(page['results']) == 4
+    assert all(hit['source'] == 'document' for hit in page['results'])
+    assert '<mark>renews</mark> <mark>automatically</mark>' in page['results'][0]['snippet']
+    assert len(history.search("renews automatically", page=3, per_page=4)['results']) == 2
+
+    found = history.search("auto-renewal", action='summarize')
+    assert found['total'] == 10
+    assert {hit['filename'] for hit in found['results']} == {f"vendor-{n}.txt" for n in range(3, 31, 3)}
+
+    # Re-running an analysis replaces it instead of adding another hit
+    history.record(entry(3, True, result={'summary': '<p>Renegotiated</p>', 'risks': []}))
+    assert history.search("auto-renewal", action='summarize')['total'] == 9
+    recorded = history.document(compute_document_id(contract(3, True)))
+    assert [analysis['result']['summary'] for analysis in recorded['analyses']] == ['<p>Renegotiated</p>']
+    assert history.document('0' * 64) is None
+
+def test_uploads_and_batches_are_searchable(monkeypatch, tmp_path):
+    """Test that the app and batch runs record history and /search finds it"""
+    import app as app_module
+    history = HistoryStore(str(tmp_path / "history.db"))
+    monkeypatch.setattr(app_module, 'history', history)
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'Has an auto-renewal clause'})
+    monkeypatch.setitem(batch.BATCH_ACTIONS, 'summarize', lambda text: {'summary': 'Fixed term'})
+    client = app_module.app.test_client()
+
+    response = client.post('/upload', data={'file': (io.BytesIO(contract(1, True).encode()), 'vendor-1.txt'),
+                                            'action': 'summarize'})
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        owner = session['owner']
+    BatchRun(extract_processes=0, history=history, owner=owner).run([("vendor-2.txt", contract(2, False).encode())])
+
+    hits = client.get('/search', query_string={'q': 'auto-renewal'}).get_json()['results']
+    assert [(hit['filename'], hit['source']) for hit in hits] == [('vendor-1.txt', 'summarize')]
+    assert client.get(hits[0]['history_url']).get_json()['analyses'][0]['action'] == 'summarize'
+
+    hits = client.get('/search', query_string={'q': 'supplier', 'action': 'document'}).get_json()['results']
+    assert {hit['filename'] for hit in hits} == {'vendor-1.txt', 'vendor-2.txt'}
+    assert client.get('/search', query_string={'q': ''}).status_code == 400
+
+def test_history_is_private_to_its_session(monkeypatch, tmp_path):
+    """Test that other sessions can neither search nor read a session's documents"""
+    import app as app_module
+    history = HistoryStore(str(tmp_path / "history.db"))
+    monkeypatch.setattr(app_module, 'history', history)
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'Has an auto-renewal clause'})
+    owner_client = app_module.app.test_client()
+    owner_client.post('/upload', data={'file': (io.BytesIO(contract(1, True).encode()), 'vendor-1.txt'),
+                                       'action': 'summarize'})
+    history_url = owner_client.get('/search', query_string={'q': 'auto-renewal'}).get_json()['results'][0]['history_url']
+
+    other_client = app_module.app.test_client()
+    assert other_client.get('/search', query_string={'q': 'auto-renewal'}).status_code == 404
+    assert other_client.get(history_url).status_code == 404
+    other_client.post('/upload', data={'file': (io.BytesIO(contract(2, False).encode()), 'vendor-2.txt'),
+                                       'action': 'summarize'})
+    assert other_client.get('/search', query_string={'q': 'renews', 'action': 'document'}).get_json()['total'] == 0
+    assert other_client.get(history_url).status_code == 404
+
+def test_documents_expire_and_the_database_is_private(tmp_path):
+    """Test the retention period and that the database file is only readable by its user"""
+    clock = [1000.0]
+    history = HistoryStore(str(tmp_path / "history.db"), retention_days=1, clock=lambda: clock[0])
+    history.record(entry(1, True))
+    assert os.stat(tmp_path / "history.db").st_mode & 0o777 == 0o600
+
+    clock[0] += 86400 + 1
+    assert history.search("renews automatically")['total'] == 0
+    assert history.document(compute_document_id(contract(1, True))) is None
+
+    history.record(entry(2, True))
+    assert history.search("renews automatically")['total'] == 1
+    assert history.search("supplier", action='document')['results'][0]['filename'] == "vendor-2.txt"
@@ -0,0 +1,54 @@
+import threading
+import pytest
+from utils.job_queue import JobQueue, Job, QueueFullError
+
+def test_job_runs_in_background():
+    """Test that submitted work completes and exposes its result"""
+    queue = JobQueue(workers=2, max_pending=4)
+    try:
+        job = queue.submit(lambda a, b: a + b, 2, 3)
+        assert job.wait(timeout=5)
+        assert job.status == Job.DONE
+        assert job.result == 5
+        assert queue.get(job.id) is job
+    finally:
+        queue.shutdown()
+
+def test_failed_job_records_error():
+    """Test that exceptions mark the job as failed"""
+    queue = JobQueue(workers=1, max_pending=1)
+    try:
+        def fail():
+            raise ValueError("bad document")
+        job = queue.submit(fail)
+        assert job.wait(timeout=5)
+        assert job.status == Job.FAILED
+        assert "bad document" in job.error
+    finally:
+        queue.shutdown()
+
+def test_queue_applies_backpressure():
+    """Test that submissions beyond max_pending are rejected"""
+    queue = JobQueue(workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        job = queue.submit(release.wait, 5)
+        with pytest.raises(QueueFullError):
+            queue.submit(lambda: None)
+        release.set()
+        assert job.wait(timeout=5)
+        # Capacity is released once the job finishes
+        assert queue.submit(lambda: None).wait(timeout=5)
+    finally:
+        release.set()
+        queue.shutdown()
+
+def test_pruning_while_jobs_finish():
+    """Test that submissions pruning expired jobs never see a finished job without finished_at"""
+    queue = JobQueue(workers=4, max_pending=1000, result_ttl=0)
+    try:
+        jobs = [queue.submit(lambda: None) for _ in range(500)]
+        assert all(job.wait(timeout=5) for job in jobs)
+        assert all(job.finished_at is not None for job in jobs)
+    finally:
+        queue.shutdown()
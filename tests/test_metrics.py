@@ -0,0 +1,73 @@
+import io
+import pytest
+from app import app
+from utils.metrics import Counter, Histogram, stage, start_trace, finish_trace, STAGE_SECONDS
+
+@pytest.fixture
+def client():
+    """Create a test client for the Flask application"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_counter_and_histogram_exposition():
+    """Test the Prometheus text format for labelled metrics"""
+    counter = Counter('lookups_total', "Lookups", ('result',), registry=[])
+    counter.inc(result='hit')
+    counter.inc(2, result='miss')
+    assert counter.render().splitlines() == [
+        '# HELP lookups_total Lookups',
+        '# TYPE lookups_total counter',
+        'lookups_total{result="hit"} 1',
+        'lookups_total{result="miss"} 2'
+    ]
+
+    histogram = Histogram('latency_seconds', "Latency", ('action',), buckets=(0.1, 1), registry=[])
+    histogram.observe(0.05, action='summarize')
+    histogram.observe(0.5, action='summarize')
+    lines = histogram.render().splitlines()
+    assert 'latency_seconds_bucket{action="summarize",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{action="summarize",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{action="summarize",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{action="summarize"} 2' in lines
+
+def test_stages_are_collected_into_the_request_trace():
+    """Test that stage spans land in both the trace and the stage histogram"""
+    before = STAGE_SECONDS.count(endpoint='unit', stage='extract')
+    start_trace('unit')
+    with stage('extract'):
+        pass
+    with stage('render'):
+        pass
+    trace = finish_trace(200)
+
+    assert [name for name, _ in trace.spans] == ['extract', 'render']
+    assert trace.server_timing().startswith('extract;dur=')
+    assert STAGE_SECONDS.count(endpoint='unit', stage='extract') == before + 1
+    assert finish_trace(200) is None
+
+def test_upload_reports_stage_timing_and_metrics(client, monkeypatch, tmp_path):
+    """Test that uploads expose Server-Timing spans and feed /metrics"""
+    import app as app_module
+    from utils.extraction_store import ExtractionStore
+    from utils.history import HistoryStore
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'ok'})
+    # A fresh artifact directory, so the upload is really extracted
+    monkeypatch.setattr(app_module, 'extraction_store', ExtractionStore(str(tmp_path)))
+    monkeypatch.setattr(app_module, 'history', HistoryStore(str(tmp_path / 'history.db')))
+
+    response = client.post('/upload', data={
+        'file': (io.BytesIO(b"This services agreement is made between the parties. " * 20), 'services.txt'),
+        'action': 'summarize'
+    })
+    assert response.status_code == 200
+    stages = [span.split(';')[0] for span in response.headers['Server-Timing'].split(', ')]
+    assert stages == ['upload', 'extract', 'store', 'index', 'scan', 'analyze', 'history', 'render']
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    body = metrics.get_data(as_text=True)
+    assert 'app_stage_seconds_count{endpoint="upload_file",stage="extract"}' in body
+    assert 'document_size_bytes_count{file_type="txt"}' in body
+    assert 'extraction_cache_lookups_total{result="miss"}' in body
+    assert 'app_request_seconds_count{endpoint="upload_file",status="200"}' in body
@@ -0,0 +1,35 @@
+import json
+import pytest
+from utils import ai_processor
+from utils.model_backend import FakeModels, FakeClient, create_model_client
+from utils.result_cache import ResultCache, MemoryResultCache
+
+def test_fake_responses_are_deterministic_and_sized():
+    """Test that the fake backend answers identically for identical prompts"""
+    models = FakeModels(latency=0, response_chars=3000)
+    first = models.generate_content(contents="Lease text").text
+    assert first == models.generate_content(contents="Lease text").text
+    assert first != models.generate_content(contents="Other lease").text
+    assert abs(len(first) - 3000) < 100
+    assert set(json.loads(first)) >= {'summary', 'simplified_text', 'answer', 'risks', 'relevant_clauses'}
+
+def test_fake_stream_matches_blocking_response():
+    """Test that streamed chunks reassemble into the blocking response"""
+    models = FakeModels(latency=0, stream_chunks=5)
+    chunks = [chunk.text for chunk in models.generate_content_stream(contents="NDA text")]
+    assert len(chunks) == 5
+    assert "".join(chunks) == models.generate_content(contents="NDA text").text
+
+def test_fake_backend_drives_ai_processor(monkeypatch):
+    """Test that every action produces a result against the fake backend"""
+    monkeypatch.setattr(ai_processor, 'client', FakeClient(latency=0))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    assert ai_processor.summarize_document("Service agreement")['summary']
+    assert ai_processor.simplify_legal_text("Service agreement")['simplified_text']
+    assert ai_processor.answer_question("Service agreement", "Who pays?")['answer']
+
+def test_unknown_backend_is_rejected():
+    """Test that a misconfigured backend fails loudly"""
+    with pytest.raises(ValueError):
+        create_model_client('other')
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.metrics import MODEL_FALLBACKS
+from utils.model_router import ModelRouter, latency_budget, parse_latency_budget, set_latency_budget
+from utils.result_cache import ResultCache, MemoryResultCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TieredModels:
+    """Stand-in for client.models that records the model of each call and fails for some"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.models = []
+
+    def generate_content(self, model=None, **kwargs):
+        self.models.append(model)
+        if model in self.failing:
+            raise RuntimeError(f"{model} is overloaded")
+        return SimpleNamespace(text='{"answer": "Yes", "relevant_clauses": [], "risks": [], "recommendations": []}')
+
+def test_routes_by_action_size_budget_and_failures():
+    """Test tier choice for small and large prompts, under a latency budget and after a failure"""
+    clock = Clock()
+    router = ModelRouter(standard='standard', light='light', light_max_tokens=4000, cooldown=30, clock=clock)
+
+    assert router.route('question', 500).models == ('light', 'standard')
+    assert router.route('summarize', 20000).models == ('standard', 'light')
+    assert router.route('analyze', 500).reason == 'standard'
+    assert router.route('question', 500, pinned='standard').models == ('standard',)
+    assert ModelRouter(standard='standard', light='').route('question', 500).models == ('standard',)
+
+    # Standard calls take ~6s per 1000 tokens, light ones ~1s: a 5s budget moves a large summary to light
+    for _ in range(10):
+        router.record_success('standard', 20000, 120)
+        router.record_success('light', 20000, 20)
+    assert router.predict('standard', 20000) == 120
+    assert router.route('summarize', 20000, budget=60) == (('light', 'standard'), 'budget')
+    assert router.route('summarize', 20000, budget=300).reason == 'standard'
+
+    # A failed tier is only a fallback until its cooldown passes
+    router.record_failure('light')
+    assert router.route('question', 500) == (('standard', 'light'), 'cooldown')
+    clock.now += 31
+    assert router.route('question', 500).models == ('light', 'standard')
+
+def test_failed_calls_fall_back_to_the_other_tier(monkeypatch):
+    """Test that a failing light model is retried on the standard one and then avoided"""
+    fake_models = TieredModels(failing={'light'})
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'model_router', ModelRouter(standard='standard', light='light'))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    before = MODEL_FALLBACKS.value(action='question', model='light')
+
+    assert ai_processor.answer_question("Short lease text", "Can I sublet?")['answer'] == "<p>Yes</p>"
+    assert fake_models.models == ['light', 'standard']
+    assert MODEL_FALLBACKS.value(action='question', model='light') == before + 1
+
+    ai_processor.answer_question("Short lease text", "Can I keep a pet?")
+    assert fake_models.models[2:] == ['standard']
+
+def test_latency_budget_header():
+    """Test that X-Latency-Budget sets the budget of the request's model calls"""
+    from app import app
+    assert parse_latency_budget("2.5") == 2.5
+    assert parse_latency_budget("soon") is None and parse_latency_budget("-1") is None
+    assert parse_latency_budget("inf") is None
+
+    with app.test_request_context('/', headers={'X-Latency-Budget': '3'}):
+        app.preprocess_request()
+        assert latency_budget() == 3.0
+    set_latency_budget(None)
+    assert latency_budget() is None
@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+import app as app_module
+from utils import ai_processor
+from utils.model_backend import FakeModels
+from utils.result_cache import ResultCache, MemoryResultCache
+
+LEASE = "This lease agreement is made between the landlord and the tenant. Rent is due monthly. " * 20
+
+CHECKLIST = [f"Question {number} about the lease?" for number in range(1, 13)]
+
+def use_fake_models(monkeypatch):
+    fake_models = FakeModels(latency=0)
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    return fake_models
+
+def test_question_list_is_answered_in_sub_batches(monkeypatch):
+    """Test that a checklist costs one call per sub-batch and each answer is cached for reuse"""
+    fake_models = use_fake_models(monkeypatch)
+    monkeypatch.setattr(ai_processor, 'QUESTION_BATCH_SIZE', 5)
+
+    results = ai_processor.answer_questions(LEASE, CHECKLIST)
+
+    assert fake_models.calls == 3
+    assert len(results) == len(CHECKLIST)
+    assert all('error' not in result and result['risks'] for result in results)
+    assert "Answer to Q2" in results[1]['answer'] and "Answer to Q2" in results[6]['answer']
+    assert results[1]['answer'] != results[6]['answer']
+
+    # Answers are reused by later lists and by single questions
+    assert ai_processor.answer_questions(LEASE, CHECKLIST[:3]) == results[:3]
+    assert ai_processor.answer_question(LEASE, CHECKLIST[4]) == results[4]
+    assert fake_models.calls == 3
+
+def test_skipped_question_is_asked_alone(monkeypatch):
+    """Test that a question missing from the model's answers falls back to a single-question call"""
+    prompts = []
+
+    def generate_content(contents=None, config=None, **kwargs):
+        prompt = contents[0].parts[0].text
+        prompts.append(prompt)
+        if '[Q1]' in prompt:
+            response = {'answers': [{'question_id': 'Q1', 'answer': 'Monthly', 'risks': ['Late fees']}]}
+        else:
+            response = {'answer': 'The landlord', 'relevant_clauses': [], 'risks': [], 'recommendations': []}
+        return SimpleNamespace(text=json.dumps(response))
+
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    results = ai_processor.answer_questions(LEASE, ["When is rent due?", "Who is the lessor?"])
+
+    assert len(prompts) == 2 and prompts[1].endswith("Question: Who is the lessor?")
+    assert results[0] == {'answer': '<p>Monthly</p>', 'relevant_clauses': [], 'risks': ['Late fees'],
+                          'recommendations': []}
+    assert results[1]['answer'] == '<p>The landlord</p>'
+
+def test_ask_questions_route(monkeypatch):
+    """Test the JSON and form variants of the checklist endpoint"""
+    fake_models = use_fake_models(monkeypatch)
+    document_id = app_module.document_store.put(LEASE)
+    client = app_module.app.test_client()
+
+    # Documents outside the session cannot be asked about, even by ID
+    response = client.post('/ask_questions', json={'questions': CHECKLIST[:3], 'document_id': document_id})
+    assert response.status_code == 404
+    assert fake_models.calls == 0
+
+    with client.session_transaction() as sess:
+        sess['document_id'] = document_id
+    response = client.post('/ask_questions', json={'questions': CHECKLIST[:3] + ["", CHECKLIST[0]],
+                                                   'document_id': document_id})
+    assert response.status_code == 200
+    answers = response.get_json()['answers']
+    assert [answer['question'] for answer in answers] == CHECKLIST[:3]
+    assert fake_models.calls == 1
+
+    response = client.post('/ask_questions', data={'questions': "\n".join(CHECKLIST[:2])})
+    assert response.status_code == 200
+    assert CHECKLIST[1].encode() in response.data
+
+    assert client.post('/ask_questions', json={'questions': [], 'document_id': document_id}).status_code == 400
+    assert client.post('/ask_questions', json={'questions': CHECKLIST, 'document_id': 'unknown'}).status_code == 404
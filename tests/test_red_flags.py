@@ -0,0 +1,86 @@
+import io
+import json
+import threading
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.red_flags import prioritize_chunks, scan_red_flags, summarize_red_flags
+from utils.result_cache import ResultCache, MemoryResultCache
+
+CONTRACT = """--- Page 1 ---
+1. Term. This Agreement shall renew automatically for successive renewal terms of one year.
+2. Fees. The Customer pays the fees within 30 days.
+--- Page 2 ---
+3. Indemnity. The Customer shall indemnify and hold the Provider harmless against all claims.
+4. Disputes. Any dispute shall be resolved by binding
+arbitration, and the Customer waives any right to a jury trial.
+5. Changes. The Provider may amend these terms at any time."""
+
+def test_scan_finds_red_flags_with_pages_and_offsets():
+    """Test that lexicon hits carry their category, page and exact character span"""
+    hits = scan_red_flags(CONTRACT)
+    categories = [hit.category for hit in hits]
+
+    assert categories[0] == 'auto_renewal'
+    assert {'auto_renewal', 'indemnification', 'arbitration', 'jury_waiver', 'unilateral_amendment'} <= set(categories)
+    assert [hit.start for hit in hits] == sorted(hit.start for hit in hits)
+
+    arbitration = next(hit for hit in hits if hit.category == 'arbitration')
+    assert arbitration.page == 2
+    assert arbitration.text == "binding arbitration"
+    assert CONTRACT[arbitration.start:arbitration.end] == "binding\narbitration"
+    assert "binding arbitration" in arbitration.snippet
+    assert next(hit for hit in hits if hit.category == 'auto_renewal').page == 1
+
+    assert scan_red_flags("The parties agree to meet monthly to review the project plan.") == []
+
+def test_summary_groups_by_category_most_severe_first():
+    """Test that the summary counts hits per category and lists high severity first"""
+    text = CONTRACT + "\n6. Late payments incur a late fee. A second late fee applies after 60 days."
+    summary = summarize_red_flags(scan_red_flags(text))
+
+    late_fees = next(group for group in summary if group['category'] == 'late_fees')
+    assert late_fees['count'] == 2
+    assert late_fees['pages'] == [2]
+    assert summary[-1]['severity'] == 'low'
+    assert summary[0]['severity'] == 'high'
+    json.dumps(summary)
+
+def test_flagged_chunks_are_analyzed_first_but_merged_in_order(monkeypatch):
+    """Test that map-reduce sends red-flag chunks to the model first and keeps document order"""
+    calls = []
+    lock = threading.Lock()
+
+    def generate_content(contents=None, **kwargs):
+        prompt = contents[0].parts[0].text
+        part = prompt.split('(part ')[1].split(' ')[0]
+        with lock:
+            calls.append(part)
+        return SimpleNamespace(text=json.dumps({'summary': f"Summary of part {part}", 'risks': []}))
+
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'CHUNK_PARALLELISM', 1)
+
+    chunks = ["Definitions and interpretation.", "The Customer shall indemnify the Provider.",
+              "Notices are sent by email.", "Binding arbitration applies; liquidated damages are payable."]
+    assert prioritize_chunks(chunks) == [3, 1, 0, 2]
+
+    result = ai_processor.analyze_in_chunks(ai_processor.SUMMARIZE_SYSTEM_PROMPT, chunks, ('summary',))
+
+    assert calls == ['4', '2', '1', '3']
+    assert result['summary'].index("part 1") < result['summary'].index("part 2") < result['summary'].index("part 4")
+
+def test_results_page_shows_quick_scan(monkeypatch):
+    """Test that the upload results page renders the local red-flag scan"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'ok'})
+
+    with app_module.app.test_client() as client:
+        response = client.post('/upload', data={
+            'file': (io.BytesIO(CONTRACT.encode('utf-8')), 'contract.txt'),
+            'action': 'summarize'
+        })
+
+    assert response.status_code == 200
+    assert b'Quick Scan' in response.data
+    assert b'Mandatory arbitration' in response.data
@@ -0,0 +1,109 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.result_cache import (
+    make_cache_key,
+    MemoryResultCache,
+    SQLiteResultCache,
+    ResultCache
+)
+
+class FakeModels:
+    """Stand-in for client.models that counts generate_content calls"""
+
+    def __init__(self, text=None, exception=None):
+        self.text = text
+        self.exception = exception
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        if self.exception:
+            raise self.exception
+        return SimpleNamespace(text=self.text)
+
+def test_cache_key_normalizes_question():
+    """Test that trivial question variations share a key"""
+    key = make_cache_key('abc', 'question', 'What is the notice period?', 'model', '1')
+    assert key == make_cache_key('abc', 'question', '  what is the   NOTICE period ', 'model', '1')
+    assert key != make_cache_key('abc', 'question', 'What is the notice period?', 'model', '2')
+    assert key != make_cache_key('abd', 'question', 'What is the notice period?', 'model', '1')
+
+def test_memory_cache_ttl_and_eviction():
+    """Test expiry and entry-count bounded eviction"""
+    cache = MemoryResultCache(max_entries=2, ttl=60)
+    cache.set('a', {'summary': 'A'})
+    cache.set('b', {'summary': 'B'})
+    cache.set('c', {'summary': 'C'})
+    assert cache.get('a') is None
+    assert cache.get('c') == {'summary': 'C'}
+
+    cache.set('expired', {'summary': 'old'}, expires_at=0)
+    assert cache.get('expired') is None
+
+def test_disk_tier_backfills_memory():
+    """Test that results written by one worker are served to another"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'results.sqlite3')
+        writer = ResultCache(MemoryResultCache(), SQLiteResultCache(path))
+        reader = ResultCache(MemoryResultCache(), SQLiteResultCache(path))
+
+        writer.set('key', {'summary': 'Shared'})
+        assert reader.get('key') == {'summary': 'Shared'}
+        assert reader.memory.get('key') == {'summary': 'Shared'}
+
+def test_error_results_are_not_cached():
+    """Test that error dicts never enter the cache"""
+    cache = ResultCache(MemoryResultCache())
+    cache.set('key', {'error': 'Failed to summarize document', 'summary': None})
+    assert cache.get('key') is None
+
+def test_summarize_document_uses_cache(monkeypatch):
+    """Test that repeat summaries of the same document skip the model call"""
+    fake_models = FakeModels(text='{"summary": "Short summary", "risks": [], "obligations": [], "key_points": []}')
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    first = ai_processor.summarize_document("Standard NDA text")
+    second = ai_processor.summarize_document("Standard NDA text")
+    assert first == second
+    assert fake_models.calls == 1
+
+def test_failed_calls_are_retried(monkeypatch):
+    """Test that an error result does not poison the cache"""
+    fake_models = FakeModels(exception=RuntimeError("quota exceeded"))
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    assert 'error' in ai_processor.answer_question("Lease text", "Can I sublet?")
+    assert 'error' in ai_processor.answer_question("Lease text", "Can I sublet?")
+    # Each request tries every model tier before giving up
+    assert fake_models.calls == 2 * len(ai_processor.model_router.models)
+
+def test_full_analysis_seeds_single_view_results(monkeypatch):
+    """Test that one analyze call also answers later simplify and summarize requests"""
+    fake_models = FakeModels(text='{"summary": "Exec summary", "simplified_text": "Plain words", '
+                                  '"risks": ["Auto-renewal"], "obligations": [], "key_points": []}')
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    result = ai_processor.analyze_document("Vendor agreement text")
+    assert result['summary'] == "<p>Exec summary</p>"
+    assert result['simplified_text'] == "<p>Plain words</p>"
+
+    assert ai_processor.summarize_document("Vendor agreement text")['summary'] == "<p>Exec summary</p>"
+    assert ai_processor.simplify_legal_text("Vendor agreement text")['risks'] == ["Auto-renewal"]
+    assert fake_models.calls == 1
+
+def test_disk_tier_trims_least_recently_used_entries(tmp_path):
+    """Test that the disk tier is trimmed below its limit once it overflows"""
+    cache = SQLiteResultCache(str(tmp_path / 'results.sqlite3'), max_entries=10)
+    for number in range(10):
+        cache.set(f'key-{number}', {'summary': str(number)})
+    cache.get('key-0')
+    cache.set('key-10', {'summary': '10'})
+
+    assert cache.get('key-0') == {'summary': '0'}
+    assert cache.get('key-1') is None and cache.get('key-2') is None
+    assert cache.get('key-10') == {'summary': '10'}
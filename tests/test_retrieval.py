@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.retrieval import ClauseIndex, tokenize
+from utils.result_cache import ResultCache, MemoryResultCache
+
+def make_contract(filler_clauses=40):
+    clauses = [f"{i}. General provision {i}. " + "The parties agree to cooperate in good faith. " * 20
+               for i in range(1, filler_clauses)]
+    clauses.append(f"{filler_clauses}. Termination. Either party may terminate this agreement "
+                   "with ninety days written notice of termination.")
+    clauses.append(f"{filler_clauses + 1}. Governing Law. This agreement is governed by the laws of Delaware.")
+    return "--- Page 1 ---\n" + "\n".join(clauses)
+
+class PromptRecordingModels:
+    """Fake client.models that records the last prompt it received"""
+
+    def __init__(self):
+        self.prompt = None
+
+    def generate_content(self, **kwargs):
+        self.prompt = kwargs['contents'][0].parts[0].text
+        return SimpleNamespace(text=json.dumps({"answer": "Ninety days", "relevant_clauses": ["[S40] Termination"]}))
+
+def test_tokenize_drops_stopwords_and_plurals():
+    """Test term normalization"""
+    assert tokenize("The Notices of Termination") == ["notice", "termination"]
+
+def test_index_ranks_relevant_clause_first():
+    """Test BM25 ranking and JSON round trip"""
+    text = make_contract()
+    index = ClauseIndex.from_json(ClauseIndex.build(text).to_json())
+
+    top = index.retrieve(text, "How much notice is needed for termination?", k=1)
+    assert len(top) == 1
+    assert "ninety days written notice" in top[0].text
+    assert top[0].page == 1
+
+    assert index.retrieve(text, "zzz unrelated", k=3) == []
+
+def test_long_document_question_sends_only_relevant_sections(monkeypatch):
+    """Test that questions about long documents send retrieved sections only"""
+    fake_models = PromptRecordingModels()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'RETRIEVAL_MIN_TOKENS', 500)
+    monkeypatch.setattr(ai_processor, 'RETRIEVAL_TOP_K', 2)
+
+    text = make_contract()
+    result = ai_processor.answer_question(text, "Which state's law governs?", ClauseIndex.build(text))
+
+    assert result['answer'] == "<p>Ninety days</p>"
+    assert "laws of Delaware" in fake_models.prompt
+    assert len(fake_models.prompt) < len(text) / 4
+    assert "[S" in fake_models.prompt
+
+def test_oversized_best_section_is_trimmed_to_the_budget(monkeypatch):
+    """Test that a document that is one long section is trimmed rather than sent whole"""
+    fake_models = PromptRecordingModels()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'RETRIEVAL_MIN_TOKENS', 500)
+    monkeypatch.setattr(ai_processor, 'RETRIEVAL_MAX_TOKENS', 300)
+
+    text = "the tenant shall give ninety days notice of termination and pay all rent due " * 200
+    context = ai_processor.build_question_context(text, "How much notice is needed for termination?")
+
+    assert "[S1]" in context
+    assert ai_processor.count_tokens(context) < 400
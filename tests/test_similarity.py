@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.document_store import compute_document_id
+from utils.model_backend import FakeModels
+from utils.result_cache import ResultCache, MemoryResultCache
+from utils.similarity import SimilarityIndex, estimate_similarity, minhash_signature, set_similarity_owner
+
+def lease(tenant="Jane Doe", rent="1,200"):
+    clauses = [f"{number}. Clause {number}. The tenant shall keep the premises in good repair and "
+               f"notify the landlord of any defect number {number} within seven days." for number in range(1, 41)]
+    clauses[2] = f"3. Parties. This lease is made between Acme Property LLC and {tenant}."
+    clauses[5] = f"6. Rent. The tenant shall pay {rent} dollars on the first day of each month."
+    return "\n\n".join(clauses)
+
+UNRELATED = "\n\n".join(f"{number}. Section {number}. The employee assigns all inventions conceived during "
+                        f"employment to the company, including invention {number}." for number in range(1, 41))
+
+def test_signatures_estimate_similarity():
+    """Test that a template with new party details scores high and an unrelated document low"""
+    base = minhash_signature(lease())
+    assert estimate_similarity(base, minhash_signature(lease())) == 1.0
+    assert estimate_similarity(base, minhash_signature(lease(tenant="John Roe"))) >= 0.9
+    assert estimate_similarity(base, minhash_signature(UNRELATED)) < 0.2
+
+def test_index_finds_near_duplicates_and_persists(tmp_path):
+    """Test LSH lookup and that indexed signatures are shared through the index file"""
+    path = str(tmp_path / "similarity.idx")
+    first_worker = SimilarityIndex(path=path)
+    second_worker = SimilarityIndex(path=path)
+    first_worker.add(compute_document_id(lease()), lease())
+    first_worker.add(compute_document_id(UNRELATED), UNRELATED)
+    first_worker.add(compute_document_id(lease()), lease())
+
+    matches = second_worker.query(lease(tenant="John Roe"), 0.9)
+    assert [document_id for document_id, _ in matches] == [compute_document_id(lease())]
+    assert len(second_worker) == 2
+    assert len(SimilarityIndex(path=path)) == 2
+    assert SimilarityIndex(path=path).query(lease(), 0.99)[0][1] == 1.0
+
+def test_near_duplicate_upload_revises_the_earlier_analysis(monkeypatch):
+    """Test that only differing clauses are sent, with the earlier result rewritten rather than copied"""
+    fake_models = FakeModels(latency=0)
+    prompts = []
+    generate_content = fake_models.generate_content
+
+    def recording_generate_content(**kwargs):
+        prompts.append(kwargs['contents'][0].parts[0].text)
+        return generate_content(**kwargs)
+
+    fake_models.generate_content = recording_generate_content
+    documents = {}
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'similarity_index', SimilarityIndex())
+    monkeypatch.setattr(ai_processor, 'document_source', documents.get)
+    for text in (lease(), lease(tenant="John Roe"), lease(rent="900"), UNRELATED):
+        documents[compute_document_id(text)] = text
+
+    set_similarity_owner("alice")
+    original = ai_processor.summarize_document(lease())
+    assert fake_models.calls == 1
+
+    result = ai_processor.summarize_document(lease(tenant="John Roe"))
+    assert fake_models.calls == 2
+    assert result['near_duplicate']['document_id'] == compute_document_id(lease())
+    assert result['near_duplicate']['clauses_changed'] == 1
+    assert "John Roe" in prompts[-1] and "Jane Doe" in prompts[-1] and "Clause 10" not in prompts[-1]
+    assert result['summary'] != original['summary']
+    assert not set(original['risks']) & set(result['risks'])
+
+    # Unrelated documents get a full analysis
+    ai_processor.summarize_document(UNRELATED)
+    assert fake_models.calls == 3
+    assert 'near_duplicate' not in ai_processor.summarize_document(UNRELATED)
+
+    # Another session's near-identical upload is analyzed in full
+    set_similarity_owner("bob")
+    assert 'near_duplicate' not in ai_processor.summarize_document(lease(rent="900"))
+    assert fake_models.calls == 4
+    set_similarity_owner(None)
+
+def test_index_file_is_bulk_loaded_on_first_use(tmp_path):
+    """Test that a large index file is only read when first queried and loads every signature once"""
+    path = str(tmp_path / "similarity.idx")
+    writer = SimilarityIndex(path=path)
+    documents = [lease(tenant=f"Tenant {number}", rent=f"{number},000") for number in range(100)]
+    for document in documents + documents[:10]:
+        writer.add(compute_document_id(document), document)
+
+    reader = SimilarityIndex(path=path)
+    assert reader._opened is False
+    assert len(reader) == 100
+    for band in range(reader.bands):
+        assert list(reader._band_keys[band]) == sorted(reader._band_keys[band])
+    matches = reader.query(documents[42], 0.99, limit=100)
+    assert (compute_document_id(documents[42]), 1.0) in matches
@@ -0,0 +1,105 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from utils import ai_processor
+from utils.model_backend import FakeClient, FakeModels
+from utils.result_cache import ResultCache, MemoryResultCache
+from utils.single_flight import SingleFlight
+
+POLICY = "Employees must complete security training annually. " * 20
+
+def run_threads(target, count):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_identical_requests_share_one_model_call(monkeypatch):
+    """Test that simultaneous summaries of the same document make a single model call"""
+    fake_models = FakeModels(latency=0.2)
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'single_flight', SingleFlight(lock_dir=""))
+
+    results = run_threads(lambda: ai_processor.summarize_document(POLICY), 8)
+
+    assert fake_models.calls == 1
+    assert all(result == results[0] and 'error' not in result for result in results)
+
+    # A different question about the same document is a different call
+    ai_processor.answer_question(POLICY, "How often is training required?")
+    assert fake_models.calls == 2
+
+def test_followers_receive_the_leaders_exception():
+    """Test that an exception in the shared call is raised in every waiting caller"""
+    flight = SingleFlight(lock_dir="")
+    started = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("backend unavailable")
+
+    def call():
+        try:
+            flight.do('key', failing)
+        except RuntimeError as e:
+            return str(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    assert run_threads(call, 3) == ["backend unavailable"] * 3
+    leader.join()
+    assert len(calls) == 1
+
+def test_workers_coalesce_through_lock_files(tmp_path):
+    """Test that a second worker waits for the first and reuses its stored result"""
+    pytest.importorskip('fcntl')
+    shared_cache = {}
+    calls = []
+
+    def analysis(worker):
+        def compute():
+            calls.append(worker)
+            time.sleep(0.2)
+            shared_cache['key'] = f"result from {worker}"
+            return shared_cache['key']
+        return compute
+
+    first_worker = SingleFlight(lock_dir=str(tmp_path))
+    second_worker = SingleFlight(lock_dir=str(tmp_path))
+    first = threading.Thread(target=first_worker.do, args=('key', analysis('first')))
+    first.start()
+    time.sleep(0.05)
+    result = second_worker.do('key', analysis('second'), lambda: shared_cache.get('key'))
+    first.join()
+
+    assert calls == ['first']
+    assert result == "result from first"
+
+def test_async_requests_are_coalesced(monkeypatch):
+    """Test that concurrent async analyses of one document await a single model call"""
+    fake_client = FakeClient(latency=0.1)
+    monkeypatch.setattr(ai_processor, 'client', fake_client)
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'single_flight', SingleFlight(lock_dir=""))
+
+    async def main():
+        return await asyncio.gather(*(ai_processor.run_action_async(POLICY, 'simplify') for _ in range(10)))
+
+    results = asyncio.run(main())
+
+    assert fake_client.models.calls == 1
+    assert all(result == results[0] for result in results)
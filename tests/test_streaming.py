@@ -0,0 +1,109 @@
+import io
+import json
+from types import SimpleNamespace
+import pytest
+from utils import ai_processor
+from utils.json_stream import IncrementalJSONParser
+from utils.result_cache import ResultCache, MemoryResultCache
+from app import app
+
+RESPONSE = json.dumps({
+    "summary": "A lease between two parties.",
+    "risks": ["Automatic renewal", "Uncapped liability"],
+    "obligations": ["Pay rent monthly"],
+    "key_points": []
+})
+
+class StreamingModels:
+    """Fake client.models that streams a response in small pieces"""
+
+    def __init__(self, text, piece_size=7):
+        self.text = text
+        self.piece_size = piece_size
+        self.calls = 0
+
+    def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        for start in range(0, len(self.text), self.piece_size):
+            yield SimpleNamespace(text=self.text[start:start + self.piece_size])
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+def test_parser_emits_completed_fields_only():
+    """Test that fields and list items are emitted once complete"""
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"summary": "A lea') == []
+    assert parser.feed('se", "risks": ["Auto') == [('value', 'summary', 'A lease')]
+    assert parser.feed('renewal", "Liab') == [('item', 'risks', 'Autorenewal')]
+    assert parser.feed('ility"], "count": 1') == [('item', 'risks', 'Liability')]
+    assert parser.feed('2}') == [('value', 'count', 12)]
+    assert parser.done
+
+def test_parser_handles_split_escapes_and_drops_consumed_text():
+    """Test escapes split across pieces and that finished values leave the buffer"""
+    text = json.dumps({"summary": 'He said "renew" \\ ' * 200, "risks": ["a]", "b}"]})
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), 3):
+        events += parser.feed(text[start:start + 3])
+        assert len(parser.buffer) < 10
+    assert events == [('value', 'summary', 'He said "renew" \\ ' * 200),
+                      ('item', 'risks', 'a]'), ('item', 'risks', 'b}')]
+    assert parser.done
+
+def test_stream_analysis_yields_items_then_done(monkeypatch):
+    """Test streamed analysis events and caching of the final result"""
+    fake_models = StreamingModels(RESPONSE)
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    events = list(ai_processor.stream_analysis("Lease text", 'summarize'))
+    assert ('item', {"field": "risks", "value": "Automatic renewal"}) in events
+    assert events[0] == ('value', {"field": "summary", "value": "A lease between two parties."})
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['summary'] == "<p>A lease between two parties.</p>"
+
+    # A repeat request is replayed from the cache without a model call
+    replayed = list(ai_processor.stream_analysis("Lease text", 'summarize'))
+    assert replayed[-1] == events[-1]
+    assert fake_models.calls == 1
+
+def test_stream_endpoint_sends_server_sent_events(client, monkeypatch):
+    """Test uploading a document and streaming its analysis over SSE"""
+    fake_models = StreamingModels(RESPONSE)
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=fake_models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    response = client.post('/documents', data={
+        'file': (io.BytesIO(b"This lease renews automatically."), 'lease.txt'),
+        'action': 'summarize'
+    })
+    assert response.status_code == 201
+    results_url = response.get_json()['results_url']
+
+    page = client.get(results_url)
+    assert page.status_code == 200
+    assert b'streamingResults' in page.data
+
+    response = client.get('/stream?action=summarize')
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert 'event: item\ndata: {"field": "risks", "value": "Automatic renewal"}' in body
+    assert body.rstrip().split('\n\n')[-1].startswith('event: done')
+
+def test_stream_runs_on_the_job_queue(client, monkeypatch):
+    """Test that streamed analyses are bounded by the job queue like /jobs"""
+    import app as app_module
+    from utils.job_queue import JobQueue
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=StreamingModels(RESPONSE)))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(workers=1, max_pending=0))
+
+    client.post('/documents', data={'file': (io.BytesIO(b"This lease renews automatically."), 'lease.txt'),
+                                    'action': 'summarize'})
+    body = client.get('/stream?action=summarize').get_data(as_text=True)
+    assert body.startswith('event: error') and 'busy' in body
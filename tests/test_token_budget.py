@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+from utils import ai_processor, token_budget
+from utils.metrics import PROMPT_STRATEGIES, PROMPT_TOKEN_ESTIMATE_RATIO
+from utils.result_cache import ResultCache, MemoryResultCache
+from utils.token_budget import count_tokens, document_tokens, plan_prompt, prompt_token_budget, trim_to_tokens
+
+def test_count_tokens_approximates_subwords():
+    """Test that words, long words and punctuation are counted like a subword tokenizer"""
+    assert count_tokens("The tenant pays rent.") == 5
+    assert count_tokens("indemnification") == 3
+    assert count_tokens("") == 0
+
+def test_document_tokens_are_counted_once_per_document(monkeypatch):
+    """Test that token counts are cached by document hash"""
+    calls = []
+    monkeypatch.setattr(token_budget, 'count_tokens', lambda text: calls.append(text) or 42)
+    text = "A unique lease used only by this test. " * 10
+
+    assert document_tokens(text) == 42
+    assert document_tokens(text) == 42
+    assert len(calls) == 1
+
+def test_plan_picks_strategy_from_budget():
+    """Test single shot, map-reduce and retrieval selection and the latency cap"""
+    assert plan_prompt(900, 100, 1000).strategy == 'single'
+    assert plan_prompt(901, 100, 1000) == ('map_reduce', 901, 1000, 900)
+
+    assert plan_prompt(400, 100, 1000, question=True, retrieval_min_tokens=500).strategy == 'single'
+    retrieval = plan_prompt(600, 100, 1000, question=True, retrieval_min_tokens=500, retrieval_max_tokens=300)
+    assert retrieval.strategy == 'retrieval' and retrieval.context_tokens == 300
+
+    assert prompt_token_budget(12000, latency_budget=0.5, tokens_per_second=4000) == 2000
+    assert prompt_token_budget(12000, latency_budget=0) == 12000
+
+def test_trim_to_tokens_cuts_at_a_word_boundary():
+    """Test that trimmed context fits the budget and is marked as truncated"""
+    text = "The landlord maintains the roof and the tenant maintains the garden. " * 50
+    trimmed = trim_to_tokens(text, 100)
+
+    assert trimmed.endswith(token_budget.TRUNCATION_NOTE)
+    body = trimmed[:-len(token_budget.TRUNCATION_NOTE)]
+    assert count_tokens(body) <= 100
+    assert text.startswith(body) and text[len(body)] == " "
+    assert trim_to_tokens("Short clause.", 100) == "Short clause."
+
+def test_budget_drives_map_reduce_and_reports_estimate_accuracy(monkeypatch):
+    """Test that documents over the budget are chunked and reported usage is compared to the estimate"""
+    calls = []
+
+    def generate_content(contents=None, config=None, **kwargs):
+        prompt = contents[0].parts[0].text
+        calls.append(count_tokens(config.system_instruction) + count_tokens(prompt))
+        usage = SimpleNamespace(prompt_token_count=calls[-1] * 1.2, candidates_token_count=20)
+        return SimpleNamespace(text=json.dumps({'summary': 'Part', 'risks': []}), usage_metadata=usage)
+
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    monkeypatch.setattr(ai_processor, 'CHUNK_MAX_TOKENS', 600)
+    before_map_reduce = PROMPT_STRATEGIES.value(action='summarize', strategy='map_reduce')
+    before_ratio = PROMPT_TOKEN_ESTIMATE_RATIO.count(action='summarize')
+
+    text = "\n".join(f"{i}. Clause {i}. " + "The supplier shall deliver the goods, on time. " * 12
+                     for i in range(1, 20))
+    ai_processor.summarize_document(text)
+
+    assert len(calls) > 1
+    assert max(calls) <= 600 + ai_processor.PROMPT_FRAMING_TOKENS
+    assert PROMPT_STRATEGIES.value(action='summarize', strategy='map_reduce') == before_map_reduce + 1
+    assert PROMPT_TOKEN_ESTIMATE_RATIO.count(action='summarize') == before_ratio + len(calls)
@@ -1,12 +1,18 @@
+import io
+import mmap
 import pytest
 import tempfile
 import os
 from utils.document_processor import (
     extract_text_from_file, 
     extract_text_from_txt, 
-    validate_document_content,
-    truncate_text_for_api
+    extract_text_from_pdf,
+    extract_text_from_stream,
+    spool_stream,
+    iter_pdf_pages,
+    validate_document_content
 )
+from tests.pdf_fixtures import make_pdf
 
 def test_extract_text_from_txt():
     """Test text extraction from TXT file"""
@@ -36,19 +42,6 @@ def test_validate_document_content():
     assert validate_document_content("") == False
     assert validate_document_content(None) == False
 
-def test_truncate_text_for_api():
-    """Test text truncation for API limits"""
-    # Short text should remain unchanged
-    short_text = "This is a short document."
-    result = truncate_text_for_api(short_text, max_tokens=1000)
-    assert result == short_text
-    
-    # Long text should be truncated
-    long_text = "This is a very long document. " * 1000
-    result = truncate_text_for_api(long_text, max_tokens=100)
-    assert len(result) < len(long_text)
-    assert "[Note: Document was truncated due to length limits]" in result
-
 def test_extract_text_from_unsupported_file():
     """Test extraction from unsupported file type"""
     with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as f:
@@ -59,4 +52,60 @@ def test_extract_text_from_unsupported_file():
             extract_text_from_file(temp_path)
         assert "Unsupported file type" in str(exc_info.value)
     finally:
-        os.unlink(temp_path)
\ No newline at end of file
+        os.unlink(temp_path)
+
+def test_extract_text_from_pdf():
+    """Test PDF extraction with page markers, skipping empty pages"""
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(make_pdf(["First page terms", "", "Third page terms"]))
+        temp_path = f.name
+    
+    try:
+        text = extract_text_from_pdf(temp_path)
+        assert text == "--- Page 1 ---\nFirst page terms\n\n--- Page 3 ---\nThird page terms"
+    finally:
+        os.unlink(temp_path)
+
+def test_iter_pdf_pages_parallel_matches_sequential(monkeypatch):
+    """Test that process-pool extraction yields the same pages in order"""
+    import utils.document_processor as document_processor
+    monkeypatch.setattr(document_processor, 'PDF_PARALLEL_MIN_PAGES', 2)
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(make_pdf([f"Clause {i}" for i in range(1, 13)]))
+        temp_path = f.name
+    
+    try:
+        pages = iter_pdf_pages(temp_path, processes=1)
+        assert next(pages) == (1, "Clause 1")
+        sequential = [(1, "Clause 1")] + list(pages)
+        assert list(iter_pdf_pages(temp_path, processes=2)) == sequential
+        assert len(sequential) == 12
+    finally:
+        os.unlink(temp_path)
+
+def test_extract_text_from_stream():
+    """Test in-memory extraction of PDF and TXT uploads"""
+    pdf_text = extract_text_from_stream(io.BytesIO(make_pdf(["Lease terms"])), 'lease.pdf')
+    assert pdf_text == "--- Page 1 ---\nLease terms"
+
+    txt_text = extract_text_from_stream("Notice period: 30 days\r\n".encode('utf-16'), mimetype='text/plain')
+    assert txt_text == "Notice period: 30 days"
+
+    with pytest.raises(Exception) as exc_info:
+        extract_text_from_stream(io.BytesIO(b"data"), 'contract.docx')
+    assert "Unsupported file type" in str(exc_info.value)
+
+def test_spool_stream_uses_anonymous_mmap_above_threshold():
+    """Test that large uploads are spooled to memory maps, small ones to BytesIO"""
+    small = spool_stream(io.BytesIO(b"small upload"), threshold=1024)
+    assert isinstance(small, io.BytesIO)
+    assert small.read() == b"small upload"
+
+    pdf_bytes = make_pdf(["Spooled page"])
+    large = spool_stream(io.BytesIO(pdf_bytes), threshold=16)
+    try:
+        assert isinstance(large, mmap.mmap)
+        assert extract_text_from_stream(large, 'upload.pdf') == "--- Page 1 ---\nSpooled page"
+    finally:
+        large.close()
@@ -0,0 +1,148 @@
+import io
+import re
+import json
+from types import SimpleNamespace
+from utils import ai_processor
+from utils.result_cache import ResultCache, MemoryResultCache
+from utils.versioning import clause_fingerprint, diff_clauses, split_into_clauses
+
+V1 = """1. Term. This agreement lasts twelve months.
+2. Payment. The client pays within 30 days of invoice.
+3. Termination. Either party may terminate with 60 days notice.
+4. Liability. Liability is capped at the fees paid.
+"""
+
+# Payment changed, a clause inserted (renumbering the rest), liability removed
+V2 = """1. Term. This agreement lasts twelve months.
+2. Payment. The client pays within 7 days of invoice.
+3. Auto-renewal. The agreement renews automatically for further twelve month terms.
+4. Termination. Either party may terminate with 60 days notice.
+"""
+
+class ClauseModels:
+    """Fake client.models that analyzes every clause ID in the prompt"""
+
+    def __init__(self):
+        self.calls = 0
+        self.clause_counts = []
+
+    def generate_content(self, contents=None, **kwargs):
+        self.calls += 1
+        prompt = contents[0].parts[0].text
+        clauses = re.findall(r'^\[(C\d+)\]\n(.*)$', prompt, re.M)
+        self.clause_counts.append(len(clauses))
+        return SimpleNamespace(text=json.dumps({'clauses': [
+            {'clause_id': clause_id, 'simplified_text': f'Plain {clause_id}',
+             'risks': ['Short payment window'] if '7 days' in text else [], 'obligations': [], 'key_points': []}
+            for clause_id, text in clauses
+        ]}))
+
+def test_fingerprint_ignores_numbering_and_layout():
+    """Test that renumbered or reflowed clauses keep their fingerprint"""
+    assert clause_fingerprint("3. Termination.  Either party\nmay terminate.") == \
+        clause_fingerprint("4. termination. Either party may terminate.")
+    assert clause_fingerprint("3. Termination with notice.") != clause_fingerprint("3. Termination at will.")
+
+def test_diff_reports_modified_added_and_removed_clauses():
+    """Test clause-level diffing between two versions"""
+    changes = diff_clauses(split_into_clauses(V1), split_into_clauses(V2))
+    summary = [(change.change, (change.clause or change.previous).heading.split('.')[1].strip()) for change in changes]
+    assert summary == [('modified', 'Payment'), ('added', 'Auto-renewal'), ('removed', 'Liability')]
+
+def test_moved_clauses_are_not_changes():
+    """Test that reordering clauses is not reported as a change"""
+    reordered = "1. Payment. The client pays within 30 days of invoice.\n2. Term. This agreement lasts twelve months.\n"
+    original = "1. Term. This agreement lasts twelve months.\n2. Payment. The client pays within 30 days of invoice.\n"
+    assert diff_clauses(split_into_clauses(original), split_into_clauses(reordered)) == []
+
+def test_revision_review_only_sends_changed_clauses(monkeypatch):
+    """Test that unchanged clauses are never sent and clause analyses are reused across versions"""
+    models = ClauseModels()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    # The changed clauses of both versions are sent, so replaced risks are known from the first comparison
+    result = ai_processor.review_revision(V1, V2)
+    assert models.clause_counts == [4]
+    assert result['clauses_analyzed'] == 2
+    assert [change['change'] for change in result['changes']] == ['modified', 'added', 'removed']
+    assert result['risks'] == ['Short payment window']
+
+    # v3 only adds a clause
+    v3 = V2 + "5. Notices. Notices must be in writing.\n"
+    ai_processor.review_revision(V2, v3)
+    assert models.clause_counts == [4, 1]
+
+    # Comparing v1 directly with v3 reuses every clause analysis from the reviews above
+    result = ai_processor.review_revision(V1, v3)
+    assert models.clause_counts == [4, 1]
+    assert result['clauses_analyzed'] == 0
+    assert [change['change'] for change in result['changes']] == ['modified', 'added', 'modified']
+
+    # v4 restores the payment term, resolving the risk raised against v2
+    v4 = v3.replace("within 7 days", "within 30 days")
+    result = ai_processor.review_revision(v3, v4)
+    assert models.clause_counts == [4, 1]
+    assert result['resolved_risks'] == ['Short payment window']
+
+def test_first_revision_review_resolves_risks_and_covers_the_whole_version(monkeypatch):
+    """Test resolved risks without an earlier review and merging cached analyses of unchanged clauses"""
+    models = ClauseModels()
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=models))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+    v2_fixed = V2.replace("within 7 days", "within 30 days")
+
+    result = ai_processor.review_revision(V2, v2_fixed)
+    assert result['resolved_risks'] == ['Short payment window']
+
+    # The risky clause is unchanged in the next revision but still part of the whole-version risks
+    v3 = V2 + "5. Notices. Notices must be in writing.\n"
+    result = ai_processor.review_revision(V2, v3)
+    assert [change['change'] for change in result['changes']] == ['added']
+    assert result['risks'] == ['Short payment window']
+
+def test_partial_revision_review_is_not_cached(monkeypatch):
+    """Test that a review missing a clause analysis is returned but retried next time"""
+    models = ClauseModels()
+    generate = models.generate_content
+    answers = []
+
+    def drop_last_clause(**kwargs):
+        response = generate(**kwargs)
+        data = json.loads(response.text)
+        if not answers:
+            data['clauses'] = data['clauses'][:-1]
+        answers.append(data)
+        return SimpleNamespace(text=json.dumps(data))
+
+    monkeypatch.setattr(ai_processor, 'client', SimpleNamespace(models=SimpleNamespace(generate_content=drop_last_clause)))
+    monkeypatch.setattr(ai_processor, 'result_cache', ResultCache(MemoryResultCache()))
+
+    result = ai_processor.review_revision(V1, V2)
+    assert result['partial']
+    result = ai_processor.review_revision(V1, V2)
+    assert 'partial' not in result
+    assert models.clause_counts == [4, 1]
+
+def test_compare_route_reviews_against_session_document(monkeypatch):
+    """Test that /compare diffs the upload against the document in the session"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'summarize_document', lambda text: {'summary': 'ok'})
+    monkeypatch.setattr(app_module, 'review_revision', lambda previous, revised: {
+        'summary': '<p>1 clauses modified</p>', 'changes': [
+            {'change': 'modified', 'heading': previous.splitlines()[1][:10], 'simplified_text': '<p>Shorter</p>',
+             'risks': [], 'obligations': [], 'key_points': []}],
+        'clauses_analyzed': 1, 'clauses_total': 4, 'risks': []})
+    app_module.app.config['TESTING'] = True
+
+    with app_module.app.test_client() as client:
+        assert client.post('/compare', data={'file': (io.BytesIO(V2.encode()), 'v2.txt')}).status_code == 302
+
+        client.post('/upload', data={'file': (io.BytesIO(V1.encode()), 'v1.txt'), 'action': 'summarize'})
+        response = client.post('/compare', data={'file': (io.BytesIO(V2.encode()), 'v2.txt')})
+        assert response.status_code == 200
+        assert b'What Changed' in response.data
+        assert b'2. Payment' in response.data
+
+        with client.session_transaction() as sess:
+            assert sess['filename'] == 'v2.txt'
@@ -1,28 +1,68 @@
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
-from google import genai
-from google.genai import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+from utils.chunking import chunk_text
+from utils.context_cache import CONTEXT_CACHE_MIN_TOKENS, ContextCache
+from utils.document_store import compute_document_id
+from utils.gemini_client import ResilientClient
+from utils.json_stream import IncrementalJSONParser
+from utils.metrics import (stage, MODEL_SECONDS, MODEL_ERRORS, MODEL_FALLBACKS, MODEL_PROMPT_TOKENS,
+                           MODEL_RESPONSE_TOKENS, MODEL_CACHED_TOKENS, PROMPT_TOKEN_ESTIMATE_RATIO,
+                           PROMPT_STRATEGIES, NEAR_DUPLICATE_LOOKUPS)
+from utils.model_backend import LazyClient, create_model_client
+from utils.model_router import ModelRouter, Route, latency_budget
+from utils.red_flags import prioritize_chunks
+from utils.result_cache import create_result_cache, make_cache_key
+from utils.similarity import create_similarity_index, similarity_owner
+from utils.single_flight import SingleFlight
+from utils.token_budget import (PromptPlan, count_tokens, document_tokens, plan_prompt,
+                                prompt_token_budget, trim_to_tokens)
+from utils.retrieval import ClauseIndex
+from utils.versioning import Clause, ClauseChange, diff_clauses, split_into_clauses
 
 logger = logging.getLogger(__name__)
 
-# Using Gemini 2.5 Flash for AI processing
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Each call goes to a light or standard Gemini model depending on action, size and latency (see model_router)
+model_router = ModelRouter()
+# Every model call goes through deadlines, retries, rate limits, an in-flight cap and a circuit breaker.
+# The client is built on first use so importing this module stays cheap.
+client = LazyClient(lambda: ResilientClient(create_model_client(api_key=GEMINI_API_KEY)))
 
-def simplify_legal_text(document_text: str) -> Dict[str, Any]:
-    """
-    Simplify legal document text into plain language.
-    
-    Args:
-        document_text: Raw legal document text
-        
-    Returns:
-        Dict containing simplified text, risks, obligations, and key points
-    """
-    try:
-        system_prompt = """
+# Bump whenever a prompt changes so stale cached results are not served
+PROMPT_VERSION = "3"
+result_cache = create_result_cache()
+
+# Identical analyses requested at the same time share one model call
+single_flight = SingleFlight()
+
+# Token budget per prompt: larger documents are analyzed chunk by chunk and the results merged.
+# PROMPT_LATENCY_BUDGET (see token_budget) can lower it further.
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", 12000))
+CHUNK_PARALLELISM = int(os.environ.get("CHUNK_PARALLELISM", 4))
+
+# Questions about documents larger than this only see the best-matching sections
+RETRIEVAL_MIN_TOKENS = int(os.environ.get("RETRIEVAL_MIN_TOKENS", 4000))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 8))
+RETRIEVAL_MAX_TOKENS = int(os.environ.get("RETRIEVAL_MAX_TOKENS", 6000))
+
+# Uploads at least this similar to a document analyzed for the same owner (estimated Jaccard
+# similarity of word shingles) have its result revised for just the clauses that differ, as long
+# as at most SIMILARITY_MAX_CHANGED of their clauses changed
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", 0.9))
+SIMILARITY_MAX_CHANGED = float(os.environ.get("SIMILARITY_MAX_CHANGED", 0.2))
+
+# Questions answered per model call by answer_questions(); longer lists are split into parallel sub-batches
+QUESTION_BATCH_SIZE = int(os.environ.get("QUESTION_BATCH_SIZE", 10))
+
+# Tokens of fixed wording around the document in a user prompt ("Document to analyze:", part labels, ...)
+PROMPT_FRAMING_TOKENS = 50
+
+SIMPLIFY_SYSTEM_PROMPT = """
         You are a legal expert specializing in translating complex legal documents into plain, understandable language.
         
         Please analyze the following legal document and provide:
@@ -39,50 +79,8 @@ def simplify_legal_text(document_text: str) -> Dict[str, Any]:
             "key_points": ["List of important points to note"]
         }
         """
-        
-        user_prompt = f"Document to analyze:\n{document_text}"
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                types.Content(role="user", parts=[types.Part(text=user_prompt)])
-            ],
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                response_mime_type="application/json"
-            )
-        )
-        
-        result = json.loads(response.text or '{}')
-        
-        # Format the simplified text with proper HTML formatting
-        if result.get('simplified_text'):
-            result['simplified_text'] = format_text_with_paragraphs(result['simplified_text'])
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error simplifying legal text: {str(e)}")
-        return {
-            "error": f"Failed to simplify document: {str(e)}",
-            "simplified_text": None,
-            "risks": [],
-            "obligations": [],
-            "key_points": []
-        }
 
-def summarize_document(document_text: str) -> Dict[str, Any]:
-    """
-    Generate an executive summary of the legal document.
-    
-    Args:
-        document_text: Raw legal document text
-        
-    Returns:
-        Dict containing summary, risks, obligations, and key points
-    """
-    try:
-        system_prompt = """
+SUMMARIZE_SYSTEM_PROMPT = """
         You are a legal analyst creating executive summaries for business leaders.
         
         Please analyze the following legal document and provide:
@@ -101,51 +99,28 @@ def summarize_document(document_text: str) -> Dict[str, Any]:
             "key_points": ["List of important clauses and terms"]
         }
         """
+
+ANALYZE_SYSTEM_PROMPT = """
+        You are a legal expert preparing a complete review of a legal document for a business reader.
         
-        user_prompt = f"Document to analyze:\n{document_text}"
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                types.Content(role="user", parts=[types.Part(text=user_prompt)])
-            ],
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                response_mime_type="application/json"
-            )
-        )
-        
-        result = json.loads(response.text or '{}')
-        
-        # Format the summary with proper HTML formatting
-        if result.get('summary'):
-            result['summary'] = format_text_with_paragraphs(result['summary'])
-        
-        return result
+        Please analyze the following legal document and provide:
+        1. A simplified version that explains the content in plain English
+        2. A concise executive summary (3-5 paragraphs max)
+        3. Key risks and red flags that need attention
+        4. Important obligations, responsibilities and deadlines
+        5. Key points, clauses and terms to note
         
-    except Exception as e:
-        logger.error(f"Error summarizing document: {str(e)}")
-        return {
-            "error": f"Failed to summarize document: {str(e)}",
-            "summary": None,
-            "risks": [],
-            "obligations": [],
-            "key_points": []
+        Please respond in JSON format with these fields:
+        {
+            "summary": "Executive summary of the document",
+            "simplified_text": "Plain language explanation of the document",
+            "risks": ["List of identified risks and red flags"],
+            "obligations": ["List of obligations, responsibilities and deadlines"],
+            "key_points": ["List of important clauses, terms and points to note"]
         }
+        """
 
-def answer_question(document_text: str, question: str) -> Dict[str, Any]:
-    """
-    Answer specific questions about the legal document.
-    
-    Args:
-        document_text: Raw legal document text
-        question: User's question about the document
-        
-    Returns:
-        Dict containing the answer and related information
-    """
-    try:
-        system_prompt = """
+QUESTION_SYSTEM_PROMPT = """
         You are a legal expert answering questions about a specific legal document.
         
         Please provide a comprehensive answer that:
@@ -163,37 +138,1334 @@ def answer_question(document_text: str, question: str) -> Dict[str, Any]:
             "recommendations": ["Suggested actions or considerations"]
         }
         """
+
+# Appended to the question prompt for a list of questions; the system prompt stays
+# QUESTION_SYSTEM_PROMPT so question lists can use the document's cached context
+QUESTION_BATCH_INSTRUCTIONS = """
+        Answer each of the questions below separately, as described above.
         
-        user_prompt = f"Document:\n{document_text}\n\nQuestion: {question}"
+        Please respond in JSON format with these fields:
+        {
+            "answers": [
+                {
+                    "question_id": "The question ID exactly as given, e.g. Q2",
+                    "answer": "Comprehensive answer to the question",
+                    "relevant_clauses": ["List of relevant document sections or clauses"],
+                    "risks": ["Any risks related to this question"],
+                    "recommendations": ["Suggested actions or considerations"]
+                }
+            ]
+        }
+        """
+
+CLAUSE_SYSTEM_PROMPT = """
+        You are a legal expert reviewing individual clauses of a legal document.
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                types.Content(role="user", parts=[types.Part(text=user_prompt)])
-            ],
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                response_mime_type="application/json"
-            )
+        Analyze each clause below on its own and provide, for every clause:
+        1. A plain English explanation of the clause
+        2. Risks and red flags it creates
+        3. Obligations and responsibilities it imposes
+        4. Key points that need attention
+        
+        Please respond in JSON format with these fields:
+        {
+            "clauses": [
+                {
+                    "clause_id": "The clause ID exactly as given, e.g. C3",
+                    "simplified_text": "Plain language explanation of the clause",
+                    "risks": ["List of risks and red flags in this clause"],
+                    "obligations": ["List of obligations in this clause"],
+                    "key_points": ["List of important points in this clause"]
+                }
+            ]
+        }
+        """
+
+# Appended to an action's prompt to update the result of a near-identical earlier document
+REVISION_INSTRUCTIONS = """
+        The document is a revision of one analyzed earlier. Instead of the whole document you are
+        given the earlier analysis and the clauses that were added, changed or removed; all other
+        clauses are unchanged.
+        
+        Update the earlier analysis so it describes the revised document:
+        1. Rewrite the text fields to reflect the changes, leaving out details of changed or removed clauses
+        2. Drop list items that come from changed or removed clauses
+        3. Add risks, obligations and key points arising from added or changed clauses
+        4. Keep what the earlier analysis says about unchanged clauses
+        
+        Write the text fields as plain text paragraphs without HTML, and respond in the JSON format above.
+        """
+
+# List fields merged across chunks in the reduce step
+MERGED_LIST_FIELDS = ('risks', 'obligations', 'key_points')
+
+# Metric label for each prompt
+PROMPT_ACTIONS = {
+    SIMPLIFY_SYSTEM_PROMPT: 'simplify',
+    SUMMARIZE_SYSTEM_PROMPT: 'summarize',
+    ANALYZE_SYSTEM_PROMPT: 'analyze',
+    QUESTION_SYSTEM_PROMPT: 'question',
+    CLAUSE_SYSTEM_PROMPT: 'clause'
+}
+
+# Documents are registered once as cached model contexts so follow-up questions only send the question.
+# Smaller documents are sent inline whole, where they can still be routed to the light model.
+context_cache = ContextCache(
+    lambda: client.caches, model_router.standard, QUESTION_SYSTEM_PROMPT,
+    min_tokens=max(CONTEXT_CACHE_MIN_TOKENS, RETRIEVAL_MIN_TOKENS,
+                   model_router.light_max_tokens if model_router.light else 0)
+)
+
+# Signatures of fully analyzed documents, to find near-duplicates of new uploads
+similarity_index = create_similarity_index()
+# Loads an earlier document's text by ID for diffing near-duplicates; set by set_document_source()
+document_source: Optional[Callable[[str], Optional[str]]] = None
+
+def record_model_usage(action: str, system_prompt: str, user_prompt: str,
+                       response_text: str, usage: Any = None) -> None:
+    """
+    Record prompt and response token counts for a model call.
+    
+    Reported usage is preferred; estimates are used when the backend gives none.
+    When both are available, their ratio is recorded to track the local token counter's accuracy.
+    """
+    estimated_tokens = count_tokens(system_prompt) + count_tokens(user_prompt)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    # Tokens served from a cached context are not part of the prompt that was sent
+    cached_tokens = getattr(usage, 'cached_content_token_count', None) or 0
+    if cached_tokens:
+        MODEL_CACHED_TOKENS.observe(cached_tokens, action=action)
+    elif prompt_tokens and estimated_tokens:
+        PROMPT_TOKEN_ESTIMATE_RATIO.observe(prompt_tokens / estimated_tokens, action=action)
+        logger.debug(f"{action} prompt: {estimated_tokens} tokens estimated, {prompt_tokens} used")
+    prompt_tokens = prompt_tokens or estimated_tokens
+    response_tokens = getattr(usage, 'candidates_token_count', None) or count_tokens(response_text)
+    MODEL_PROMPT_TOKENS.observe(prompt_tokens, action=action)
+    MODEL_RESPONSE_TOKENS.observe(response_tokens, action=action)
+
+def model_request(system_prompt: str, user_prompt: str, cached_content: Optional[str] = None,
+                  model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build generate_content arguments for a JSON-mode prompt.
+    
+    Args:
+        system_prompt: System instruction describing the task and schema
+        user_prompt: User content including the document text
+        cached_content: Handle of a cached context that already holds the
+            system instruction and document (see ContextCache)
+        model: Model to call, the standard tier if not given
+        
+    Returns:
+        Dict of keyword arguments for generate_content / generate_content_stream
+    """
+    # Imported on first call; google.genai.types dominates startup time otherwise
+    from google.genai import types
+    
+    if cached_content:
+        config = types.GenerateContentConfig(cached_content=cached_content, response_mime_type="application/json")
+    else:
+        config = types.GenerateContentConfig(system_instruction=system_prompt, response_mime_type="application/json")
+    return {
+        'model': model or model_router.standard,
+        'contents': [
+            types.Content(role="user", parts=[types.Part(text=user_prompt)])
+        ],
+        'config': config
+    }
+
+def route_call(action: str, user_prompt: str, cached_content: Optional[str] = None,
+               routing_tokens: Optional[int] = None) -> Tuple[Route, int]:
+    """
+    Choose the models for a call (see ModelRouter.route).
+    
+    Args:
+        action: Metric label of the prompt
+        user_prompt: User content including the document text
+        cached_content: Cached context handle; the call must use the model holding it
+        routing_tokens: Tokens to size the call by, the prompt's if not given
+        
+    Returns:
+        Tuple of the route and the tokens it was sized by
+    """
+    tokens = routing_tokens if routing_tokens is not None else count_tokens(user_prompt)
+    pinned = context_cache.model if cached_content else None
+    return model_router.route(action, tokens, latency_budget(), pinned), tokens
+
+def record_fallback(action: str, model: str, route: Route, error: Exception) -> bool:
+    """
+    Record a failed call and decide whether to try the next model of its route.
+    
+    Returns:
+        bool: True if another model is left to try
+    """
+    MODEL_ERRORS.inc(action=action, model=model)
+    model_router.record_failure(model)
+    remaining = route.models[route.models.index(model) + 1:]
+    if not remaining:
+        return False
+    MODEL_FALLBACKS.inc(action=action, model=model)
+    logger.warning(f"{action} call to {model} failed, falling back to {remaining[0]}: {str(error)}")
+    return True
+
+def generate_json(system_prompt: str, user_prompt: str, cached_content: Optional[str] = None,
+                  routing_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Send a prompt to Gemini and parse its JSON response.
+    
+    The model is chosen by model_router; if the call fails, the next model
+    of the route is tried.
+    
+    Args:
+        system_prompt: System instruction describing the task and schema
+        user_prompt: User content including the document text
+        cached_content: Optional cached context handle (see model_request)
+        routing_tokens: Tokens to route the call by, e.g. the whole document's
+            for one chunk of it; the prompt's if not given
+        
+    Returns:
+        Dict parsed from the model's JSON response
+    """
+    action = PROMPT_ACTIONS.get(system_prompt, 'other')
+    route, tokens = route_call(action, user_prompt, cached_content, routing_tokens)
+    for model in route.models:
+        started = time.perf_counter()
+        try:
+            with stage('model'):
+                response = client.models.generate_content(**model_request(system_prompt, user_prompt,
+                                                                          cached_content, model))
+            break
+        except Exception as e:
+            if not record_fallback(action, model, route, e):
+                raise
+    seconds = time.perf_counter() - started
+    MODEL_SECONDS.observe(seconds, action=action, mode='blocking', model=model)
+    model_router.record_success(model, tokens, seconds)
+    
+    record_model_usage(action, system_prompt, user_prompt, response.text or '',
+                       getattr(response, 'usage_metadata', None))
+    with stage('parse_json'):
+        return json.loads(response.text or '{}')
+
+def generate_json_stream(system_prompt: str, user_prompt: str, cached_content: Optional[str] = None) -> Iterator[str]:
+    """
+    Stream a JSON response from Gemini as it is generated.
+    
+    Falls back to the next model of the route only while nothing has been
+    yielded; a stream that fails part-way raises.
+    
+    Args:
+        system_prompt: System instruction describing the task and schema
+        user_prompt: User content including the document text
+        cached_content: Optional cached context handle (see model_request)
+        
+    Yields:
+        str: Successive pieces of the response text
+    """
+    action = PROMPT_ACTIONS.get(system_prompt, 'other')
+    route, tokens = route_call(action, user_prompt, cached_content)
+    response_parts = []
+    usage = None
+    for model in route.models:
+        started = time.perf_counter()
+        try:
+            stream = client.models.generate_content_stream(**model_request(system_prompt, user_prompt,
+                                                                           cached_content, model))
+            
+            for chunk in stream:
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if chunk.text:
+                    if not response_parts:
+                        MODEL_SECONDS.observe(time.perf_counter() - started, action=action, mode='first_chunk',
+                                              model=model)
+                    response_parts.append(chunk.text)
+                    yield chunk.text
+            break
+        except Exception as e:
+            if response_parts:
+                MODEL_ERRORS.inc(action=action, model=model)
+                model_router.record_failure(model)
+                raise
+            if not record_fallback(action, model, route, e):
+                raise
+    
+    seconds = time.perf_counter() - started
+    MODEL_SECONDS.observe(seconds, action=action, mode='stream', model=model)
+    model_router.record_success(model, tokens, seconds)
+    record_model_usage(action, system_prompt, user_prompt, "".join(response_parts), usage)
+
+async def generate_json_async(system_prompt: str, user_prompt: str,
+                              cached_content: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async version of generate_json() using the non-blocking client.aio API.
+    
+    Args:
+        system_prompt: System instruction describing the task and schema
+        user_prompt: User content including the document text
+        cached_content: Optional cached context handle (see model_request)
+        
+    Returns:
+        Dict parsed from the model's JSON response
+    """
+    action = PROMPT_ACTIONS.get(system_prompt, 'other')
+    route, tokens = route_call(action, user_prompt, cached_content)
+    for model in route.models:
+        started = time.perf_counter()
+        try:
+            response = await client.aio.models.generate_content(**model_request(system_prompt, user_prompt,
+                                                                                 cached_content, model))
+            break
+        except Exception as e:
+            if not record_fallback(action, model, route, e):
+                raise
+    seconds = time.perf_counter() - started
+    MODEL_SECONDS.observe(seconds, action=action, mode='async', model=model)
+    model_router.record_success(model, tokens, seconds)
+    
+    record_model_usage(action, system_prompt, user_prompt, response.text or '',
+                       getattr(response, 'usage_metadata', None))
+    with stage('parse_json'):
+        return json.loads(response.text or '{}')
+
+# Error message and empty response fields for each action when analysis fails
+ACTION_ERRORS = {
+    'simplify': ("Failed to simplify document", ('simplified_text',), MERGED_LIST_FIELDS),
+    'summarize': ("Failed to summarize document", ('summary',), MERGED_LIST_FIELDS),
+    'analyze': ("Failed to analyze document", ('simplified_text', 'summary'), MERGED_LIST_FIELDS),
+    'question': ("Failed to answer question", ('answer',), ('relevant_clauses', 'risks', 'recommendations'))
+}
+
+def error_result(action: str, error: Exception) -> Dict[str, Any]:
+    """
+    Build the result returned when an action fails, shaped like a successful result.
+    
+    Args:
+        action: One of 'simplify', 'summarize', 'analyze' or 'question'
+        error: The exception that caused the failure
+        
+    Returns:
+        Dict with an error message, empty text fields and empty lists
+    """
+    message, text_fields, list_fields = ACTION_ERRORS[action]
+    result = {"error": f"{message}: {str(error)}"}
+    result.update({field: None for field in text_fields})
+    result.update({field: [] for field in list_fields})
+    return result
+
+def result_cache_key(document_text: str, action: str, question: Optional[str] = None) -> str:
+    """
+    Build the result cache key for an action on a document with the current model and prompts.
+    """
+    return make_cache_key(compute_document_id(document_text), action, question,
+                          model_router.policy, PROMPT_VERSION)
+
+def coalesce(cache_key: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run an uncached analysis once for all concurrent requests with the same cache key.
+
+    Args:
+        cache_key: Result cache key of the analysis
+        compute: Runs the analysis and caches its result
+
+    Returns:
+        Dict with the analysis result
+    """
+    return single_flight.do(cache_key, compute, lambda: result_cache.get(cache_key))
+
+def merge_unique(lists: List[List[str]]) -> List[str]:
+    """
+    Concatenate lists of strings, dropping case/whitespace-insensitive duplicates.
+    
+    Args:
+        lists: Lists of strings in priority order
+        
+    Returns:
+        List[str]: Merged list preserving first-seen order
+    """
+    seen = set()
+    merged = []
+    for items in lists:
+        for item in items or []:
+            if not isinstance(item, str):
+                continue
+            key = " ".join(item.lower().split()).rstrip('.')
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+def analyze_in_chunks(system_prompt: str, chunks: List[str], text_fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Map-reduce analysis of a document that is too large for a single prompt.
+    
+    Each chunk is analyzed concurrently (at most CHUNK_PARALLELISM at a time),
+    chunks with the most red flags first so a slow or failing tail hits the
+    least important parts of the document. The reduce step joins the per-chunk text fields in document order and
+    merges the risks/obligations/key_points lists without duplicates.
+    
+    Args:
+        system_prompt: System instruction for the action
+        chunks: Document chunks in order
+        text_fields: Names of the free-text fields to join (e.g. ('summary',))
+        
+    Returns:
+        Dict with the merged analysis
+    """
+    def analyze_chunk(numbered_chunk):
+        index, chunk = numbered_chunk
+        user_prompt = f"Document excerpt (part {index} of {len(chunks)}):\n{chunk}"
+        try:
+            return generate_json(system_prompt, user_prompt, routing_tokens=total_tokens)
+        except Exception as e:
+            logger.warning(f"Chunk {index} of {len(chunks)} failed: {str(e)}")
+            return e
+    
+    # Chunks are routed by the whole document's size so every part gets the same model tier
+    total_tokens = sum(count_tokens(chunk) for chunk in chunks)
+    order = prioritize_chunks(chunks)
+    logger.info(f"Analyzing {len(chunks)} chunks with parallelism {CHUNK_PARALLELISM}")
+    with ThreadPoolExecutor(max_workers=max(1, CHUNK_PARALLELISM)) as executor:
+        results = executor.map(analyze_chunk, ((position + 1, chunks[position]) for position in order))
+        chunk_results = [None] * len(chunks)
+        for position, chunk_result in zip(order, results):
+            chunk_results[position] = chunk_result
+    
+    return merge_chunk_results(chunk_results, text_fields)
+
+def merge_chunk_results(chunk_results: List[Any], text_fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Reduce step of the map-reduce analysis.
+    
+    Args:
+        chunk_results: Per-chunk result dicts, or the exception a chunk failed with
+        text_fields: Names of the free-text fields to join
+        
+    Returns:
+        Dict with the merged analysis, marked 'partial' if some chunks failed
+        
+    Raises:
+        Exception: The first chunk's error if every chunk failed
+    """
+    successes = [r for r in chunk_results if not isinstance(r, Exception)]
+    if not successes:
+        raise chunk_results[0]
+    
+    merged = {
+        field: "\n\n".join(r[field].strip() for r in successes if r.get(field))
+        for field in text_fields
+    }
+    for field in MERGED_LIST_FIELDS:
+        merged[field] = merge_unique([r.get(field) for r in successes])
+    
+    failed = len(chunk_results) - len(successes)
+    if failed:
+        merged['key_points'].append(
+            f"Note: {failed} of {len(chunk_results)} parts of this document could not be analyzed."
         )
+        # Shown to the user, but never cached or reused (see store_result)
+        merged['partial'] = True
+    return merged
+
+def plan_document_prompt(system_prompt: str, document_text: str, question: Optional[str] = None) -> PromptPlan:
+    """
+    Pick the strategy for sending a document to the model within the prompt budget.
+    
+    Args:
+        system_prompt: System instruction for the action
+        document_text: Raw legal document text
+        question: User's question, for the question action
+        
+    Returns:
+        PromptPlan: 'single' or 'map_reduce' for document actions, 'single' or 'retrieval' for questions
+    """
+    overhead_tokens = count_tokens(system_prompt) + PROMPT_FRAMING_TOKENS
+    if question is not None:
+        overhead_tokens += count_tokens(question)
+    plan = plan_prompt(document_tokens(document_text), overhead_tokens, prompt_token_budget(CHUNK_MAX_TOKENS),
+                       question=question is not None, retrieval_min_tokens=RETRIEVAL_MIN_TOKENS,
+                       retrieval_max_tokens=RETRIEVAL_MAX_TOKENS)
+    PROMPT_STRATEGIES.inc(action=PROMPT_ACTIONS.get(system_prompt, 'other'), strategy=plan.strategy)
+    return plan
+
+def chunk_for_plan(document_text: str, plan: PromptPlan) -> List[str]:
+    """Split a document into chunks of at most plan.context_tokens tokens."""
+    return chunk_text(document_text, plan.context_tokens)
+
+def analyze_document_text(system_prompt: str, document_text: str, text_fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    Analyze a document in a single call, or chunk by chunk if it does not fit the prompt budget.
+    
+    Args:
+        system_prompt: System instruction for the action
+        document_text: Raw legal document text
+        text_fields: Names of the free-text fields in the response schema
         
-        result = json.loads(response.text or '{}')
+    Returns:
+        Dict with the model's analysis
+    """
+    plan = plan_document_prompt(system_prompt, document_text)
+    if plan.strategy == 'map_reduce':
+        chunks = chunk_for_plan(document_text, plan)
+        if len(chunks) > 1:
+            return analyze_in_chunks(system_prompt, chunks, text_fields)
+    
+    return generate_json(system_prompt, f"Document to analyze:\n{document_text}")
+
+def build_question_context(document_text: str, question: str,
+                           clause_index: Optional[ClauseIndex] = None) -> str:
+    """
+    Build the document context sent with a question.
+    
+    Small documents are sent whole. For larger ones the top-ranked sections
+    from the clause index are sent, labelled with their section IDs, up to
+    the context budget from plan_document_prompt().
+    
+    Args:
+        document_text: Raw legal document text
+        question: User's question about the document
+        clause_index: Prebuilt index for the document, built on demand if None
         
-        # Format the answer with proper HTML formatting
-        if result.get('answer'):
-            result['answer'] = format_text_with_paragraphs(result['answer'])
+    Returns:
+        str: The document portion of the user prompt
+    """
+    plan = plan_document_prompt(QUESTION_SYSTEM_PROMPT, document_text, question)
+    if plan.strategy == 'single':
+        return f"Document:\n{document_text}"
+    
+    if clause_index is None:
+        clause_index = ClauseIndex.build(document_text)
+    
+    selected = []
+    used_tokens = 0
+    for position, _ in clause_index.search(question, RETRIEVAL_TOP_K):
+        section = clause_index.section(document_text, position)
+        section_tokens = count_tokens(section.text)
+        if used_tokens + section_tokens > plan.context_tokens:
+            if not selected:
+                # A best match larger than the whole budget (e.g. a text without headings) is trimmed, never sent whole
+                selected.append((position, section._replace(
+                    text=trim_to_tokens(section.text, plan.context_tokens - used_tokens))))
+            break
+        selected.append((position, section))
+        used_tokens += section_tokens
+    
+    if not selected:
+        logger.debug("No matching sections for question, sending truncated document")
+        return f"Document:\n{trim_to_tokens(document_text, plan.context_tokens)}"
+    
+    excerpts = []
+    for _, section in sorted(selected, key=lambda item: item[0]):
+        label = f"[{section.section_id}, page {section.page}]" if section.page else f"[{section.section_id}]"
+        excerpts.append(f"{label}\n{section.text.strip()}")
+    
+    logger.debug(f"Sending {len(excerpts)} of {len(clause_index.sections)} sections as question context")
+    return (
+        "Document excerpts (the sections of a longer document most relevant to the question, "
+        "labelled with section IDs; start each relevant_clauses entry with its section ID in brackets):\n"
+        + "\n\n".join(excerpts)
+    )
+
+def simplify_legal_text(document_text: str) -> Dict[str, Any]:
+    """
+    Simplify legal document text into plain language.
+    
+    Args:
+        document_text: Raw legal document text
         
-        return result
+    Returns:
+        Dict containing simplified text, risks, obligations, and key points
+    """
+    cache_key = result_cache_key(document_text, 'simplify')
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Result cache hit for simplify")
+        return cached_result
+
+    def simplify() -> Dict[str, Any]:
+        try:
+            reused = reuse_near_duplicate(document_text, 'simplify')
+            if reused is not None:
+                return reused
+        
+            result = analyze_document_text(SIMPLIFY_SYSTEM_PROMPT, document_text, ('simplified_text',))
+        
+            # Format the simplified text with proper HTML formatting
+            if result.get('simplified_text'):
+                result['simplified_text'] = format_text_with_paragraphs(result['simplified_text'])
+        
+            store_result(document_text, 'simplify', cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error simplifying legal text: {str(e)}")
+            return error_result('simplify', e)
+
+    return coalesce(cache_key, simplify)
+
+def summarize_document(document_text: str) -> Dict[str, Any]:
+    """
+    Generate an executive summary of the legal document.
+    
+    Args:
+        document_text: Raw legal document text
+        
+    Returns:
+        Dict containing summary, risks, obligations, and key points
+    """
+    cache_key = result_cache_key(document_text, 'summarize')
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Result cache hit for summarize")
+        return cached_result
+
+    def summarize() -> Dict[str, Any]:
+        try:
+            reused = reuse_near_duplicate(document_text, 'summarize')
+            if reused is not None:
+                return reused
+        
+            result = analyze_document_text(SUMMARIZE_SYSTEM_PROMPT, document_text, ('summary',))
+        
+            # Format the summary with proper HTML formatting
+            if result.get('summary'):
+                result['summary'] = format_text_with_paragraphs(result['summary'])
+        
+            store_result(document_text, 'summarize', cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error summarizing document: {str(e)}")
+            return error_result('summarize', e)
+
+    return coalesce(cache_key, summarize)
+
+def analyze_document(document_text: str) -> Dict[str, Any]:
+    """
+    Produce simplified text, executive summary, risks, obligations and key points in one call.
+    
+    The combined result also seeds the simplify and summarize cache entries,
+    so switching to either view afterwards costs no extra model call.
+    
+    Args:
+        document_text: Raw legal document text
+        
+    Returns:
+        Dict containing simplified text, summary, risks, obligations, and key points
+    """
+    cache_key = result_cache_key(document_text, 'analyze')
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Result cache hit for analyze")
+        return cached_result
+
+    def analyze() -> Dict[str, Any]:
+        try:
+            reused = reuse_near_duplicate(document_text, 'analyze')
+            if reused is not None:
+                return reused
+        
+            result = analyze_document_text(ANALYZE_SYSTEM_PROMPT, document_text, ('simplified_text', 'summary'))
+        
+            # Format the text fields with proper HTML formatting
+            for field in ('simplified_text', 'summary'):
+                if result.get(field):
+                    result[field] = format_text_with_paragraphs(result[field])
+        
+            store_result(document_text, 'analyze', cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error analyzing document: {str(e)}")
+            return error_result('analyze', e)
+
+    return coalesce(cache_key, analyze)
+
+def store_result(document_text: str, action: str, cache_key: str, result: Dict[str, Any]) -> None:
+    """
+    Cache a model result and offer its document as a near-duplicate base.
+    
+    Partial results (some chunks failed) are only returned, so the next
+    request retries the analysis instead of being served the gap.
+    
+    Args:
+        document_text: Raw legal document text
+        action: One of 'simplify', 'summarize', 'analyze' or 'question'
+        cache_key: Result cache key of the request
+        result: Formatted result
+    """
+    if result.get('partial'):
+        logger.info(f"Not caching partial {action} result")
+        return
+    result_cache.set(cache_key, result)
+    if action == 'analyze':
+        seed_single_view_results(document_text, result)
+    if action != 'question':
+        index_analyzed_document(document_text)
+
+def seed_single_view_results(document_text: str, result: Dict[str, Any]) -> None:
+    """
+    Cache the simplify and summarize views derived from a full analysis result.
+    
+    Args:
+        document_text: Raw legal document text
+        result: Successful, formatted result of the analyze action
+    """
+    shared = {field: result.get(field, []) for field in MERGED_LIST_FIELDS}
+    if result.get('simplified_text'):
+        result_cache.set(result_cache_key(document_text, 'simplify'),
+                         dict(shared, simplified_text=result['simplified_text']))
+    if result.get('summary'):
+        result_cache.set(result_cache_key(document_text, 'summarize'),
+                         dict(shared, summary=result['summary']))
+
+def generate_question_json(document_text: str, query: str, user_prompt: str,
+                           clause_index: Optional[ClauseIndex] = None) -> Dict[str, Any]:
+    """
+    Send a question prompt, through the document's cached context when there is one.
+    
+    With a cached context only the user prompt is sent; otherwise the document
+    (or its sections most relevant to the query) goes with it, as before. A
+    cached context the model rejects is dropped and the prompt is resent with
+    the document.
+    
+    Args:
+        document_text: Raw legal document text
+        query: Text used to select sections of long documents
+        user_prompt: The question(s) and any response instructions
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Returns:
+        Dict parsed from the model's JSON response
+    """
+    document_id = compute_document_id(document_text)
+    cached_content = context_cache.handle(document_id, document_text)
+    if cached_content:
+        try:
+            return generate_json(QUESTION_SYSTEM_PROMPT, user_prompt, cached_content)
+        except Exception as e:
+            logger.warning(f"Cached context {cached_content} failed, sending the document instead: {str(e)}")
+            context_cache.invalidate(document_id)
+    
+    context = build_question_context(document_text, query, clause_index)
+    return generate_json(QUESTION_SYSTEM_PROMPT, f"{context}\n\n{user_prompt}")
+
+def generate_answer(document_text: str, question: str,
+                    clause_index: Optional[ClauseIndex] = None) -> Dict[str, Any]:
+    """
+    Ask the model a question about a document; see generate_question_json().
+    """
+    return generate_question_json(document_text, question, f"Question: {question}", clause_index)
+
+async def generate_answer_async(document_text: str, question: str,
+                                clause_index: Optional[ClauseIndex] = None) -> Dict[str, Any]:
+    """
+    Async version of generate_answer(); registering a cached context runs on a worker thread.
+    """
+    document_id = compute_document_id(document_text)
+    cached_content = await asyncio.to_thread(context_cache.handle, document_id, document_text)
+    if cached_content:
+        try:
+            return await generate_json_async(QUESTION_SYSTEM_PROMPT, f"Question: {question}", cached_content)
+        except Exception as e:
+            logger.warning(f"Cached context {cached_content} failed, sending the document instead: {str(e)}")
+            context_cache.invalidate(document_id)
+    
+    context = build_question_context(document_text, question, clause_index)
+    return await generate_json_async(QUESTION_SYSTEM_PROMPT, f"{context}\n\nQuestion: {question}")
+
+def answer_question(document_text: str, question: str,
+                    clause_index: Optional[ClauseIndex] = None) -> Dict[str, Any]:
+    """
+    Answer specific questions about the legal document.
+    
+    Args:
+        document_text: Raw legal document text
+        question: User's question about the document
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Returns:
+        Dict containing the answer and related information
+    """
+    cache_key = result_cache_key(document_text, 'question', question)
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Result cache hit for question")
+        return cached_result
+
+    def answer() -> Dict[str, Any]:
+        try:
+            result = generate_answer(document_text, question, clause_index)
+        
+            # Format the answer with proper HTML formatting
+            if result.get('answer'):
+                result['answer'] = format_text_with_paragraphs(result['answer'])
+        
+            result_cache.set(cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error answering question: {str(e)}")
+            return error_result('question', e)
+
+    return coalesce(cache_key, answer)
+
+def generate_answers(document_text: str, questions: List[str],
+                     clause_index: Optional[ClauseIndex] = None) -> List[Optional[Dict[str, Any]]]:
+    """
+    Ask the model several questions about a document in one call.
+    
+    Args:
+        document_text: Raw legal document text
+        questions: Questions about the document
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Returns:
+        The model's answer for each question in order, None where it gave none
+    """
+    user_prompt = QUESTION_BATCH_INSTRUCTIONS + "\n\nQuestions:\n" + "\n".join(
+        f"[Q{number}] {question}" for number, question in enumerate(questions, 1)
+    )
+    # Long documents send the sections matching any of the questions
+    response = generate_question_json(document_text, "\n".join(questions), user_prompt, clause_index)
+    by_id = {item.get('question_id'): item for item in response.get('answers', []) if isinstance(item, dict)}
+    return [by_id.get(f"Q{number}") for number in range(1, len(questions) + 1)]
+
+def answer_questions(document_text: str, questions: List[str],
+                     clause_index: Optional[ClauseIndex] = None) -> List[Dict[str, Any]]:
+    """
+    Answer a list of questions about the legal document, several per model call.
+    
+    Questions already answered for this document come from the result cache.
+    The rest are sent in sub-batches of QUESTION_BATCH_SIZE, concurrently,
+    and each answer is cached as if it had been asked on its own. A question
+    the model skipped is asked again by itself.
+    
+    Args:
+        document_text: Raw legal document text
+        questions: User's questions about the document
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Returns:
+        List of results shaped like answer_question()'s, in question order
+    """
+    results = {}
+    pending = []
+    for question in dict.fromkeys(questions):
+        cached_result = result_cache.get(result_cache_key(document_text, 'question', question))
+        if cached_result is not None:
+            results[question] = cached_result
+        else:
+            pending.append(question)
+    
+    batch_size = max(1, QUESTION_BATCH_SIZE)
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    
+    def answer_batch(batch):
+        try:
+            answers = generate_answers(document_text, batch, clause_index)
+        except Exception as e:
+            logger.error(f"Error answering questions: {str(e)}")
+            return [(question, error_result('question', e)) for question in batch]
+        
+        batch_results = []
+        for question, answer in zip(batch, answers):
+            if answer is None:
+                logger.warning(f"No answer returned for question in batch, asking it alone: {question}")
+                batch_results.append((question, answer_question(document_text, question, clause_index)))
+                continue
+            result = {
+                'answer': format_text_with_paragraphs(answer.get('answer') or ''),
+                **{field: merge_unique([answer.get(field)]) for field in ('relevant_clauses', 'risks', 'recommendations')}
+            }
+            result_cache.set(result_cache_key(document_text, 'question', question), result)
+            batch_results.append((question, result))
+        return batch_results
+    
+    if batches:
+        logger.info(f"Answering {len(pending)} questions in {len(batches)} batches, {len(results)} cached")
+        with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_PARALLELISM, len(batches)))) as executor:
+            for batch_results in executor.map(answer_batch, batches):
+                results.update(batch_results)
+    
+    return [results[question] for question in questions]
+
+def clause_cache_key(clause: Clause) -> str:
+    """Result cache key for a single clause; shared by every document version containing it."""
+    return make_cache_key(clause.fingerprint, 'clause', None, model_router.policy, PROMPT_VERSION)
+
+def analyze_clauses(clauses: List[Clause]) -> Tuple[Dict[str, Dict[str, Any]], List[Clause]]:
+    """
+    Analyze clauses individually, reusing cached analyses from any earlier version.
+    
+    Clauses without a cached analysis are batched into prompts of at most
+    CHUNK_MAX_TOKENS and sent concurrently.
+    
+    Args:
+        clauses: Clauses to analyze
+        
+    Returns:
+        Tuple of per-clause analyses keyed by fingerprint and the clauses sent to the model
+    """
+    analyses = {}
+    missing = []
+    for clause in clauses:
+        if clause.fingerprint in analyses:
+            continue
+        cached_result = result_cache.get(clause_cache_key(clause))
+        if cached_result is not None:
+            analyses[clause.fingerprint] = cached_result
+        elif all(clause.fingerprint != other.fingerprint for other in missing):
+            missing.append(clause)
+    
+    batches = []
+    current = []
+    used_tokens = 0
+    for clause in missing:
+        clause_tokens = count_tokens(clause.text)
+        if current and used_tokens + clause_tokens > CHUNK_MAX_TOKENS:
+            batches.append(current)
+            current, used_tokens = [], 0
+        current.append(clause)
+        used_tokens += clause_tokens
+    if current:
+        batches.append(current)
+    
+    def analyze_batch(batch):
+        # IDs are numbered per batch, since clauses of two versions can share their clause_id
+        user_prompt = "Clauses to analyze:\n\n" + "\n\n".join(
+            f"[C{number}]\n{clause.text}" for number, clause in enumerate(batch, 1)
+        )
+        by_id = {item.get('clause_id'): item for item in generate_json(CLAUSE_SYSTEM_PROMPT, user_prompt).get('clauses', [])
+                 if isinstance(item, dict)}
+        return [(clause, by_id.get(f"C{number}")) for number, clause in enumerate(batch, 1)]
+    
+    if batches:
+        logger.info(f"Analyzing {len(missing)} clauses in {len(batches)} batches, {len(analyses)} reused")
+        with ThreadPoolExecutor(max_workers=max(1, CHUNK_PARALLELISM)) as executor:
+            for batch_results in executor.map(analyze_batch, batches):
+                for clause, analysis in batch_results:
+                    if analysis is None:
+                        logger.warning(f"No analysis returned for clause {clause.clause_id}")
+                        continue
+                    analysis = {
+                        'simplified_text': format_text_with_paragraphs(analysis.get('simplified_text') or ''),
+                        **{field: merge_unique([analysis.get(field)]) for field in MERGED_LIST_FIELDS}
+                    }
+                    analyses[clause.fingerprint] = analysis
+                    result_cache.set(clause_cache_key(clause), analysis)
+    
+    return analyses, missing
+
+def review_revision(previous_text: str, revised_text: str) -> Dict[str, Any]:
+    """
+    Review a revised version of a document against an earlier version.
+    
+    Only changed clauses are analyzed: the added and modified clauses of the
+    revised version and the clauses they replace or that were removed, so
+    resolved risks are known even on a first comparison. Clauses unchanged
+    since the earlier version cost nothing; their analyses are taken from
+    the cache when an earlier review produced them, and merged with the
+    changed clauses into the risks, obligations and key points of the whole
+    revised version. Clause analyses cached from any previous review are reused.
+    
+    Args:
+        previous_text: Text of the earlier version
+        revised_text: Text of the revised version
+        
+    Returns:
+        Dict containing the changes, their risks, obligations and key points
+    """
+    cache_key = result_cache_key(revised_text, 'compare', compute_document_id(previous_text))
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug("Result cache hit for revision review")
+        return cached_result
+    
+    def review() -> Dict[str, Any]:
+        try:
+            previous = split_into_clauses(previous_text)
+            current = split_into_clauses(revised_text)
+            changes = diff_clauses(previous, current)
+        
+            changed = [change.clause for change in changes if change.clause]
+            replaced = [change.previous for change in changes if change.previous]
+            analyses, sent = analyze_clauses(changed + replaced)
+            missing = {clause.fingerprint for clause in changed + replaced} - analyses.keys()
+        
+            change_entries = []
+            for change in changes:
+                analysis = analyses.get(change.clause.fingerprint, {}) if change.clause else {}
+                change_entries.append({
+                    "change": change.change,
+                    "heading": (change.clause or change.previous).heading,
+                    "previous_heading": change.previous.heading if change.previous else None,
+                    "simplified_text": analysis.get('simplified_text'),
+                    **{field: analysis.get(field, []) for field in MERGED_LIST_FIELDS}
+                })
+        
+            # Unchanged clauses are never sent; only analyses cached by earlier reviews are merged in
+            version_analyses = {}
+            for clause in current:
+                if clause.fingerprint in version_analyses:
+                    continue
+                analysis = analyses.get(clause.fingerprint) or result_cache.get(clause_cache_key(clause))
+                if analysis is not None:
+                    version_analyses[clause.fingerprint] = analysis
+        
+            risks = merge_unique([analysis.get('risks') for analysis in version_analyses.values()])
+            remaining = {" ".join(risk.lower().split()).rstrip('.') for risk in risks}
+            resolved_risks = [risk for risk in merge_unique([analyses.get(clause.fingerprint, {}).get('risks')
+                                                             for clause in replaced])
+                              if " ".join(risk.lower().split()).rstrip('.') not in remaining]
+        
+            counts = {kind: sum(1 for change in changes if change.change == kind)
+                      for kind in ('modified', 'added', 'removed')}
+            summary = (f"{counts['modified']} clauses modified, {counts['added']} added and {counts['removed']} removed "
+                       f"out of {len(current)} clauses in the revised version.")
+            covered = sum(1 for clause in current if clause.fingerprint in version_analyses)
+            if covered < len(current):
+                summary += f" Risks, obligations and key points cover the {covered} of them reviewed so far."
+            changed_prints = {clause.fingerprint for clause in changed}
+        
+            result = {
+                "summary": format_text_with_paragraphs(summary),
+                "changes": change_entries,
+                "risks": risks,
+                "obligations": merge_unique([analysis.get('obligations') for analysis in version_analyses.values()]),
+                "key_points": merge_unique([analysis.get('key_points') for analysis in version_analyses.values()]),
+                "resolved_risks": resolved_risks,
+                "clauses_total": len(current),
+                "clauses_changed": len(changes),
+                "clauses_analyzed": sum(1 for clause in sent if clause.fingerprint in changed_prints)
+            }
+        
+            if missing:
+                result['key_points'].append(
+                    f"Note: {len(missing)} changed clauses could not be analyzed."
+                )
+                # Shown to the user, but never cached, so the next review retries them
+                result['partial'] = True
+                logger.info("Not caching partial revision review")
+            else:
+                result_cache.set(cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error reviewing revision: {str(e)}")
+            return {
+                "error": f"Failed to compare document versions: {str(e)}",
+                "summary": None,
+                "changes": [],
+                "risks": [],
+                "obligations": [],
+                "key_points": []
+            }
+
+    return coalesce(cache_key, review)
+
+def set_document_source(loader: Optional[Callable[[str], Optional[str]]]) -> None:
+    """
+    Set how earlier documents are loaded for near-duplicate reuse.
+    
+    Args:
+        loader: Returns a document's text by ID, or None when it is no longer stored;
+            None disables near-duplicate reuse
+    """
+    global document_source
+    document_source = loader
+
+def index_analyzed_document(document_text: str) -> None:
+    """
+    Make a document whose analysis came from the model available as a base for near-duplicates.
+    
+    Args:
+        document_text: Raw legal document text
+    """
+    if similarity_index is None:
+        return
+    try:
+        similarity_index.add(compute_document_id(document_text), document_text, owner=similarity_owner())
+    except Exception as e:
+        logger.warning(f"Could not index document for near-duplicate lookup: {str(e)}")
+
+def revise_near_duplicate(action: str, previous_result: Dict[str, Any],
+                          changes: List[ClauseChange]) -> Dict[str, Any]:
+    """
+    Update an earlier document's result for the clauses that differ from it.
+    
+    The model gets the earlier result and the added, changed and removed
+    clauses instead of the whole document, and rewrites the result: text
+    fields are regenerated and list items from changed or removed clauses
+    dropped, so nothing is carried over that no longer holds.
+    
+    Args:
+        action: One of 'simplify', 'summarize' or 'analyze'
+        previous_result: Cached result of the action for the earlier document
+        changes: Clause differences from the earlier document
+        
+    Returns:
+        Dict shaped like the action's result
+    """
+    _, text_fields, list_fields = ACTION_ERRORS[action]
+    earlier = {field: previous_result.get(field) for field in text_fields + list_fields}
+    
+    described = []
+    for change in changes:
+        clause = change.clause or change.previous
+        label = clause.heading or clause.clause_id
+        if change.change == 'removed':
+            described.append(f"[Removed: {label}]\n{change.previous.text}")
+        elif change.change == 'modified':
+            described.append(f"[Changed: {label}]\nBefore:\n{change.previous.text}\nAfter:\n{change.clause.text}")
+        else:
+            described.append(f"[Added: {label}]\n{change.clause.text}")
+    
+    user_prompt = (f"Earlier analysis:\n{json.dumps(earlier, indent=2)}\n\n"
+                   f"Clause changes:\n\n" + "\n\n".join(described) + f"\n\n{REVISION_INSTRUCTIONS}")
+    result = generate_json(STREAM_ACTIONS[action][0], user_prompt)
+    for field in text_fields:
+        if result.get(field):
+            result[field] = format_text_with_paragraphs(result[field])
+    return result
+
+def reuse_near_duplicate(document_text: str, action: str) -> Optional[Dict[str, Any]]:
+    """
+    Build an action's result from a near-identical document analyzed earlier.
+    
+    Documents above SIMILARITY_THRESHOLD indexed for the same owner (see
+    set_similarity_owner) are looked up in the similarity index. The first
+    one with a cached result for the action and a stored text is diffed
+    clause by clause; if few enough clauses changed, the earlier result is
+    revised for just those clauses (see revise_near_duplicate) and cached
+    for this document.
+    
+    Args:
+        document_text: Raw legal document text
+        action: One of 'simplify', 'summarize' or 'analyze'
         
+    Returns:
+        Optional[Dict]: The merged result, or None when the document needs a full analysis
+    """
+    if similarity_index is None or document_source is None:
+        return None
+    
+    document_id = compute_document_id(document_text)
+    try:
+        matches = similarity_index.query(document_text, SIMILARITY_THRESHOLD, owner=similarity_owner())
     except Exception as e:
-        logger.error(f"Error answering question: {str(e)}")
-        return {
-            "error": f"Failed to answer question: {str(e)}",
-            "answer": None,
-            "relevant_clauses": [],
-            "risks": [],
-            "recommendations": []
+        logger.warning(f"Near-duplicate lookup failed: {str(e)}")
+        return None
+    
+    outcome = 'miss'
+    current = None
+    for previous_id, similarity in matches:
+        if previous_id == document_id:
+            continue
+        previous_result = result_cache.get(make_cache_key(previous_id, action, None, model_router.policy, PROMPT_VERSION))
+        # Only results of a full analysis are reused, so differences never accumulate
+        if not previous_result or previous_result.get('error') or previous_result.get('near_duplicate'):
+            continue
+        previous_text = document_source(previous_id)
+        if not previous_text:
+            continue
+        
+        current = current or split_into_clauses(document_text)
+        changes = diff_clauses(split_into_clauses(previous_text), current)
+        if len(changes) > SIMILARITY_MAX_CHANGED * len(current):
+            logger.debug(f"Near-duplicate {previous_id[:12]} differs in {len(changes)} of {len(current)} clauses")
+            outcome = 'too_different'
+            continue
+        
+        try:
+            result = revise_near_duplicate(action, previous_result, changes) if changes else dict(previous_result)
+        except Exception as e:
+            logger.warning(f"Could not revise the result of near-duplicate {previous_id[:12]}: {str(e)}")
+            NEAR_DUPLICATE_LOOKUPS.inc(result='failed')
+            return None
+        result['near_duplicate'] = {
+            'document_id': previous_id,
+            'similarity': round(similarity, 3),
+            'clauses_changed': len(changes)
         }
+        logger.info(f"Reusing {action} result of near-duplicate {previous_id[:12]} ({similarity:.0%} similar), "
+                    f"{len(changes)} clauses changed")
+        NEAR_DUPLICATE_LOOKUPS.inc(result='reused')
+        result_cache.set(result_cache_key(document_text, action), result)
+        if action == 'analyze':
+            seed_single_view_results(document_text, result)
+        return result
+    
+    NEAR_DUPLICATE_LOOKUPS.inc(result=outcome)
+    return None
+
+# Streamable actions: system prompt, free-text fields and the equivalent blocking function
+STREAM_ACTIONS = {
+    'simplify': (SIMPLIFY_SYSTEM_PROMPT, ('simplified_text',), simplify_legal_text),
+    'summarize': (SUMMARIZE_SYSTEM_PROMPT, ('summary',), summarize_document),
+    'analyze': (ANALYZE_SYSTEM_PROMPT, ('simplified_text', 'summary'), analyze_document),
+    'question': (QUESTION_SYSTEM_PROMPT, ('answer',), answer_question)
+}
+
+def _result_events(result: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Replay a complete result as stream events."""
+    for key, value in result.items():
+        if isinstance(value, list):
+            for item in value:
+                yield 'item', {"field": key, "value": item}
+        elif key != 'error':
+            yield 'value', {"field": key, "value": value}
+    yield 'done', result
+
+def stream_analysis(document_text: str, action: str, question: Optional[str] = None,
+                    clause_index: Optional[ClauseIndex] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Run an action with streamed generation, yielding fields as soon as they complete.
+    
+    Events are (name, payload) tuples:
+    - ('value', {"field", "value"}) for a finished top-level field such as the summary
+    - ('item', {"field", "value"}) for each finished list entry, e.g. one risk
+    - ('done', result) with the final result dict, formatted like the blocking functions
+    - ('error', {"error"}) if the analysis failed
+    
+    Cached results and documents that need map-reduce analysis are produced
+    by the blocking function and replayed as events.
+    
+    Args:
+        document_text: Raw legal document text
+        action: One of 'simplify', 'summarize', 'analyze' or 'question'
+        question: User's question for the 'question' action
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Yields:
+        Tuple[str, Any]: Stream events
+    """
+    system_prompt, text_fields, blocking_function = STREAM_ACTIONS[action]
+    
+    cache_key = result_cache_key(document_text, action, question if action == 'question' else None)
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug(f"Result cache hit for streamed {action}")
+        yield from _result_events(cached_result)
+        return
+    
+    if action != 'question':
+        reused = reuse_near_duplicate(document_text, action)
+        if reused is not None:
+            yield from _result_events(reused)
+            return
+    
+    cached_content = None
+    if action == 'question':
+        cached_content = context_cache.handle(compute_document_id(document_text), document_text)
+        if cached_content:
+            user_prompt = f"Question: {question}"
+        else:
+            context = build_question_context(document_text, question, clause_index)
+            user_prompt = f"{context}\n\nQuestion: {question}"
+    elif plan_document_prompt(system_prompt, document_text).strategy == 'map_reduce':
+        yield from _result_events(blocking_function(document_text))
+        return
+    else:
+        user_prompt = f"Document to analyze:\n{document_text}"
+    
+    try:
+        parser = IncrementalJSONParser()
+        response_parts = []
+        for text in generate_json_stream(system_prompt, user_prompt, cached_content):
+            response_parts.append(text)
+            for event, key, value in parser.feed(text):
+                yield event, {"field": key, "value": value}
+        
+        result = json.loads("".join(response_parts) or '{}')
+        for field in text_fields:
+            if result.get(field):
+                result[field] = format_text_with_paragraphs(result[field])
+        
+        store_result(document_text, action, cache_key, result)
+        yield 'done', result
+        
+    except Exception as e:
+        logger.error(f"Error streaming {action}: {str(e)}")
+        if cached_content:
+            context_cache.invalidate(compute_document_id(document_text))
+        yield 'error', {"error": f"Failed to analyze document: {str(e)}"}
+
+async def run_action_async(document_text: str, action: str, question: Optional[str] = None,
+                           clause_index: Optional[ClauseIndex] = None) -> Dict[str, Any]:
+    """
+    Async equivalent of simplify_legal_text, summarize_document, analyze_document and answer_question.
+    
+    Uses the same prompts, cache entries and result shapes as the blocking
+    functions, but awaits the model so one event loop can serve many
+    analyses at once. Large documents are analyzed chunk by chunk with at
+    most CHUNK_PARALLELISM concurrent calls.
+    
+    Args:
+        document_text: Raw legal document text
+        action: One of 'simplify', 'summarize', 'analyze' or 'question'
+        question: User's question for the 'question' action
+        clause_index: Optional prebuilt clause index for long documents
+        
+    Returns:
+        Dict with the same fields as the corresponding blocking function
+    """
+    system_prompt, text_fields, _ = STREAM_ACTIONS[action]
+    
+    cache_key = result_cache_key(document_text, action, question if action == 'question' else None)
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logger.debug(f"Result cache hit for async {action}")
+        return cached_result
+    
+    async def run() -> Dict[str, Any]:
+        try:
+            if action == 'question':
+                result = await generate_answer_async(document_text, question, clause_index)
+            else:
+                reused = await asyncio.to_thread(reuse_near_duplicate, document_text, action)
+                if reused is not None:
+                    return reused
+            
+                chunks = [document_text]
+                plan = plan_document_prompt(system_prompt, document_text)
+                if plan.strategy == 'map_reduce':
+                    chunks = chunk_for_plan(document_text, plan)
+            
+                if len(chunks) == 1:
+                    result = await generate_json_async(system_prompt, f"Document to analyze:\n{document_text}")
+                else:
+                    limit = asyncio.Semaphore(max(1, CHUNK_PARALLELISM))
+                
+                    async def analyze_chunk(index, chunk):
+                        user_prompt = f"Document excerpt (part {index} of {len(chunks)}):\n{chunk}"
+                        async with limit:
+                            try:
+                                return await generate_json_async(system_prompt, user_prompt)
+                            except Exception as e:
+                                logger.warning(f"Chunk {index} of {len(chunks)} failed: {str(e)}")
+                                return e
+                
+                    # Coroutines queue on the semaphore in the order given, so flagged chunks go first
+                    order = prioritize_chunks(chunks)
+                    logger.info(f"Analyzing {len(chunks)} chunks with parallelism {CHUNK_PARALLELISM}")
+                    results = await asyncio.gather(*(analyze_chunk(position + 1, chunks[position])
+                                                     for position in order))
+                    chunk_results = [None] * len(chunks)
+                    for position, chunk_result in zip(order, results):
+                        chunk_results[position] = chunk_result
+                    result = merge_chunk_results(chunk_results, text_fields)
+        
+            for field in text_fields:
+                if result.get(field):
+                    result[field] = format_text_with_paragraphs(result[field])
+        
+            store_result(document_text, action, cache_key, result)
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error running async {action}: {str(e)}")
+            return error_result(action, e)
+
+    return await single_flight.do_async(cache_key, run, lambda: result_cache.get(cache_key))
 
 def format_text_with_paragraphs(text: str) -> str:
     """
@@ -236,17 +1508,19 @@ def format_text_with_paragraphs(text: str) -> str:
 
 def validate_gemini_connection() -> bool:
     """
-    Validate that Gemini API is accessible and working.
+    Validate that Gemini API is accessible and working for every routed model.
     
     Returns:
-        bool: True if connection is successful
+        bool: True if every model tier responds
     """
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents="Test connection"
-        )
-        return True
-    except Exception as e:
-        logger.error(f"Gemini connection failed: {str(e)}")
-        return False
+    connected = True
+    for model in model_router.models:
+        try:
+            client.models.generate_content(
+                model=model,
+                contents="Test connection"
+            )
+        except Exception as e:
+            logger.error(f"Gemini connection to {model} failed: {str(e)}")
+            connected = False
+    return connected
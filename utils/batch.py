@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.document_processor import DocumentSource, extract_text_from_file, extract_text_from_stream
+from utils.document_store import compute_document_id
+from utils.ai_processor import simplify_legal_text, summarize_document, analyze_document, answer_question
+from utils.history import HistoryEntry, HistoryStore
+
+logger = logging.getLogger(__name__)
+
+# Bulk review configuration
+BATCH_EXTRACT_PROCESSES = int(os.environ.get("BATCH_EXTRACT_PROCESSES", os.cpu_count() or 1))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 8))
+# Finished analyses saved to the history per transaction
+BATCH_HISTORY_SIZE = int(os.environ.get("BATCH_HISTORY_SIZE", 50))
+# History owner of command-line runs, searched with search_history.py
+BATCH_HISTORY_OWNER = os.environ.get("BATCH_HISTORY_OWNER", "batch")
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+BATCH_ACTIONS = {
+    'simplify': simplify_legal_text,
+    'summarize': summarize_document,
+    'analyze': analyze_document
+}
+
+def find_documents(inputs: Iterable[str]) -> List[str]:
+    """
+    Expand files and directories into a sorted list of supported documents.
+
+    Args:
+        inputs: File and directory paths; directories are searched recursively
+
+    Returns:
+        List[str]: Paths of PDF and TXT files
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, files in os.walk(entry):
+                for name in files:
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        paths.add(os.path.join(root, name))
+        elif entry.lower().endswith(SUPPORTED_EXTENSIONS):
+            paths.add(entry)
+        else:
+            logger.warning(f"Skipping unsupported file {entry}")
+    return sorted(paths)
+
+def read_completed(output_path: str) -> Set[str]:
+    """
+    Names of documents already analyzed successfully in an existing results file.
+
+    Args:
+        output_path: JSONL results file from a previous run
+
+    Returns:
+        Set[str]: Document names whose records have no error
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if not record.get('error'):
+                completed.add(record['document'])
+    return completed
+
+def extract_document(name: str, source: DocumentSource) -> str:
+    """
+    Extract text from a path or in-memory upload. Runs in worker processes.
+
+    Args:
+        name: Document name (the path for files on disk, the filename for uploads)
+        source: Path or raw bytes
+
+    Returns:
+        str: Extracted text
+    """
+    if isinstance(source, str):
+        return extract_text_from_file(source)
+    return extract_text_from_stream(source, name)
+
+class BatchRun:
+    """
+    Bulk analysis of many documents with results written as they complete.
+
+    Text extraction runs on a process pool (or inline threads when
+    extract_processes is 0) while model calls are dispatched on a thread
+    pool limited to concurrency in-flight documents. Each finished document
+    is appended to the JSONL output immediately, so an interrupted run can
+    be resumed and skips documents that already succeeded. With a history
+    store, successful analyses are also saved to it in bulk, for owner.
+    """
+
+    def __init__(self, action: str = 'summarize', question: Optional[str] = None,
+                 output_path: Optional[str] = None, resume: bool = True,
+                 extract_processes: int = BATCH_EXTRACT_PROCESSES, concurrency: int = BATCH_CONCURRENCY,
+                 history: Optional[HistoryStore] = None, owner: Optional[str] = None):
+        if action == 'question' and not question:
+            raise ValueError("A question is required for the question action")
+        if action != 'question' and action not in BATCH_ACTIONS:
+            raise ValueError(f"Unsupported batch action: {action}")
+
+        self.action = action
+        self.question = question
+        self.output_path = output_path
+        self.resume = resume
+        self.extract_processes = extract_processes
+        self.concurrency = concurrency
+        self.history = history
+        self.owner = owner
+        self._history_entries: List[HistoryEntry] = []
+        self.records: List[Dict[str, Any]] = []
+        self.total = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def progress(self) -> Dict[str, int]:
+        return {"total": self.total, "completed": len(self.records), "skipped": self.skipped}
+
+    def _analyze(self, name: str, document_text: str, started: float) -> Dict[str, Any]:
+        if self.action == 'question':
+            result = answer_question(document_text, self.question)
+        else:
+            result = BATCH_ACTIONS[self.action](document_text)
+
+        document_id = compute_document_id(document_text)
+        if self.history is not None and not result.get('error'):
+            with self._lock:
+                self._history_entries.append(HistoryEntry(document_id, os.path.basename(name), document_text,
+                                                          self.action, self.question, result, self.owner))
+                flush = len(self._history_entries) >= BATCH_HISTORY_SIZE
+            if flush:
+                self._flush_history()
+
+        return {
+            "document": name,
+            "document_id": document_id,
+            "action": self.action,
+            "question": self.question,
+            "result": result,
+            "error": result.get('error'),
+            "elapsed": round(time.time() - started, 3)
+        }
+
+    def _flush_history(self) -> None:
+        with self._lock:
+            entries, self._history_entries = self._history_entries, []
+        if not entries:
+            return
+        try:
+            self.history.record_many(entries)
+        except Exception as e:
+            logger.warning(f"Could not record {len(entries)} analyses in history: {str(e)}")
+
+    def _record(self, record: Dict[str, Any], output) -> None:
+        with self._lock:
+            self.records.append(record)
+            if output is not None:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+        status = "failed" if record.get('error') else "done"
+        logger.info(f"[{len(self.records)}/{self.total}] {record['document']} {status}")
+
+    def run(self, sources: List[Tuple[str, DocumentSource]]) -> List[Dict[str, Any]]:
+        """
+        Analyze every document and return the records produced by this run.
+
+        Args:
+            sources: (name, path or bytes) pairs
+
+        Returns:
+            List[Dict[str, Any]]: One record per processed document
+        """
+        if self.output_path and self.resume:
+            completed = read_completed(self.output_path)
+            remaining = [(name, source) for name, source in sources if name not in completed]
+            self.skipped = len(sources) - len(remaining)
+            if self.skipped:
+                logger.info(f"Resuming: skipping {self.skipped} already analyzed documents")
+            sources = remaining
+        self.total = len(sources)
+
+        output = open(self.output_path, 'a' if self.resume else 'w', encoding='utf-8') if self.output_path else None
+        if self.extract_processes > 0:
+            extract_pool = ProcessPoolExecutor(max_workers=self.extract_processes)
+        else:
+            extract_pool = ThreadPoolExecutor(max_workers=max(1, self.concurrency))
+
+        try:
+            with extract_pool, ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as model_pool:
+                started = {}
+                pending = {}
+                for name, source in sources:
+                    started[name] = time.time()
+                    pending[extract_pool.submit(extract_document, name, source)] = ('extract', name)
+
+                # Hand each extracted document to the model pool as soon as it is ready and
+                # write each analysis as soon as it finishes
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, name = pending.pop(future)
+                        try:
+                            value = future.result()
+                        except Exception as e:
+                            self._record({"document": name, "action": self.action, "question": self.question,
+                                          "result": None, "error": str(e),
+                                          "elapsed": round(time.time() - started[name], 3)}, output)
+                            continue
+                        if stage == 'extract':
+                            # Analyses run for the owner of the run (see set_similarity_owner)
+                            analysis = model_pool.submit(contextvars.copy_context().run,
+                                                         self._analyze, name, value, started[name])
+                            pending[analysis] = ('analyze', name)
+                        else:
+                            self._record(value, output)
+        finally:
+            if output is not None:
+                output.close()
+            if self.history is not None:
+                self._flush_history()
+
+        return self.records
@@ -0,0 +1,138 @@
+import re
+import logging
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional
+
+from utils.token_budget import TOKEN_PATTERN, count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Page markers inserted by extract_text_from_pdf
+PAGE_MARKER_PATTERN = re.compile(r'^--- Page (\d+) ---[ \t]*$', re.M)
+
+# Lines that open a new clause: "ARTICLE IV", "Section 3.", "12.", "4.2.1 Term", "7) Notices"
+CLAUSE_HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|EXHIBIT|Exhibit)\s+[\dIVXLCivxlc]+[.:]?'
+    r'|\d{1,3}(?:\.\d{1,3})+\.?'
+    r'|\d{1,3}[.)]'
+    r')[ \t]+\S',
+    re.M
+)
+
+class Section(NamedTuple):
+    """A page- or clause-delimited slice of a document."""
+    section_id: str
+    page: Optional[int]
+    heading: str
+    text: str
+    start: int
+
+def split_into_sections(text: str) -> List[Section]:
+    """
+    Split document text on page markers and clause headings.
+
+    Args:
+        text: Extracted document text
+
+    Returns:
+        List[Section]: Non-empty sections in document order
+    """
+    boundaries = {0}
+    pages = {}
+    for match in PAGE_MARKER_PATTERN.finditer(text):
+        boundaries.add(match.start())
+        pages[match.start()] = int(match.group(1))
+    for match in CLAUSE_HEADING_PATTERN.finditer(text):
+        boundaries.add(match.start())
+
+    offsets = sorted(boundaries)
+    offsets.append(len(text))
+
+    sections = []
+    current_page = None
+    for start, end in zip(offsets, offsets[1:]):
+        current_page = pages.get(start, current_page)
+        section_text = text[start:end]
+        if not section_text.strip():
+            continue
+
+        heading = ""
+        for line in section_text.splitlines():
+            line = line.strip()
+            if line and not PAGE_MARKER_PATTERN.match(line):
+                heading = line[:80]
+                break
+
+        sections.append(Section(
+            section_id=f"S{len(sections) + 1}",
+            page=current_page,
+            heading=heading,
+            text=section_text,
+            start=start
+        ))
+
+    return sections
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Split a single section that exceeds max_tokens on paragraph, then word boundaries."""
+    pieces = []
+    current = ""
+    current_tokens = 0
+    for paragraph in re.split(r'(?<=\n\n)', text):
+        starts = [match.start() for match in TOKEN_PATTERN.finditer(paragraph)]
+        offset = first = 0
+        while len(starts) - first > max_tokens:
+            # Cut at the first token past the budget, or at a space shortly before it
+            cut = starts[first + max_tokens]
+            space = paragraph.rfind(' ', offset, cut)
+            if space > offset + (cut - offset) * 0.8:
+                cut = space
+            pieces.append(paragraph[offset:cut])
+            offset = cut
+            first = bisect_left(starts, cut)
+        paragraph_tokens = len(starts) - first
+        if current_tokens + paragraph_tokens > max_tokens and current:
+            pieces.append(current)
+            current, current_tokens = "", 0
+        current += paragraph[offset:]
+        current_tokens += paragraph_tokens
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Pack document sections into chunks that each fit within a token budget.
+
+    Sections are never reordered; a section larger than the budget is split
+    on paragraph and word boundaries.
+
+    Args:
+        text: Extracted document text
+        max_tokens: Maximum tokens per chunk (see count_tokens)
+
+    Returns:
+        List[str]: Chunks in document order
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks = []
+    current = ""
+    current_tokens = 0
+    for section in split_into_sections(text):
+        section_tokens = count_tokens(section.text)
+        pieces = [section.text] if section_tokens <= max_tokens else _split_oversized(section.text, max_tokens)
+        for piece in pieces:
+            piece_tokens = section_tokens if len(pieces) == 1 else count_tokens(piece)
+            if current_tokens + piece_tokens > max_tokens and current:
+                chunks.append(current)
+                current, current_tokens = "", 0
+            current += piece
+            current_tokens += piece_tokens
+    if current.strip():
+        chunks.append(current)
+
+    logger.debug(f"Split {len(text)} characters into {len(chunks)} chunks")
+    return chunks
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.metrics import CONTEXT_CACHE_EVENTS
+from utils.single_flight import SingleFlight
+from utils.token_budget import document_tokens
+
+logger = logging.getLogger(__name__)
+
+# Model-side context caching for follow-up questions; a TTL of 0 disables it
+CONTEXT_CACHE_TTL = int(os.environ.get("CONTEXT_CACHE_TTL", 3600))
+# The model only accepts cached contexts above a minimum size
+CONTEXT_CACHE_MIN_TOKENS = int(os.environ.get("CONTEXT_CACHE_MIN_TOKENS", 1024))
+CONTEXT_CACHE_MAX_TOKENS = int(os.environ.get("CONTEXT_CACHE_MAX_TOKENS", 200000))
+
+class ContextCache:
+    """
+    Cached model contexts holding a document and the question instructions.
+
+    Each document is registered once with the backend's cached-content API
+    (client.caches), and follow-up questions reference it by handle
+    instead of resending the document. Handles are tracked per worker:
+    they are extended when half their TTL has passed, recreated after
+    expiry, and deleted when release() is called, e.g. when the document
+    store evicts the document. Handles this worker never released expire
+    on the backend after their TTL.
+    """
+
+    def __init__(self, caches: Callable[[], Any], model: str, system_prompt: str,
+                 ttl: int = CONTEXT_CACHE_TTL, min_tokens: int = CONTEXT_CACHE_MIN_TOKENS,
+                 max_tokens: int = CONTEXT_CACHE_MAX_TOKENS, clock: Callable[[], float] = time.time):
+        self._caches = caches
+        self.model = model
+        self.system_prompt = system_prompt
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._lock = threading.Lock()
+        # document_id -> (handle, expires_at); a None handle marks a failed registration not to retry yet
+        self._handles: Dict[str, Tuple[Optional[str], float]] = {}
+        self._flight = SingleFlight(lock_dir="")
+        self._cleanup = None
+
+    def handle(self, document_id: str, document_text: str) -> Optional[str]:
+        """
+        Get the cached context for a document, registering it on first use.
+
+        Args:
+            document_id: The document's hash
+            document_text: Extracted document text
+
+        Returns:
+            Optional[str]: Cached content name, or None when the document is not cached
+        """
+        if self.ttl <= 0:
+            return None
+
+        now = self._clock()
+        with self._lock:
+            entry = self._handles.get(document_id)
+        if entry is not None:
+            handle, expires_at = entry
+            if expires_at > now:
+                if handle is not None and expires_at - now < self.ttl / 2:
+                    self._extend(document_id, handle)
+                if handle is not None:
+                    CONTEXT_CACHE_EVENTS.inc(event='hit')
+                return handle
+
+        if not self.min_tokens <= document_tokens(document_text, document_id) <= self.max_tokens:
+            return None
+        # Concurrent first questions about a document register it once
+        return self._flight.do(document_id, lambda: self._create(document_id, document_text))
+
+    def _create(self, document_id: str, document_text: str) -> Optional[str]:
+        from google.genai import types
+
+        try:
+            cached = self._caches().create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"document-{document_id[:16]}",
+                    system_instruction=self.system_prompt,
+                    contents=[types.Content(role="user", parts=[types.Part(text=f"Document:\n{document_text}")])],
+                    ttl=f"{self.ttl}s"
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache context for document {document_id[:12]}: {str(e)}")
+            CONTEXT_CACHE_EVENTS.inc(event='failed')
+            with self._lock:
+                self._handles[document_id] = (None, self._clock() + self.ttl)
+            return None
+
+        logger.debug(f"Cached context {cached.name} for document {document_id[:12]}")
+        CONTEXT_CACHE_EVENTS.inc(event='created')
+        with self._lock:
+            self._handles[document_id] = (cached.name, self._clock() + self.ttl)
+        return cached.name
+
+    def _extend(self, document_id: str, handle: str) -> None:
+        from google.genai import types
+
+        try:
+            self._caches().update(name=handle, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s"))
+        except Exception as e:
+            logger.warning(f"Could not extend cached context {handle}: {str(e)}")
+            return
+        CONTEXT_CACHE_EVENTS.inc(event='extended')
+        with self._lock:
+            if self._handles.get(document_id, (None,))[0] == handle:
+                self._handles[document_id] = (handle, self._clock() + self.ttl)
+
+    def invalidate(self, document_id: str) -> None:
+        """Forget a handle the backend rejected, so the next question registers the document again."""
+        with self._lock:
+            self._handles.pop(document_id, None)
+
+    def release(self, document_id: str, artifacts: Optional[Dict[str, str]] = None) -> None:
+        """
+        Delete a document's cached context.
+
+        Usable as a document store eviction listener: the backend call runs
+        on a background thread, so this returns immediately.
+
+        Args:
+            document_id: The document's hash
+            artifacts: The document's artifacts, as passed to eviction listeners (unused)
+        """
+        with self._lock:
+            handle = self._handles.pop(document_id, (None,))[0]
+            if handle is None:
+                return
+            if self._cleanup is None:
+                self._cleanup = ThreadPoolExecutor(max_workers=1, thread_name_prefix='context-cache')
+            cleanup = self._cleanup
+        cleanup.submit(self._delete, handle)
+
+    def _delete(self, handle: str) -> None:
+        try:
+            self._caches().delete(name=handle)
+            CONTEXT_CACHE_EVENTS.inc(event='released')
+            logger.debug(f"Deleted cached context {handle}")
+        except Exception as e:
+            logger.warning(f"Could not delete cached context {handle}: {str(e)}")
+
+    def __len__(self) -> int:
+        now = self._clock()
+        with self._lock:
+            return sum(1 for handle, expires_at in self._handles.values() if handle and expires_at > now)
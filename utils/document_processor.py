@@ -1,11 +1,36 @@
+import io
 import os
+import math
+import mmap
+import time
+import shutil
 import logging
-from typing import Optional
-import PyPDF2
-import io
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Iterator, List, Optional, Tuple, Union
+
+from utils.metrics import EXTRACTION_SECONDS, EXTRACTION_PAGE_SECONDS, DOCUMENT_BYTES, DOCUMENT_PAGES
+
+if TYPE_CHECKING:
+    import PyPDF2
 
 logger = logging.getLogger(__name__)
 
+# Parallel PDF extraction: 0 or 1 disables the process pool
+PDF_EXTRACT_PROCESSES = int(os.environ.get("PDF_EXTRACT_PROCESSES", 0))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 50))
+
+# Uploads kept for background processing larger than this go to an anonymous mmap
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", 1024 * 1024))
+
+# Anything that can be extracted: a filesystem path, raw bytes or a binary file-like object
+DocumentSource = Union[str, bytes, BinaryIO]
+
+MIMETYPE_EXTENSIONS = {
+    'application/pdf': '.pdf',
+    'text/plain': '.txt'
+}
+
 def extract_text_from_file(filepath: str) -> str:
     """
     Extract text content from uploaded file (PDF or TXT).
@@ -33,32 +58,228 @@ def extract_text_from_file(filepath: str) -> str:
         logger.error(f"Error extracting text from {filepath}: {str(e)}")
         raise Exception(f"Failed to extract text from document: {str(e)}")
 
-def extract_text_from_pdf(filepath: str) -> str:
+def resolve_file_type(filename: Optional[str], mimetype: Optional[str] = None) -> str:
+    """
+    Determine the type of an upload from its filename extension, falling back to the mimetype.
+    
+    Args:
+        filename: Original filename of the upload
+        mimetype: Mimetype reported by the client
+        
+    Returns:
+        str: 'pdf' or 'txt'
+        
+    Raises:
+        ValueError: If the type is not supported
+    """
+    file_extension = os.path.splitext(filename or '')[1].lower()
+    if not file_extension:
+        file_extension = MIMETYPE_EXTENSIONS.get((mimetype or '').split(';')[0].strip(), '')
+    
+    if file_extension not in ('.pdf', '.txt'):
+        raise ValueError(f"Unsupported file type: {file_extension or mimetype}")
+    return file_extension.lstrip('.')
+
+def extract_text_from_stream(stream: Union[bytes, BinaryIO], filename: Optional[str] = None,
+                             mimetype: Optional[str] = None) -> str:
+    """
+    Extract text content from an in-memory upload (PDF or TXT) without touching disk.
+    
+    The file type is resolved with resolve_file_type().
+    
+    Args:
+        stream: Raw bytes or a binary file-like object (e.g. FileStorage.stream)
+        filename: Original filename of the upload
+        mimetype: Mimetype reported by the client
+        
+    Returns:
+        str: Extracted text content
+        
+    Raises:
+        Exception: If file processing fails
+    """
+    try:
+        file_type = resolve_file_type(filename, mimetype)
+        DOCUMENT_BYTES.observe(_source_size(stream), file_type=file_type)
+        with EXTRACTION_SECONDS.time(file_type=file_type):
+            if file_type == 'pdf':
+                return extract_text_from_pdf(stream)
+            return extract_text_from_txt(stream)
+            
+    except Exception as e:
+        logger.error(f"Error extracting text from {filename or 'upload'}: {str(e)}")
+        raise Exception(f"Failed to extract text from document: {str(e)}")
+
+def spool_stream(stream: BinaryIO, threshold: int = UPLOAD_SPOOL_THRESHOLD) -> BinaryIO:
+    """
+    Copy a stream that will be closed (e.g. a request upload) into an owned buffer.
+    
+    Small uploads are kept in a BytesIO; larger ones in an anonymous memory
+    map so they never hit the filesystem and are released when closed.
+    
+    Args:
+        stream: Binary file-like object positioned anywhere
+        threshold: Size in bytes above which an anonymous mmap is used
+        
+    Returns:
+        BinaryIO: Readable buffer positioned at the start
+    """
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    
+    if size <= threshold:
+        return io.BytesIO(stream.read())
+    
+    buffer = mmap.mmap(-1, size)
+    shutil.copyfileobj(stream, buffer)
+    buffer.seek(0)
+    return buffer
+
+def _read_source(source: DocumentSource) -> bytes:
+    """Read the full contents of a document source."""
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            return file.read()
+    if isinstance(source, bytes):
+        return source
+    source.seek(0)
+    return source.read()
+
+def _source_size(source: DocumentSource) -> int:
+    """Size in bytes of a document source without reading it."""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    if isinstance(source, bytes):
+        return len(source)
+    position = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+@contextmanager
+def _open_source(source: DocumentSource) -> Iterator[BinaryIO]:
+    """Open a document source as a seekable binary stream."""
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            yield file
+    elif isinstance(source, bytes):
+        yield io.BytesIO(source)
+    else:
+        source.seek(0)
+        yield source
+
+def format_page(page_num: int, page_text: str) -> str:
+    """
+    Format a page of extracted text with its page marker.
+    
+    Args:
+        page_num: 1-based page number
+        page_text: Text extracted from the page
+        
+    Returns:
+        str: Page text preceded by a '--- Page N ---' marker
+    """
+    return f"\n--- Page {page_num} ---\n{page_text}\n"
+
+def _read_pages(pdf_reader: "PyPDF2.PdfReader", start: int, end: int) -> Iterator[Tuple[int, str]]:
+    """Yield non-empty pages [start, end) from an open PDF reader."""
+    for index in range(start, min(end, len(pdf_reader.pages))):
+        page_num = index + 1
+        try:
+            page_text = pdf_reader.pages[index].extract_text()
+            if page_text.strip():
+                yield page_num, page_text
+        except Exception as e:
+            logger.warning(f"Could not extract text from page {page_num}: {str(e)}")
+            continue
+
+# PDF reader opened once per extraction worker process
+_worker_pdf_reader = None
+
+def _init_pdf_worker(source: Union[str, bytes]) -> None:
+    global _worker_pdf_reader
+    import PyPDF2
+    stream = open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+    _worker_pdf_reader = PyPDF2.PdfReader(stream)
+
+def _extract_page_range(start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract non-empty pages [start, end) in a worker process.
+    """
+    return list(_read_pages(_worker_pdf_reader, start, end))
+
+def iter_pdf_pages(source: DocumentSource, processes: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the text of each non-empty PDF page in order.
+    
+    Pages are decoded one at a time, so only the current page's text is
+    held besides what the caller keeps. The only caller,
+    extract_text_from_pdf(), collects every page before anything else
+    runs, so this gives linear-time assembly, not early processing.
+    Large PDFs (at least PDF_PARALLEL_MIN_PAGES pages) can be decoded in
+    parallel across processes; pages are still yielded in order.
+    
+    Args:
+        source: Path, bytes or binary stream of the PDF
+        processes: Worker processes for parallel extraction (defaults to
+            PDF_EXTRACT_PROCESSES; 0 or 1 extracts in this process)
+        
+    Yields:
+        Tuple[int, str]: 1-based page number and page text
+    """
+    # PyPDF2 is imported on first use to keep it off the startup path
+    import PyPDF2
+    
+    if processes is None:
+        processes = PDF_EXTRACT_PROCESSES
+    
+    with _open_source(source) as stream:
+        pdf_reader = PyPDF2.PdfReader(stream)
+        page_count = len(pdf_reader.pages)
+        
+        if processes <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            yield from _read_pages(pdf_reader, 0, page_count)
+            return
+    
+    # Each worker opens the PDF once; paths are reopened, in-memory data is sent once per process
+    worker_source = source if isinstance(source, str) else _read_source(source)
+    
+    # Split pages into contiguous batches, a few per process to balance uneven pages
+    batch_size = max(1, math.ceil(page_count / (processes * 4)))
+    starts = range(0, page_count, batch_size)
+    logger.debug(f"Extracting {page_count} pages with {processes} processes")
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_pdf_worker,
+                             initargs=(worker_source,)) as executor:
+        batches = executor.map(_extract_page_range, starts, [start + batch_size for start in starts])
+        for batch in batches:
+            yield from batch
+
+def extract_text_from_pdf(source: DocumentSource, processes: Optional[int] = None) -> str:
     """
     Extract text from PDF file.
     
+    The whole document is extracted before it is returned; chunking,
+    indexing and scanning start once the last page is read.
+    
     Args:
-        filepath: Path to the PDF file
+        source: Path, bytes or binary stream of the PDF
+        processes: Worker processes for parallel extraction (see iter_pdf_pages)
         
     Returns:
         str: Extracted text content
     """
     try:
-        text_content = ""
+        # Collect formatted pages and join once to keep assembly linear in document size
+        started = time.perf_counter()
+        text_parts = [format_page(page_num, page_text)
+                      for page_num, page_text in iter_pdf_pages(source, processes)]
+        text_content = "".join(text_parts)
         
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Extract text from all pages
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_content += f"\n--- Page {page_num} ---\n"
-                        text_content += page_text + "\n"
-                except Exception as e:
-                    logger.warning(f"Could not extract text from page {page_num}: {str(e)}")
-                    continue
+        if text_parts:
+            DOCUMENT_PAGES.observe(len(text_parts))
+            EXTRACTION_PAGE_SECONDS.observe((time.perf_counter() - started) / len(text_parts))
         
         if not text_content.strip():
             raise Exception("No readable text found in PDF. The document might be image-based or corrupted.")
@@ -66,36 +287,40 @@ def extract_text_from_pdf(filepath: str) -> str:
         return text_content.strip()
         
     except Exception as e:
-        logger.error(f"Error processing PDF {filepath}: {str(e)}")
+        source_name = source if isinstance(source, str) else 'upload'
+        logger.error(f"Error processing PDF {source_name}: {str(e)}")
         raise Exception(f"Failed to process PDF file: {str(e)}")
 
-def extract_text_from_txt(filepath: str) -> str:
+def extract_text_from_txt(source: DocumentSource) -> str:
     """
     Extract text from TXT file.
     
     Args:
-        filepath: Path to the TXT file
+        source: Path, bytes or binary stream of the TXT file
         
     Returns:
         str: File content
     """
     try:
+        data = _read_source(source)
+        
         # Try different encodings
         encodings = ['utf-8', 'utf-16', 'latin-1', 'ascii']
         
         for encoding in encodings:
             try:
-                with open(filepath, 'r', encoding=encoding) as file:
-                    content = file.read()
-                    if content.strip():
-                        return content.strip()
-            except UnicodeDecodeError:
+                # TextIOWrapper applies the same newline translation as open(..., 'r')
+                content = io.TextIOWrapper(io.BytesIO(data), encoding=encoding).read()
+                if content.strip():
+                    return content.strip()
+            except UnicodeError:
                 continue
         
         raise Exception("Could not decode text file with any supported encoding")
         
     except Exception as e:
-        logger.error(f"Error processing TXT {filepath}: {str(e)}")
+        source_name = source if isinstance(source, str) else 'upload'
+        logger.error(f"Error processing TXT {source_name}: {str(e)}")
         raise Exception(f"Failed to process text file: {str(e)}")
 
 def validate_document_content(text: str) -> bool:
@@ -121,29 +346,3 @@ def validate_document_content(text: str) -> bool:
         return False
     
     return True
-
-def truncate_text_for_api(text: str, max_tokens: int = 15000) -> str:
-    """
-    Truncate text to fit within API token limits.
-    Rough estimate: 1 token ≈ 4 characters
-    
-    Args:
-        text: Input text
-        max_tokens: Maximum number of tokens allowed
-        
-    Returns:
-        str: Truncated text
-    """
-    max_chars = max_tokens * 4
-    
-    if len(text) <= max_chars:
-        return text
-    
-    # Truncate at word boundary
-    truncated = text[:max_chars]
-    last_space = truncated.rfind(' ')
-    
-    if last_space > max_chars * 0.8:  # If we found a space in the last 20%
-        truncated = truncated[:last_space]
-    
-    return truncated + "\n\n[Note: Document was truncated due to length limits]"
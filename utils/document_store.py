@@ -0,0 +1,417 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Server-side document storage configuration
+DOCUMENT_STORE_BACKEND = os.environ.get("DOCUMENT_STORE_BACKEND", "memory")
+DOCUMENT_STORE_PATH = os.environ.get(
+    "DOCUMENT_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "legal_demystifier_documents.sqlite3")
+)
+DOCUMENT_STORE_MAX_BYTES = int(os.environ.get("DOCUMENT_STORE_MAX_BYTES", 64 * 1024 * 1024))
+# Size limit of the shared on-disk store used by the 'sqlite' and 'tiered' backends
+DOCUMENT_STORE_DISK_MAX_BYTES = int(os.environ.get("DOCUMENT_STORE_DISK_MAX_BYTES", 1024 * 1024 * 1024))
+
+def compute_document_id(document_text: str) -> str:
+    """
+    Compute the content hash used to identify a stored document.
+
+    Args:
+        document_text: Extracted document text
+
+    Returns:
+        str: Hex-encoded SHA-256 digest of the text
+    """
+    return hashlib.sha256(document_text.encode('utf-8')).hexdigest()
+
+class DocumentStore(ABC):
+    """
+    Interface for server-side storage of extracted document text.
+
+    Documents are addressed by the SHA-256 hash of their content so the
+    session only needs to carry a short ID instead of the full text.
+    """
+
+    def __init__(self):
+        self._eviction_listeners = []
+
+    def put(self, document_text: str) -> str:
+        """
+        Store document text and return its ID.
+
+        Args:
+            document_text: Extracted document text
+
+        Returns:
+            str: Document ID (content hash)
+        """
+        document_id = compute_document_id(document_text)
+        self._put(document_id, document_text)
+        return document_id
+
+    @abstractmethod
+    def get(self, document_id: str) -> Optional[str]:
+        """
+        Fetch document text by ID.
+
+        Args:
+            document_id: ID returned by put()
+
+        Returns:
+            Optional[str]: Document text, or None if unknown or evicted
+        """
+
+    @abstractmethod
+    def delete(self, document_id: str) -> None:
+        """
+        Remove a document from the store if present.
+
+        Args:
+            document_id: ID returned by put()
+        """
+
+    @abstractmethod
+    def put_artifact(self, document_id: str, name: str, payload: str) -> None:
+        """
+        Store a derived artifact (e.g. a search index) alongside a document.
+
+        Artifacts are evicted together with their document.
+
+        Args:
+            document_id: ID returned by put()
+            name: Artifact name
+            payload: Serialized artifact
+        """
+
+    @abstractmethod
+    def get_artifact(self, document_id: str, name: str) -> Optional[str]:
+        """
+        Fetch an artifact stored with put_artifact().
+
+        Args:
+            document_id: ID returned by put()
+            name: Artifact name
+
+        Returns:
+            Optional[str]: Serialized artifact, or None if missing
+        """
+
+    def add_eviction_listener(self, listener: Callable[[str, Dict[str, str]], None]) -> None:
+        """
+        Register a callback for documents leaving the store, by eviction or delete().
+
+        The listener is called with the document ID and its artifacts while
+        the store is being updated, so it must be quick and must not call
+        back into the store.
+
+        Args:
+            listener: Callable taking (document_id, artifacts)
+        """
+        self._eviction_listeners.append(listener)
+
+    def _notify_removed(self, document_id: str, artifacts: Dict[str, str]) -> None:
+        for listener in self._eviction_listeners:
+            try:
+                listener(document_id, artifacts)
+            except Exception as e:
+                logger.warning(f"Eviction listener failed for document {document_id[:12]}: {str(e)}")
+
+    @abstractmethod
+    def _put(self, document_id: str, document_text: str) -> None:
+        """Store document text under its ID."""
+
+class MemoryDocumentStore(DocumentStore):
+    """
+    In-process LRU document store bounded by total UTF-8 byte size.
+    """
+
+    def __init__(self, max_bytes: int = DOCUMENT_STORE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._documents: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes = {}
+        self._artifacts = {}
+        self._lock = threading.Lock()
+
+    def get(self, document_id: str) -> Optional[str]:
+        with self._lock:
+            document_text = self._documents.get(document_id)
+            if document_text is not None:
+                self._documents.move_to_end(document_id)
+            return document_text
+
+    def delete(self, document_id: str) -> None:
+        with self._lock:
+            self._remove(document_id)
+
+    def put_artifact(self, document_id: str, name: str, payload: str) -> None:
+        with self._lock:
+            if document_id not in self._documents:
+                return
+            artifacts = self._artifacts.setdefault(document_id, {})
+            size = len(payload.encode('utf-8'))
+            if name in artifacts:
+                size -= len(artifacts[name].encode('utf-8'))
+            artifacts[name] = payload
+            self._sizes[document_id] += size
+            self.total_bytes += size
+            self._evict()
+
+    def get_artifact(self, document_id: str, name: str) -> Optional[str]:
+        with self._lock:
+            return self._artifacts.get(document_id, {}).get(name)
+
+    def _put(self, document_id: str, document_text: str) -> None:
+        size = len(document_text.encode('utf-8'))
+
+        with self._lock:
+            if document_id in self._documents:
+                self._documents.move_to_end(document_id)
+                return
+
+            if size > self.max_bytes:
+                logger.warning(f"Document {document_id[:12]} ({size} bytes) exceeds memory store budget")
+                return
+
+            self._documents[document_id] = document_text
+            self._sizes[document_id] = size
+            self.total_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        # Evict least recently used documents until we are within budget
+        while self.total_bytes > self.max_bytes and self._documents:
+            oldest_id = next(iter(self._documents))
+            logger.debug(f"Evicting document {oldest_id[:12]} from memory store")
+            self._remove(oldest_id)
+
+    def _remove(self, document_id: str) -> None:
+        if document_id in self._documents:
+            del self._documents[document_id]
+            artifacts = self._artifacts.pop(document_id, None) or {}
+            self.total_bytes -= self._sizes.pop(document_id)
+            self._notify_removed(document_id, artifacts)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+class SQLiteDocumentStore(DocumentStore):
+    """
+    On-disk document store backed by SQLite so several workers can share it.
+
+    Least recently accessed documents are evicted once the total stored
+    size, including each document's artifacts, exceeds max_bytes.
+    """
+
+    def __init__(self, path: str = DOCUMENT_STORE_PATH, max_bytes: Optional[int] = DOCUMENT_STORE_DISK_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document_id TEXT PRIMARY KEY, "
+                "document_text TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "  # UTF-8 bytes of the text and its artifacts
+                "last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents (last_access)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS document_artifacts ("
+                "document_id TEXT NOT NULL, "
+                "name TEXT NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "PRIMARY KEY (document_id, name))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, document_id: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT document_text FROM documents WHERE document_id = ?",
+                    (document_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE documents SET last_access = ? WHERE document_id = ?",
+                    (time.time(), document_id)
+                )
+                return row[0]
+        finally:
+            conn.close()
+
+    def delete(self, document_id: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                self._delete(conn, document_id)
+        finally:
+            conn.close()
+
+    def put_artifact(self, document_id: str, name: str, payload: str) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM documents WHERE document_id = ?", (document_id,)
+                ).fetchone()
+                if exists:
+                    previous = conn.execute(
+                        "SELECT length(CAST(payload AS BLOB)) FROM document_artifacts "
+                        "WHERE document_id = ? AND name = ?",
+                        (document_id, name)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO document_artifacts (document_id, name, payload) "
+                        "VALUES (?, ?, ?)",
+                        (document_id, name, payload)
+                    )
+                    # Artifacts count towards their document's size, so they are bounded with it
+                    conn.execute(
+                        "UPDATE documents SET size = size + ? WHERE document_id = ?",
+                        (len(payload.encode('utf-8')) - (previous[0] if previous else 0), document_id)
+                    )
+                    if self.max_bytes is not None:
+                        self._evict(conn)
+        finally:
+            conn.close()
+
+    def get_artifact(self, document_id: str, name: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT payload FROM document_artifacts WHERE document_id = ? AND name = ?",
+                (document_id, name)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def _delete(self, conn: sqlite3.Connection, document_id: str) -> None:
+        artifacts = dict(conn.execute(
+            "SELECT name, payload FROM document_artifacts WHERE document_id = ?", (document_id,)
+        ).fetchall())
+        deleted = conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount
+        conn.execute("DELETE FROM document_artifacts WHERE document_id = ?", (document_id,))
+        if deleted:
+            self._notify_removed(document_id, artifacts)
+
+    def _put(self, document_id: str, document_text: str) -> None:
+        size = len(document_text.encode('utf-8'))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO documents (document_id, document_text, size, last_access) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(document_id) DO UPDATE SET last_access = excluded.last_access",
+                    (document_id, document_text, size, time.time())
+                )
+                if self.max_bytes is not None:
+                    self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT document_id, size FROM documents ORDER BY last_access").fetchall()
+        for document_id, size in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            logger.debug(f"Evicting document {document_id[:12]} from SQLite store")
+            self._delete(conn, document_id)
+            total_bytes -= size
+
+class TieredDocumentStore(DocumentStore):
+    """
+    Memory LRU in front of a shared on-disk store.
+
+    Reads are served from the local LRU when possible and fall back to the
+    shared store, repopulating the LRU on a hit. A document evicted from
+    the shared store is dropped from this worker's LRU as well, so
+    listeners only hear about documents this worker no longer serves.
+    """
+
+    def __init__(self, memory: MemoryDocumentStore, disk: DocumentStore):
+        super().__init__()
+        self.memory = memory
+        self.disk = disk
+        self.disk.add_eviction_listener(self._disk_removed)
+
+    def _disk_removed(self, document_id: str, artifacts: Dict[str, str]) -> None:
+        self.memory.delete(document_id)
+        self._notify_removed(document_id, artifacts)
+
+    def get(self, document_id: str) -> Optional[str]:
+        document_text = self.memory.get(document_id)
+        if document_text is not None:
+            return document_text
+
+        document_text = self.disk.get(document_id)
+        if document_text is not None:
+            self.memory._put(document_id, document_text)
+        return document_text
+
+    def delete(self, document_id: str) -> None:
+        self.memory.delete(document_id)
+        self.disk.delete(document_id)
+
+    def put_artifact(self, document_id: str, name: str, payload: str) -> None:
+        self.disk.put_artifact(document_id, name, payload)
+        self.memory.put_artifact(document_id, name, payload)
+
+    def get_artifact(self, document_id: str, name: str) -> Optional[str]:
+        payload = self.memory.get_artifact(document_id, name)
+        if payload is None:
+            payload = self.disk.get_artifact(document_id, name)
+            if payload is not None:
+                self.memory.put_artifact(document_id, name, payload)
+        return payload
+
+    def _put(self, document_id: str, document_text: str) -> None:
+        self.disk._put(document_id, document_text)
+        self.memory._put(document_id, document_text)
+
+def create_document_store(backend: str = DOCUMENT_STORE_BACKEND) -> DocumentStore:
+    """
+    Build the document store selected by configuration.
+
+    Args:
+        backend: One of 'memory', 'sqlite' or 'tiered'
+
+    Returns:
+        DocumentStore: Configured store instance
+    """
+    if backend == 'memory':
+        return MemoryDocumentStore(DOCUMENT_STORE_MAX_BYTES)
+    elif backend == 'sqlite':
+        return SQLiteDocumentStore(DOCUMENT_STORE_PATH, DOCUMENT_STORE_DISK_MAX_BYTES)
+    elif backend == 'tiered':
+        return TieredDocumentStore(
+            MemoryDocumentStore(DOCUMENT_STORE_MAX_BYTES),
+            SQLiteDocumentStore(DOCUMENT_STORE_PATH, DOCUMENT_STORE_DISK_MAX_BYTES)
+        )
+    else:
+        raise ValueError(f"Unsupported document store backend: {backend}")
@@ -0,0 +1,346 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from utils.chunking import PAGE_MARKER_PATTERN, split_into_sections
+from utils.document_processor import extract_text_from_stream, resolve_file_type
+from utils.metrics import EXTRACTION_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Extraction artifacts: 'disk' keeps them in EXTRACTION_STORE_PATH, 'none' disables reuse
+EXTRACTION_STORE_BACKEND = os.environ.get("EXTRACTION_STORE_BACKEND", "disk")
+EXTRACTION_STORE_PATH = os.environ.get(
+    "EXTRACTION_STORE_PATH",
+    os.path.join(tempfile.gettempdir(), "legal_demystifier_extractions")
+)
+EXTRACTION_STORE_MAX_BYTES = int(os.environ.get("EXTRACTION_STORE_MAX_BYTES", 256 * 1024 * 1024))
+# Once the directory is over its budget it is trimmed to this fraction of it, so trims are rare
+EXTRACTION_STORE_LOW_WATER = 0.9
+
+# Artifact layout, little-endian:
+#   header   magic, page count, section count
+#   pages    page number, byte start, byte end (page body, after its marker line)
+#   sections byte start, byte end
+#   text     UTF-8 extracted text, exactly as returned by extraction
+ARTIFACT_MAGIC = b'LDX1'
+HEADER = struct.Struct('<4sII')
+PAGE_ENTRY = struct.Struct('<IQQ')
+SECTION_ENTRY = struct.Struct('<QQ')
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def content_digest(source: Union[bytes, BinaryIO]) -> str:
+    """
+    Hash the raw bytes of an upload.
+
+    Buffers (bytes, mmap, BytesIO) are hashed in place; other streams are
+    read in blocks. Streams are left positioned at the start.
+
+    Args:
+        source: Raw bytes or a seekable binary stream
+
+    Returns:
+        str: Hex SHA-256 of the content
+    """
+    if isinstance(source, (bytes, mmap.mmap)):
+        return hashlib.sha256(source).hexdigest()
+
+    digest = hashlib.sha256()
+    getbuffer = getattr(source, 'getbuffer', None)
+    if getbuffer is not None:
+        with getbuffer() as view:
+            digest.update(view)
+        return digest.hexdigest()
+
+    source.seek(0)
+    for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+def _byte_offsets(text: str, char_offsets: List[int]) -> Dict[int, int]:
+    """Map sorted character offsets in text to UTF-8 byte offsets in one pass."""
+    byte_offsets = {}
+    previous_char = 0
+    previous_byte = 0
+    for offset in char_offsets:
+        previous_byte += len(text[previous_char:offset].encode('utf-8'))
+        previous_char = offset
+        byte_offsets[offset] = previous_byte
+    return byte_offsets
+
+def encode_artifact(text: str) -> bytes:
+    """
+    Serialize extracted text with its page and section offset tables.
+
+    Args:
+        text: Extracted text, with '--- Page N ---' markers for PDFs
+
+    Returns:
+        bytes: Artifact contents
+    """
+    markers = list(PAGE_MARKER_PATTERN.finditer(text))
+    page_ranges = []
+    for position, match in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        page_ranges.append((int(match.group(1)), min(match.end() + 1, end), end))
+
+    sections = split_into_sections(text)
+    section_ranges = [(section.start, section.start + len(section.text)) for section in sections]
+
+    offsets = sorted({offset for _, start, end in page_ranges for offset in (start, end)}
+                     | {offset for range_ in section_ranges for offset in range_})
+    byte_offsets = _byte_offsets(text, offsets)
+
+    parts = [HEADER.pack(ARTIFACT_MAGIC, len(page_ranges), len(section_ranges))]
+    parts.extend(PAGE_ENTRY.pack(page, byte_offsets[start], byte_offsets[end]) for page, start, end in page_ranges)
+    parts.extend(SECTION_ENTRY.pack(byte_offsets[start], byte_offsets[end]) for start, end in section_ranges)
+    parts.append(text.encode('utf-8'))
+    return b"".join(parts)
+
+class ExtractionArtifact:
+    """
+    A memory-mapped extraction artifact.
+
+    Pages and sections are sliced out of the mapping without copying the
+    document; page lookup by number is a dict access. Views returned by
+    page() and section() must be released before the artifact is closed.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, page_count, section_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != ARTIFACT_MAGIC:
+            self.close()
+            raise ValueError(f"Not an extraction artifact: {path}")
+
+        offset = HEADER.size
+        self._pages: Dict[int, Tuple[int, int]] = {}
+        for _ in range(page_count):
+            page, start, end = PAGE_ENTRY.unpack_from(self._mmap, offset)
+            self._pages[page] = (start, end)
+            offset += PAGE_ENTRY.size
+        self._sections: List[Tuple[int, int]] = [
+            SECTION_ENTRY.unpack_from(self._mmap, offset + index * SECTION_ENTRY.size)
+            for index in range(section_count)
+        ]
+        self._text_offset = offset + section_count * SECTION_ENTRY.size
+
+    @property
+    def text(self) -> str:
+        """The full extracted text."""
+        with self._view[self._text_offset:] as view:
+            return str(view, 'utf-8')
+
+    @property
+    def page_numbers(self) -> List[int]:
+        return list(self._pages)
+
+    @property
+    def section_count(self) -> int:
+        return len(self._sections)
+
+    def _slice(self, start: int, end: int) -> memoryview:
+        return self._view[self._text_offset + start:self._text_offset + end]
+
+    def page(self, page_number: int) -> Optional[memoryview]:
+        """
+        Zero-copy UTF-8 view of one page's text.
+
+        Args:
+            page_number: 1-based page number as printed in the page marker
+
+        Returns:
+            Optional[memoryview]: Page bytes, or None if the document has no such page
+        """
+        page_range = self._pages.get(page_number)
+        return self._slice(*page_range) if page_range else None
+
+    def page_text(self, page_number: int) -> Optional[str]:
+        """Decoded text of one page, or None if the document has no such page."""
+        view = self.page(page_number)
+        if view is None:
+            return None
+        with view:
+            return str(view, 'utf-8').strip()
+
+    def section(self, index: int) -> memoryview:
+        """Zero-copy UTF-8 view of a section (see split_into_sections), by position."""
+        return self._slice(*self._sections[index])
+
+    def close(self) -> None:
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "ExtractionArtifact":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class ExtractionStore:
+    """
+    Extraction artifacts on disk, keyed by the hash of the uploaded bytes.
+
+    Files are written atomically, so several workers can share a directory.
+    Writes only add to a running estimate of the directory size; once it
+    passes max_bytes the directory is scanned and the least recently used
+    artifacts are removed. The estimate misses other workers' writes since
+    the last scan, so a shared directory can briefly exceed its budget.
+    """
+
+    def __init__(self, path: str = EXTRACTION_STORE_PATH, max_bytes: int = EXTRACTION_STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Directory size as of the last scan plus this process's writes since
+        self._approx_bytes = None
+        os.makedirs(path, exist_ok=True)
+
+    def _artifact_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.ldx")
+
+    def get(self, key: str) -> Optional[ExtractionArtifact]:
+        """
+        Open a stored artifact.
+
+        Args:
+            key: Key from artifact_key()
+
+        Returns:
+            Optional[ExtractionArtifact]: Open artifact (the caller closes it), or None if missing
+        """
+        path = self._artifact_path(key)
+        try:
+            artifact = ExtractionArtifact(path)
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        try:
+            # Access time drives eviction; not every filesystem records atime
+            os.utime(path)
+        except OSError:
+            pass
+        return artifact
+
+    def put(self, key: str, text: str) -> None:
+        """
+        Store extracted text as an artifact.
+
+        Args:
+            key: Key from artifact_key()
+            text: Extracted text
+        """
+        payload = encode_artifact(text)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(payload)
+            os.replace(temp_path, self._artifact_path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._approx_bytes += len(payload)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.ldx'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = int(self.max_bytes * EXTRACTION_STORE_LOW_WATER)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self._approx_bytes = total
+
+def artifact_key(digest: str, file_type: str) -> str:
+    """
+    Artifact key for an upload; the file type is included because it decides how bytes are parsed.
+
+    Args:
+        digest: Content hash from content_digest()
+        file_type: 'pdf' or 'txt'
+
+    Returns:
+        str: Artifact key
+    """
+    return f"{digest}.{file_type}"
+
+def extract_with_store(store: Optional[ExtractionStore], stream: Union[bytes, BinaryIO],
+                       filename: Optional[str] = None, mimetype: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Extract an upload, reusing the stored artifact for identical bytes.
+
+    Args:
+        store: Extraction store, or None to always extract
+        stream: Raw bytes or a binary file-like object
+        filename: Original filename of the upload
+        mimetype: Mimetype reported by the client
+
+    Returns:
+        Tuple[str, Optional[str]]: Extracted text and the artifact key (None without a store)
+    """
+    if store is None:
+        return extract_text_from_stream(stream, filename, mimetype), None
+
+    key = artifact_key(content_digest(stream), resolve_file_type(filename, mimetype))
+    artifact = store.get(key)
+    if artifact is not None:
+        with artifact:
+            EXTRACTION_CACHE_LOOKUPS.inc(result='hit')
+            logger.debug(f"Reusing extraction artifact {key}")
+            return artifact.text, key
+
+    EXTRACTION_CACHE_LOOKUPS.inc(result='miss')
+    text = extract_text_from_stream(stream, filename, mimetype)
+    try:
+        store.put(key, text)
+    except OSError as e:
+        logger.warning(f"Could not store extraction artifact {key}: {str(e)}")
+    return text, key
+
+def create_extraction_store(backend: str = EXTRACTION_STORE_BACKEND) -> Optional[ExtractionStore]:
+    """
+    Build the extraction store selected by configuration.
+
+    Args:
+        backend: 'disk' for the shared artifact directory, 'none' to disable reuse
+
+    Returns:
+        Optional[ExtractionStore]: Configured store, or None when disabled
+    """
+    if backend == 'disk':
+        return ExtractionStore()
+    elif backend == 'none':
+        return None
+    else:
+        raise ValueError(f"Unsupported extraction store backend: {backend}")
@@ -0,0 +1,440 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from utils.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Resilience configuration for Gemini calls
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 60))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 3))
+GEMINI_BACKOFF_BASE = float(os.environ.get("GEMINI_BACKOFF_BASE", 0.5))
+GEMINI_BACKOFF_MAX = float(os.environ.get("GEMINI_BACKOFF_MAX", 8))
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 300))
+GEMINI_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", 1000000))
+GEMINI_MAX_IN_FLIGHT = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", 8))
+# Async calls only hold a coroutine while waiting, so the ASGI path allows far more of them
+GEMINI_MAX_IN_FLIGHT_ASYNC = int(os.environ.get("GEMINI_MAX_IN_FLIGHT_ASYNC", 256))
+GEMINI_CIRCUIT_FAILURES = int(os.environ.get("GEMINI_CIRCUIT_FAILURES", 5))
+GEMINI_CIRCUIT_COOLDOWN = float(os.environ.get("GEMINI_CIRCUIT_COOLDOWN", 30))
+
+# HTTP status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class GeminiUnavailableError(Exception):
+    """Raised when a call is rejected locally (open circuit, rate limit or deadline)."""
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Decide whether a failed call may succeed if retried.
+
+    Args:
+        error: Exception raised by the backend
+
+    Returns:
+        bool: True for rate limiting, transient server errors, timeouts and network errors
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # httpx is only loaded once a real client exists; without it there can be no httpx error
+    httpx = sys.modules.get('httpx')
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    return getattr(error, 'code', None) in RETRYABLE_STATUS_CODES
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def _try_take(self, amount: float, deadline: Optional[float]) -> float:
+        """Take amount tokens if available; otherwise return how long to wait for them."""
+        if self.rate_per_second <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            wait = (amount - self.tokens) / self.rate_per_second
+        if deadline is not None and self.clock() + wait > deadline:
+            raise GeminiUnavailableError("Gemini rate limit reached, try again shortly")
+        return wait
+
+    def acquire(self, amount: float = 1, deadline: Optional[float] = None) -> None:
+        """
+        Take amount tokens, waiting for the bucket to refill if necessary.
+
+        Requests larger than the bucket capacity are clamped so they can
+        eventually proceed.
+
+        Args:
+            amount: Number of tokens to take
+            deadline: Clock time after which to give up
+
+        Raises:
+            GeminiUnavailableError: If the tokens cannot be obtained before the deadline
+        """
+        while True:
+            wait = self._try_take(amount, deadline)
+            if not wait:
+                return
+            self.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1, deadline: Optional[float] = None) -> None:
+        """Like acquire(), but waits without blocking the event loop."""
+        while True:
+            wait = self._try_take(amount, deadline)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Stops calling the backend after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for cooldown seconds. Then a single trial call is allowed;
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = GEMINI_CIRCUIT_FAILURES,
+                 cooldown: float = GEMINI_CIRCUIT_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            GeminiUnavailableError: If the circuit is open
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return
+            # While open, and while a trial call is outstanding, reject until the cooldown passes
+            if self.clock() - self.opened_at < self.cooldown:
+                raise GeminiUnavailableError("Gemini is temporarily unavailable, try again shortly")
+            self.state = CircuitBreaker.HALF_OPEN
+            self.opened_at = self.clock()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CircuitBreaker.OPEN:
+                    logger.warning(f"Opening Gemini circuit after {self.failures} failures")
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = self.clock()
+
+def _prompt_tokens(kwargs: dict) -> int:
+    """Estimate the prompt size of a generate_content call for rate limiting."""
+    text = ""
+    contents = kwargs.get('contents')
+    if isinstance(contents, str):
+        text = contents
+    elif isinstance(contents, list):
+        for content in contents:
+            for part in getattr(content, 'parts', None) or []:
+                text += getattr(part, 'text', None) or ""
+    config = kwargs.get('config')
+    # Cached-content registrations carry their contents in the config
+    for content in getattr(config, 'contents', None) or []:
+        for part in getattr(content, 'parts', None) or []:
+            text += getattr(part, 'text', None) or ""
+    system_instruction = getattr(config, 'system_instruction', None)
+    if isinstance(system_instruction, str):
+        text += system_instruction
+    return max(1, count_tokens(text))
+
+class ResilientModels:
+    """
+    Drop-in wrapper for client.models adding deadlines, retries with
+    jittered exponential backoff, request/token rate limiting, a cap on
+    in-flight calls and circuit breaking.
+
+    Any object with generate_content/generate_content_stream methods can
+    be wrapped, which lets tests use a local fake backend.
+    """
+
+    def __init__(self, backend: Any, timeout: float = GEMINI_TIMEOUT, max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_base: float = GEMINI_BACKOFF_BASE, backoff_max: float = GEMINI_BACKOFF_MAX,
+                 requests_per_minute: int = GEMINI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = GEMINI_TOKENS_PER_MINUTE,
+                 max_in_flight: int = GEMINI_MAX_IN_FLIGHT,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_bucket = TokenBucket(requests_per_minute, clock, sleep)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock, sleep)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(clock=clock)
+        self.clock = clock
+        self.sleep = sleep
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything not wrapped (e.g. count_tokens) goes straight to the backend
+        return getattr(self.backend, name)
+
+    def _with_deadline(self, kwargs: dict, deadline: float) -> dict:
+        """Propagate the remaining time budget to the HTTP layer as a request timeout."""
+        config = kwargs.get('config')
+        # Only real genai configs carry HTTP options; genai is never imported just for this check
+        types = sys.modules.get('google.genai.types')
+        if types is None or not isinstance(config, (types.GenerateContentConfig, types.CreateCachedContentConfig,
+                                                    types.UpdateCachedContentConfig)):
+            return kwargs
+        remaining_ms = max(1, int((deadline - self.clock()) * 1000))
+        kwargs = dict(kwargs)
+        kwargs['config'] = config.model_copy(update={'http_options': types.HttpOptions(timeout=remaining_ms)})
+        return kwargs
+
+    def _backoff_delay(self, attempt: int, deadline: float) -> Optional[float]:
+        """Jittered delay before the next attempt, or None if the deadline leaves no room to retry."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if self.clock() + delay >= deadline:
+            return None
+        return delay
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        """Sleep before the next attempt; returns False if the deadline leaves no room to retry."""
+        delay = self._backoff_delay(attempt, deadline)
+        if delay is None:
+            return False
+        self.sleep(delay)
+        return True
+
+    def _admit(self, kwargs: dict, deadline: float) -> None:
+        """Apply circuit breaker, rate limits and the in-flight cap before a call."""
+        self.circuit_breaker.before_call()
+        self.request_bucket.acquire(1, deadline)
+        self.token_bucket.acquire(_prompt_tokens(kwargs), deadline)
+        if not self.in_flight.acquire(timeout=max(0.0, deadline - self.clock())):
+            raise GeminiUnavailableError("Too many Gemini calls in flight, try again shortly")
+
+    def _call(self, call: Callable[[dict], Any], kwargs: dict, timeout: Optional[float],
+              hold_slot: bool = False) -> Any:
+        deadline = self.clock() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            self._admit(kwargs, deadline)
+            try:
+                result = call(self._with_deadline(kwargs, deadline))
+            except Exception as e:
+                self.in_flight.release()
+                if not is_retryable(e):
+                    # The backend answered, so it is healthy even though the request was bad
+                    self.circuit_breaker.record_success()
+                    raise
+                self.circuit_breaker.record_failure()
+                if attempt >= self.max_retries or not self._backoff(attempt, deadline):
+                    raise
+                attempt += 1
+                logger.warning(f"Retrying Gemini call (attempt {attempt + 1}): {str(e)}")
+                continue
+            if not hold_slot:
+                self.in_flight.release()
+            self.circuit_breaker.record_success()
+            return result
+
+    def generate_content(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Call backend.generate_content with resilience policies applied.
+
+        Args:
+            timeout: Overall deadline in seconds across all attempts (defaults to GEMINI_TIMEOUT)
+            **kwargs: Arguments for generate_content
+
+        Returns:
+            The backend response
+        """
+        return self._call(lambda call_kwargs: self.backend.generate_content(**call_kwargs), kwargs, timeout)
+
+    def generate_content_stream(self, timeout: Optional[float] = None, **kwargs) -> Iterator[Any]:
+        """
+        Call backend.generate_content_stream with resilience policies applied.
+
+        Retries happen only until the first chunk arrives; the in-flight slot
+        is held until the stream is exhausted or closed.
+
+        Args:
+            timeout: Deadline in seconds for the first chunk (defaults to GEMINI_TIMEOUT)
+            **kwargs: Arguments for generate_content_stream
+
+        Yields:
+            Response chunks from the backend
+        """
+        def call(call_kwargs):
+            stream = iter(self.backend.generate_content_stream(**call_kwargs))
+            return stream, next(stream, None)
+
+        stream, first_chunk = self._call(call, kwargs, timeout, hold_slot=True)
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+                yield from stream
+        finally:
+            self.in_flight.release()
+
+class AsyncResilientModels:
+    """
+    Async counterpart of ResilientModels for client.aio.models.
+
+    Shares the circuit breaker and rate limits of the sync wrapper, so both
+    serving paths draw on the same quota, but caps in-flight calls with its
+    own asyncio semaphore: a waiting call holds a coroutine, not a thread.
+    """
+
+    def __init__(self, backend: Any, policy: ResilientModels, max_in_flight: int = GEMINI_MAX_IN_FLIGHT_ASYNC):
+        self.backend = backend
+        self.policy = policy
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+    async def generate_content(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Await backend.generate_content with resilience policies applied.
+
+        Args:
+            timeout: Overall deadline in seconds across all attempts (defaults to GEMINI_TIMEOUT)
+            **kwargs: Arguments for generate_content
+
+        Returns:
+            The backend response
+        """
+        policy = self.policy
+        deadline = policy.clock() + (timeout or policy.timeout)
+        attempt = 0
+        while True:
+            policy.circuit_breaker.before_call()
+            await policy.request_bucket.acquire_async(1, deadline)
+            await policy.token_bucket.acquire_async(_prompt_tokens(kwargs), deadline)
+            try:
+                async with self.in_flight:
+                    remaining = max(0.001, deadline - policy.clock())
+                    result = await asyncio.wait_for(
+                        self.backend.generate_content(**policy._with_deadline(kwargs, deadline)), remaining
+                    )
+            except Exception as e:
+                if not is_retryable(e):
+                    policy.circuit_breaker.record_success()
+                    raise
+                policy.circuit_breaker.record_failure()
+                delay = policy._backoff_delay(attempt, deadline) if attempt < policy.max_retries else None
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.warning(f"Retrying async Gemini call (attempt {attempt + 1}): {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+            policy.circuit_breaker.record_success()
+            return result
+
+class AsyncResilientClient:
+    """Wraps client.aio so client.aio.models calls go through AsyncResilientModels."""
+
+    def __init__(self, backend: Any, policy: ResilientModels):
+        self.backend = backend
+        self.models = AsyncResilientModels(backend.models, policy)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+class ResilientCaches:
+    """
+    Wrapper for client.caches applying the policies of a ResilientModels
+    instance, so cached-content calls share the deadline, retries, rate
+    limits, in-flight cap and circuit breaker of generate_content calls.
+    """
+
+    def __init__(self, backend: Any, policy: ResilientModels):
+        self.backend = backend
+        self.policy = policy
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+    def create(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Call backend.create with resilience policies applied."""
+        return self.policy._call(lambda call_kwargs: self.backend.create(**call_kwargs), kwargs, timeout)
+
+    def update(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Call backend.update with resilience policies applied."""
+        return self.policy._call(lambda call_kwargs: self.backend.update(**call_kwargs), kwargs, timeout)
+
+    def delete(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Call backend.delete with resilience policies applied."""
+        return self.policy._call(lambda call_kwargs: self.backend.delete(**call_kwargs), kwargs, timeout)
+
+class ResilientClient:
+    """
+    Wraps a genai.Client so client.models calls go through ResilientModels,
+    client.aio.models calls through AsyncResilientModels and client.caches
+    calls through ResilientCaches.
+    Other attributes are passed through to the wrapped client.
+    """
+
+    def __init__(self, backend: Any, **policy):
+        self.backend = backend
+        self.models = ResilientModels(backend.models, **policy)
+        self._aio = None
+        self._caches = None
+
+    @property
+    def caches(self) -> ResilientCaches:
+        if self._caches is None:
+            self._caches = ResilientCaches(self.backend.caches, self.models)
+        return self._caches
+
+    @property
+    def aio(self) -> AsyncResilientClient:
+        # Built on first use: the async client is only needed by the ASGI path
+        if self._aio is None:
+            self._aio = AsyncResilientClient(self.backend.aio, self.models)
+        return self._aio
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
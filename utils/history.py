@@ -0,0 +1,389 @@
+import os
+import re
+import html
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Analysis history (opt-in): 'sqlite' keeps analyzed documents and results in a searchable
+# database at HISTORY_DATABASE_PATH, readable only by their owner; 'none' disables it
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "none")
+HISTORY_DATABASE_PATH = os.environ.get(
+    "HISTORY_DATABASE_PATH",
+    os.path.join(tempfile.gettempdir(), "legal_demystifier_history.db")
+)
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", 20))
+# Documents and their analyses are deleted this many days after they were first recorded; 0 keeps them
+HISTORY_RETENTION_DAYS = float(os.environ.get("HISTORY_RETENTION_DAYS", 30))
+HISTORY_MAX_PAGE_SIZE = 100
+
+WORD_PATTERN = re.compile(r"\w+")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# Snippet match markers, replaced by <mark> after the snippet is HTML-escaped
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+# Result fields that describe the analysis rather than the document
+UNSEARCHED_FIELDS = {'error', 'near_duplicate'}
+
+# Full-text index over history_texts (external content), kept in sync by triggers
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+    "body, content='history_texts', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS history_texts_ai AFTER INSERT ON history_texts BEGIN "
+    "INSERT INTO history_fts (rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS history_texts_ad AFTER DELETE ON history_texts BEGIN "
+    "INSERT INTO history_fts (history_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS history_texts_au AFTER UPDATE ON history_texts BEGIN "
+    "INSERT INTO history_fts (history_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO history_fts (rowid, body) VALUES (new.id, new.body); END"
+)
+
+class HistoryEntry(NamedTuple):
+    """One analysis of a document, as recorded in the history."""
+    document_id: str
+    filename: Optional[str]
+    document_text: str
+    action: str
+    question: Optional[str]
+    result: Dict[str, Any]
+    owner: Optional[str] = None  # the browser session, or BATCH_HISTORY_OWNER for command-line batch runs
+
+def result_text(value: Any) -> str:
+    """
+    Flatten an analysis result into plain searchable text.
+
+    Args:
+        value: Result dict, or any value nested in one
+
+    Returns:
+        str: Every string in the result with HTML formatting removed
+    """
+    if isinstance(value, str):
+        return html.unescape(TAG_PATTERN.sub(' ', value))
+    if isinstance(value, dict):
+        return "\n".join(result_text(item) for key, item in value.items() if key not in UNSEARCHED_FIELDS)
+    if isinstance(value, list):
+        return "\n".join(result_text(item) for item in value)
+    return ""
+
+def fts_query(query: str) -> str:
+    """
+    Turn a user's search into an FTS5 query.
+
+    Each whitespace-separated term must match; hyphenated or punctuated
+    terms such as "auto-renewal" match as phrases, a trailing * matches a
+    prefix and OR between terms matches either.
+
+    Args:
+        query: Search text as typed
+
+    Returns:
+        str: FTS5 MATCH expression
+
+    Raises:
+        ValueError: If the search has no words
+    """
+    terms = []
+    for chunk in query.split():
+        if chunk == 'OR':
+            if terms and terms[-1] != 'OR':
+                terms.append('OR')
+            continue
+        words = WORD_PATTERN.findall(chunk)
+        if words:
+            terms.append('"' + " ".join(words) + '"' + ('*' if chunk.endswith('*') else ''))
+    while terms and terms[-1] == 'OR':
+        terms.pop()
+    if not terms:
+        raise ValueError("Search query has no words")
+    return " ".join(terms)
+
+class HistoryStore:
+    """
+    Analyzed documents and their results in SQLite, searchable with FTS5.
+
+    Document text and the text of every result go into one FTS5 index,
+    so a search covers both what documents say and what the analyses
+    found, without model calls. Every document is recorded per owner and
+    searches and reads only see the caller's own; documents are deleted
+    retention_days after they were first recorded. The database is opened
+    on first use through its own Flask-SQLAlchemy app, which keeps
+    SQLAlchemy off the startup path and lets batch runs record history
+    without the web app.
+    """
+
+    def __init__(self, path: str = HISTORY_DATABASE_PATH, retention_days: float = HISTORY_RETENTION_DAYS,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.retention_days = retention_days
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._app = None
+        self._db = None
+        self._models = None
+
+    def _database(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._open()
+        return self._app, self._db, self._models
+
+    def _open(self) -> None:
+        from flask import Flask
+        from flask_sqlalchemy import SQLAlchemy
+        from sqlalchemy import event
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Documents are confidential: create the database private to this user (SQLite gives its
+        # -wal and -shm files the same permissions)
+        os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        os.chmod(self.path, 0o600)
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.abspath(self.path)}"
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30, 'check_same_thread': False}}
+        db = SQLAlchemy(app)
+
+        class HistoryDocument(db.Model):
+            # Owners are stored as '' when there is none, like questions
+            __tablename__ = 'history_documents'
+            document_id = db.Column(db.String(64), primary_key=True)
+            owner = db.Column(db.String(64), primary_key=True, default='')
+            filename = db.Column(db.String(255))
+            text_chars = db.Column(db.Integer, nullable=False)
+            created_at = db.Column(db.Float, nullable=False, index=True)
+
+        class HistoryText(db.Model):
+            # One row per document text ('document') and per analysis (its action and question)
+            __tablename__ = 'history_texts'
+            __table_args__ = (
+                db.UniqueConstraint('document_id', 'owner', 'source', 'question'),
+                db.ForeignKeyConstraint(['document_id', 'owner'],
+                                        ['history_documents.document_id', 'history_documents.owner']),
+                db.Index('ix_history_texts_document', 'document_id', 'owner')
+            )
+            id = db.Column(db.Integer, primary_key=True)
+            document_id = db.Column(db.String(64), nullable=False)
+            owner = db.Column(db.String(64), nullable=False, default='')
+            source = db.Column(db.String(32), nullable=False)
+            question = db.Column(db.Text, nullable=False, default='')
+            body = db.Column(db.Text, nullable=False)
+            result = db.Column(db.Text)
+            created_at = db.Column(db.Float, nullable=False)
+
+        with app.app_context():
+            def configure(connection, _):
+                cursor = connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
+            event.listen(db.engine, 'connect', configure)
+            db.create_all()
+            for statement in FTS_SCHEMA:
+                db.session.execute(db.text(statement))
+            db.session.commit()
+
+        logger.info(f"Opened analysis history at {self.path}")
+        self._app, self._models = app, (HistoryDocument, HistoryText)
+        self._db = db
+
+    def record(self, entry: HistoryEntry) -> None:
+        """Record one analysis; see record_many()."""
+        self.record_many([entry])
+
+    def record_many(self, entries: Iterable[HistoryEntry]) -> None:
+        """
+        Record analyses in one transaction.
+
+        Each owner's copy of a document's text is stored and indexed once.
+        An analysis that was recorded before for the same document, owner,
+        action and question is replaced, so re-running an analysis never
+        duplicates search hits. Documents past the retention period are
+        deleted in the same transaction.
+
+        Args:
+            entries: Analyses to record; documents may repeat
+        """
+        from sqlalchemy.dialects.sqlite import insert
+
+        entries = list(entries)
+        if not entries:
+            return
+        app, db, (HistoryDocument, HistoryText) = self._database()
+        now = self._clock()
+
+        documents = {}
+        analyses = {}
+        for entry in entries:
+            owner = entry.owner or ''
+            documents.setdefault((entry.document_id, owner), entry)
+            analyses[(entry.document_id, owner, entry.action, entry.question or '')] = entry
+
+        with app.app_context():
+            self._prune(db, now)
+            existing = {tuple(row) for row in db.session.execute(
+                db.select(HistoryDocument.document_id, HistoryDocument.owner)
+                .where(HistoryDocument.document_id.in_([document_id for document_id, _ in documents]))
+            )}
+            new_documents = [(key, entry) for key, entry in documents.items() if key not in existing]
+            if new_documents:
+                db.session.execute(insert(HistoryDocument).on_conflict_do_nothing(), [
+                    {'document_id': document_id, 'owner': owner, 'filename': entry.filename,
+                     'text_chars': len(entry.document_text), 'created_at': now}
+                    for (document_id, owner), entry in new_documents
+                ])
+                db.session.execute(insert(HistoryText).on_conflict_do_nothing(), [
+                    {'document_id': document_id, 'owner': owner, 'source': 'document', 'question': '',
+                     'body': entry.document_text, 'result': None, 'created_at': now}
+                    for (document_id, owner), entry in new_documents
+                ])
+
+            upsert = insert(HistoryText)
+            upsert = upsert.on_conflict_do_update(
+                index_elements=['document_id', 'owner', 'source', 'question'],
+                set_={'body': upsert.excluded.body, 'result': upsert.excluded.result,
+                      'created_at': upsert.excluded.created_at}
+            )
+            db.session.execute(upsert, [
+                {'document_id': document_id, 'owner': owner, 'source': action, 'question': question,
+                 'body': "\n".join(filter(None, (question, result_text(entry.result)))),
+                 'result': json.dumps(entry.result), 'created_at': now}
+                for (document_id, owner, action, question), entry in analyses.items()
+            ])
+            db.session.commit()
+        logger.debug(f"Recorded {len(analyses)} analyses of {len(documents)} documents "
+                     f"({len(new_documents)} new) in history")
+
+    def _cutoff(self) -> float:
+        """Creation time before which documents are past retention (0 when they are kept)."""
+        return self._clock() - self.retention_days * 86400 if self.retention_days > 0 else 0.0
+
+    def _prune(self, db, now: float) -> None:
+        if self.retention_days <= 0:
+            return
+        parameters = {'cutoff': now - self.retention_days * 86400}
+        # Texts go first, so the FTS triggers remove them from the index
+        db.session.execute(db.text(
+            "DELETE FROM history_texts WHERE (document_id, owner) IN "
+            "(SELECT document_id, owner FROM history_documents WHERE created_at < :cutoff)"
+        ), parameters)
+        deleted = db.session.execute(db.text(
+            "DELETE FROM history_documents WHERE created_at < :cutoff"
+        ), parameters).rowcount
+        if deleted:
+            logger.info(f"Deleted {deleted} documents past the {self.retention_days:g}-day history retention")
+
+    def search(self, query: str, page: int = 1, per_page: int = HISTORY_PAGE_SIZE,
+               action: Optional[str] = None, owner: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Search one owner's document text and analysis results.
+
+        Args:
+            query: Search text (see fts_query)
+            page: 1-based result page
+            per_page: Hits per page, at most HISTORY_MAX_PAGE_SIZE
+            action: Only search this source: 'document' for document text or an action name
+            owner: Owner whose documents are searched (see HistoryEntry)
+
+        Returns:
+            Dict with the page, the total hit count and hits ranked by relevance, each
+            with its document, filename, source, question and an HTML snippet
+
+        Raises:
+            ValueError: If the search has no words
+        """
+        match = fts_query(query)
+        page = max(1, page)
+        per_page = min(max(1, per_page), HISTORY_MAX_PAGE_SIZE)
+        app, db, _ = self._database()
+
+        source_filter = "AND t.source = :source" if action else ""
+        # Documents past retention that no write has pruned yet are left out
+        parameters = {'match': match, 'owner': owner or '', 'source': action, 'cutoff': self._cutoff(),
+                      'limit': per_page, 'offset': (page - 1) * per_page}
+        with app.app_context():
+            total = db.session.execute(db.text(
+                "SELECT count(*) FROM history_fts JOIN history_texts t ON t.id = history_fts.rowid "
+                "JOIN history_documents d ON d.document_id = t.document_id AND d.owner = t.owner "
+                f"WHERE history_fts MATCH :match AND t.owner = :owner AND d.created_at >= :cutoff {source_filter}"
+            ), parameters).scalar()
+            rows = db.session.execute(db.text(
+                "SELECT t.document_id, d.filename, t.source, t.question, t.created_at, "
+                "snippet(history_fts, 0, char(2), char(3), '…', 16) AS snippet, bm25(history_fts) AS score "
+                "FROM history_fts JOIN history_texts t ON t.id = history_fts.rowid "
+                "JOIN history_documents d ON d.document_id = t.document_id AND d.owner = t.owner "
+                f"WHERE history_fts MATCH :match AND t.owner = :owner AND d.created_at >= :cutoff {source_filter} "
+                "ORDER BY score LIMIT :limit OFFSET :offset"
+            ), parameters).all()
+
+        return {
+            'query': query,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'results': [{
+                'document_id': row.document_id,
+                'filename': row.filename,
+                'source': row.source,
+                'question': row.question or None,
+                'created_at': row.created_at,
+                'snippet': html.escape(row.snippet.strip()).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+            } for row in rows]
+        }
+
+    def document(self, document_id: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load a recorded document's details and every analysis recorded for it.
+
+        Args:
+            document_id: The document's hash
+            owner: Owner the document was recorded for (see HistoryEntry)
+
+        Returns:
+            Optional[Dict]: Filename, size and analyses with their results, or None if not recorded
+        """
+        app, db, (HistoryDocument, HistoryText) = self._database()
+        with app.app_context():
+            document = db.session.get(HistoryDocument, (document_id, owner or ''))
+            if document is None or document.created_at < self._cutoff():
+                return None
+            analyses = db.session.execute(
+                db.select(HistoryText.source, HistoryText.question, HistoryText.result, HistoryText.created_at)
+                .where(HistoryText.document_id == document_id, HistoryText.owner == document.owner,
+                       HistoryText.source != 'document')
+                .order_by(HistoryText.created_at)
+            ).all()
+            return {
+                'document_id': document.document_id,
+                'filename': document.filename,
+                'text_chars': document.text_chars,
+                'created_at': document.created_at,
+                'analyses': [{'action': row.source, 'question': row.question or None,
+                              'result': json.loads(row.result), 'created_at': row.created_at}
+                             for row in analyses]
+            }
+
+def create_history_store(backend: str = HISTORY_BACKEND) -> Optional[HistoryStore]:
+    """
+    Build the analysis history selected by configuration.
+
+    Args:
+        backend: 'sqlite' for the searchable database, 'none' to disable history
+
+    Returns:
+        Optional[HistoryStore]: Configured store, or None when disabled
+    """
+    if backend == 'sqlite':
+        return HistoryStore()
+    elif backend == 'none':
+        return None
+    else:
+        raise ValueError(f"Unsupported history backend: {backend}")
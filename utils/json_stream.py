@@ -0,0 +1,197 @@
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+
+_WHITESPACE = ' \t\n\r'
+
+# Characters that matter while finding where a value ends
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CONTAINER_SPECIAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    Text is fed in arbitrary pieces as it arrives from the model. Each call
+    to feed() returns the events that became complete:
+
+    - ('value', key, value) for a finished top-level value that is not a list
+    - ('item', key, value) for each finished element of a top-level list
+
+    Values are only reported once their closing delimiter has been seen, so
+    partially streamed strings and numbers are never emitted. Each piece of
+    an unfinished value is scanned once and kept aside until the value ends,
+    and consumed text is dropped from the buffer, so parsing a stream is
+    linear in its length.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = 'start'
+        self.key = None
+        self.done = False
+        # Scan state of the value at pos while it is unfinished
+        self._scalar = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._pending = None
+        self._value_end = None
+
+    def feed(self, text: str) -> List[Tuple[str, str, Any]]:
+        """
+        Add streamed text and return newly completed events.
+
+        Args:
+            text: Next piece of the JSON document
+
+        Returns:
+            List[Tuple[str, str, Any]]: (event, key, value) tuples
+        """
+        events = []
+        if self._pending is not None:
+            # Only the new piece is scanned; the buffer is joined once the value ends
+            self._pending.append(text)
+            end = self._scan(text, 0)
+            if end is None:
+                return events
+            self.buffer += "".join(self._pending)
+            self._value_end = len(self.buffer) - len(text) + end
+            self._pending = None
+        else:
+            self.buffer += text
+
+        while not self.done and self._step(events):
+            pass
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        return events
+
+    def _skip_whitespace(self) -> bool:
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    def _scan(self, text: str, i: int) -> Optional[int]:
+        """Advance the scan of the current value through text from i; return the index after its end."""
+        if self._scalar:
+            # Scalars like numbers are only complete once a delimiter follows them
+            match = _SCALAR_END.search(text, i)
+            return match.start() if match else None
+
+        if self._escape and i < len(text):
+            self._escape = False
+            i += 1
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    return None
+                i = match.end()
+                if match.group() == '\\':
+                    if i >= len(text):
+                        self._escape = True
+                        return None
+                    i += 1
+                    continue
+                self._in_string = False
+                if self._depth == 0:
+                    return i
+            else:
+                match = _CONTAINER_SPECIAL.search(text, i)
+                if match is None:
+                    return None
+                char = match.group()
+                i = match.end()
+                if char == '"':
+                    self._in_string = True
+                elif char in '[{':
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        return i
+
+    def _decode_value(self):
+        """Decode one complete JSON value at pos, or return None if more input is needed."""
+        end = self._value_end
+        self._value_end = None
+        if end is None:
+            self._scalar = self.buffer[self.pos] not in '"[{'
+            self._depth = 0
+            self._in_string = False
+            self._escape = False
+            end = self._scan(self.buffer, self.pos)
+            if end is None:
+                self._pending = []
+                return None
+        try:
+            value, _ = _decoder.raw_decode(self.buffer[:end], self.pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Streamed response is not valid JSON: {e}")
+        self.pos = end
+        return (value,)
+
+    def _step(self, events: List[Tuple[str, str, Any]]) -> bool:
+        if not self._skip_whitespace():
+            return False
+
+        char = self.buffer[self.pos]
+
+        if self.state == 'start':
+            if char != '{':
+                raise ValueError("Streamed response is not a JSON object")
+            self.pos += 1
+            self.state = 'key'
+        elif self.state == 'key':
+            if char == '}':
+                self.pos += 1
+                self.done = True
+                return False
+            decoded = self._decode_value()
+            if decoded is None:
+                return False
+            self.key = decoded[0]
+            self.state = 'colon'
+        elif self.state == 'colon':
+            self.pos += 1
+            self.state = 'value'
+        elif self.state == 'value':
+            if char == '[':
+                self.pos += 1
+                self.state = 'item'
+            else:
+                decoded = self._decode_value()
+                if decoded is None:
+                    return False
+                events.append(('value', self.key, decoded[0]))
+                self.state = 'after_value'
+        elif self.state == 'item':
+            if char == ']':
+                self.pos += 1
+                self.state = 'after_value'
+            else:
+                decoded = self._decode_value()
+                if decoded is None:
+                    return False
+                events.append(('item', self.key, decoded[0]))
+                self.state = 'after_item'
+        elif self.state == 'after_item':
+            self.pos += 1
+            self.state = 'item' if char == ',' else 'after_value'
+        elif self.state == 'after_value':
+            self.pos += 1
+            if char == '}':
+                self.done = True
+                return False
+            self.state = 'key'
+
+        return True
@@ -0,0 +1,247 @@
+import time
+import logging
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Every metric created without an explicit registry, rendered by /metrics
+REGISTRY: List["Metric"] = []
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Metric(ABC):
+    """Base class for labelled metrics rendered in the Prometheus text format."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 registry: Optional[List["Metric"]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for every labelled value, without the HELP and TYPE lines."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 registry: Optional[List[Metric]] = None):
+        super().__init__(name, help_text, labelnames, registry)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{self._format_labels(key)} {value}" for key, value in items]
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional[List[Metric]] = None):
+        super().__init__(name, help_text, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels) -> int:
+        state = self.values.get(self._key(labels))
+        return int(state[-1]) if state else 0
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self.values.items())
+        lines = []
+        for key, state in items:
+            for bound, bucket_count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', repr(float(bound))))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', '+Inf'))} {state[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {state[-1]}")
+        return lines
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format.
+
+    Returns:
+        str: Exposition text for the /metrics endpoint
+    """
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+# Application metrics. Values are per process; with several gunicorn workers each reports its own.
+REQUEST_SECONDS = Histogram('app_request_seconds', "Request duration", ('endpoint', 'status'))
+STAGE_SECONDS = Histogram('app_stage_seconds', "Time spent in each stage of a request", ('endpoint', 'stage'))
+MODEL_SECONDS = Histogram('model_call_seconds', "Model call latency", ('action', 'mode', 'model'))
+MODEL_ERRORS = Counter('model_call_errors_total', "Failed model calls", ('action', 'model'))
+MODEL_ROUTES = Counter('model_routes_total', "Model chosen for each call, by routing reason",
+                       ('action', 'model', 'reason'))
+MODEL_FALLBACKS = Counter('model_fallbacks_total', "Calls retried on another model after a failure",
+                          ('action', 'model'))
+MODEL_PROMPT_TOKENS = Histogram('model_prompt_tokens', "Prompt tokens per model call", ('action',),
+                                buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+MODEL_CACHED_TOKENS = Histogram('model_cached_tokens', "Prompt tokens served from a cached context per model call",
+                                ('action',), buckets=(1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000))
+MODEL_RESPONSE_TOKENS = Histogram('model_response_tokens', "Response tokens per model call", ('action',),
+                                  buckets=(100, 250, 500, 1000, 2000, 4000, 8000))
+COALESCED_REQUESTS = Counter('coalesced_requests_total', "Analyses served by an identical in-flight call",
+                             ('scope',))
+PROMPT_TOKEN_ESTIMATE_RATIO = Histogram('model_prompt_token_estimate_ratio',
+                                        "Reported prompt tokens divided by the local estimate", ('action',),
+                                        buckets=(0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0))
+PROMPT_STRATEGIES = Counter('prompt_strategy_total', "Prompt strategies chosen by the token budget",
+                            ('action', 'strategy'))
+CONTEXT_CACHE_EVENTS = Counter('context_cache_events_total', "Model-side cached document contexts by event",
+                               ('event',))
+CACHE_LOOKUPS = Counter('result_cache_lookups_total', "Result cache lookups by outcome", ('result',))
+EXTRACTION_CACHE_LOOKUPS = Counter('extraction_cache_lookups_total', "Extraction artifact lookups by outcome",
+                                   ('result',))
+NEAR_DUPLICATE_LOOKUPS = Counter('near_duplicate_lookups_total',
+                                 "Near-duplicate lookups before analysis, by outcome (reused, too_different, failed, miss)",
+                                 ('result',))
+EXTRACTION_SECONDS = Histogram('extraction_seconds', "Text extraction time per document", ('file_type',))
+EXTRACTION_PAGE_SECONDS = Histogram('extraction_page_seconds', "PDF text extraction time per page",
+                                    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+DOCUMENT_BYTES = Histogram('document_size_bytes', "Uploaded document size", ('file_type',),
+                           buckets=(10_000, 50_000, 100_000, 500_000, 1_000_000, 4_000_000, 16_000_000))
+DOCUMENT_PAGES = Histogram('document_pages', "Pages with text per PDF document",
+                           buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+DOCUMENT_TOKENS = Histogram('document_tokens', "Estimated tokens per extracted document",
+                            buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000))
+
+class RequestTrace:
+    """Timing spans collected while handling one request."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "endpoint": self.endpoint,
+            "duration_ms": round(self.elapsed * 1000, 3),
+            "spans": [{"stage": name, "duration_ms": round(duration * 1000, 3)} for name, duration in self.spans]
+        }
+
+    def server_timing(self) -> str:
+        """Spans formatted for the Server-Timing response header."""
+        return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, duration in self.spans)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('request_trace', default=None)
+
+def start_trace(endpoint: str) -> RequestTrace:
+    """
+    Begin collecting spans for the current request.
+
+    Args:
+        endpoint: Endpoint name used as a metric label
+
+    Returns:
+        RequestTrace: The active trace
+    """
+    trace = RequestTrace(endpoint)
+    _current_trace.set(trace)
+    return trace
+
+def finish_trace(status: int) -> Optional[RequestTrace]:
+    """
+    End the current trace and record the request duration.
+
+    Args:
+        status: HTTP status code of the response
+
+    Returns:
+        Optional[RequestTrace]: The finished trace, or None if no trace was started
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    REQUEST_SECONDS.observe(trace.elapsed, endpoint=trace.endpoint, status=status)
+    return trace
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a stage of request handling.
+
+    The duration is recorded in STAGE_SECONDS and, when called while a
+    trace is active, appended to the trace. Work on background threads is
+    labelled with the 'background' endpoint.
+
+    Args:
+        name: Stage name, e.g. 'extract' or 'render'
+    """
+    trace = _current_trace.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, endpoint=trace.endpoint if trace else 'background', stage=name)
+        if trace is not None:
+            trace.spans.append((name, duration))
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Model backend selection: 'gemini' for the live API, 'fake' for offline development and benchmarks
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "gemini")
+FAKE_MODEL_LATENCY = float(os.environ.get("FAKE_MODEL_LATENCY", 0.05))
+FAKE_MODEL_RESPONSE_CHARS = int(os.environ.get("FAKE_MODEL_RESPONSE_CHARS", 2000))
+FAKE_MODEL_STREAM_CHUNKS = int(os.environ.get("FAKE_MODEL_STREAM_CHUNKS", 8))
+
+# Every field any prompt asks for, so one fake response satisfies all actions
+FAKE_TEXT_FIELDS = ('summary', 'simplified_text', 'answer')
+FAKE_LIST_FIELDS = ('risks', 'obligations', 'key_points', 'relevant_clauses', 'recommendations')
+
+# Question IDs in a question-list prompt, each answered separately
+FAKE_QUESTION_ID_PATTERN = re.compile(r"^\[(Q\d+)\]", re.MULTILINE)
+
+FAKE_SENTENCE = "This clause has been restated in plain language for the reader. "
+
+def _prompt_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    text = ""
+    for content in contents or []:
+        for part in getattr(content, 'parts', None) or []:
+            text += getattr(part, 'text', None) or ""
+    return text
+
+class FakeModels:
+    """
+    Deterministic local stand-in for client.models.
+
+    Responses are valid JSON for every prompt in ai_processor, depend only
+    on the prompt content, and take latency seconds to produce. Text fields
+    are padded so the whole response is roughly response_chars long.
+    """
+
+    def __init__(self, latency: float = FAKE_MODEL_LATENCY, response_chars: int = FAKE_MODEL_RESPONSE_CHARS,
+                 stream_chunks: int = FAKE_MODEL_STREAM_CHUNKS):
+        self.latency = latency
+        self.response_chars = response_chars
+        self.stream_chunks = max(1, stream_chunks)
+        self.calls = 0
+        # Cached contexts created through FakeCaches: name -> system instruction plus contents
+        self.cached_contents: Dict[str, str] = {}
+
+    def response_text(self, contents: Any, config: Any = None) -> str:
+        """
+        Build the JSON response for a prompt.
+
+        Args:
+            contents: Prompt contents as passed to generate_content
+            config: Generation config; its system instruction also shapes the response
+
+        Returns:
+            str: JSON response text
+        """
+        prompt = (getattr(config, 'system_instruction', None) or "") + _prompt_text(contents)
+        cached_content = getattr(config, 'cached_content', None)
+        if cached_content:
+            if cached_content not in self.cached_contents:
+                raise ValueError(f"Cached content not found: {cached_content}")
+            prompt = self.cached_contents[cached_content] + prompt
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+
+        response = {field: [f"{field.replace('_', ' ').capitalize()} {digest}-{i}" for i in range(3)]
+                    for field in FAKE_LIST_FIELDS}
+        base_size = len(json.dumps(response))
+        text_size = max(0, self.response_chars - base_size) // len(FAKE_TEXT_FIELDS)
+        body = (FAKE_SENTENCE * (text_size // len(FAKE_SENTENCE) + 1))[:text_size]
+        for field in FAKE_TEXT_FIELDS:
+            response[field] = f"[{digest}] {body}".strip()
+        question_ids = FAKE_QUESTION_ID_PATTERN.findall(_prompt_text(contents))
+        if question_ids:
+            response['answers'] = [
+                dict({field: response[field] for field in ('relevant_clauses', 'risks', 'recommendations')},
+                     question_id=question_id, answer=f"[{digest}] Answer to {question_id}. {body}".strip())
+                for question_id in question_ids
+            ]
+        return json.dumps(response)
+
+    def generate_content(self, model: Optional[str] = None, contents: Any = None,
+                         config: Any = None, **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return SimpleNamespace(text=self.response_text(contents, config))
+
+    def generate_content_stream(self, model: Optional[str] = None, contents: Any = None,
+                                config: Any = None, **kwargs) -> Iterator[SimpleNamespace]:
+        self.calls += 1
+        text = self.response_text(contents, config)
+        size = -(-len(text) // self.stream_chunks)
+        # The latency is spread across chunks so the first one arrives early, like a real stream
+        for start in range(0, len(text), size):
+            if self.latency:
+                time.sleep(self.latency / self.stream_chunks)
+            yield SimpleNamespace(text=text[start:start + size])
+
+class AsyncFakeModels:
+    """Async view of a FakeModels instance, like client.aio.models; latency is awaited, not slept."""
+
+    def __init__(self, models: FakeModels):
+        self.sync_models = models
+
+    async def generate_content(self, model: Optional[str] = None, contents: Any = None,
+                               config: Any = None, **kwargs) -> SimpleNamespace:
+        self.sync_models.calls += 1
+        if self.sync_models.latency:
+            await asyncio.sleep(self.sync_models.latency)
+        return SimpleNamespace(text=self.sync_models.response_text(contents, config))
+
+class FakeCaches:
+    """
+    Stand-in for client.caches: cached contexts are kept in the FakeModels
+    instance and used by generate_content calls that reference them.
+    """
+
+    def __init__(self, models: FakeModels):
+        self.sync_models = models
+        self.created = 0
+
+    def create(self, model: Optional[str] = None, config: Any = None) -> SimpleNamespace:
+        content = (getattr(config, 'system_instruction', None) or "") + _prompt_text(getattr(config, 'contents', None))
+        self.created += 1
+        name = f"cachedContents/{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}-{self.created}"
+        self.sync_models.cached_contents[name] = content
+        return SimpleNamespace(name=name, model=model)
+
+    def update(self, name: Optional[str] = None, config: Any = None) -> SimpleNamespace:
+        if name not in self.sync_models.cached_contents:
+            raise ValueError(f"Cached content not found: {name}")
+        return SimpleNamespace(name=name)
+
+    def delete(self, name: Optional[str] = None, config: Any = None) -> None:
+        self.sync_models.cached_contents.pop(name, None)
+
+class FakeClient:
+    """Minimal genai.Client replacement exposing a FakeModels instance as .models."""
+
+    def __init__(self, **options):
+        self.models = FakeModels(**options)
+        self.aio = SimpleNamespace(models=AsyncFakeModels(self.models))
+        self.caches = FakeCaches(self.models)
+
+class LazyClient:
+    """
+    Defers building a model client until an attribute is first used.
+
+    Keeps client construction (and the imports behind it) off the startup
+    path, so workers can serve health checks before touching the backend.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+def create_model_client(backend: str = MODEL_BACKEND, api_key: Optional[str] = None) -> Any:
+    """
+    Build the raw model client selected by configuration.
+
+    Args:
+        backend: 'gemini' for genai.Client, 'fake' for the local deterministic backend
+        api_key: Gemini API key
+
+    Returns:
+        A client whose .models offers generate_content and generate_content_stream
+    """
+    if backend == 'gemini':
+        # google.genai takes most of a second to import, so it is only loaded when a client is built
+        from google import genai
+        return genai.Client(api_key=api_key)
+    elif backend == 'fake':
+        logger.warning("Using the fake model backend; responses are not real analyses")
+        return FakeClient()
+    else:
+        raise ValueError(f"Unsupported model backend: {backend}")
@@ -0,0 +1,202 @@
+import os
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from utils.metrics import MODEL_ROUTES
+
+logger = logging.getLogger(__name__)
+
+# Model tiers. MODEL_LIGHT handles short prompts for simple actions; MODEL_STANDARD everything else.
+# An empty MODEL_LIGHT (or the same model in both) sends every request to MODEL_STANDARD.
+MODEL_STANDARD = os.environ.get("MODEL_STANDARD", "gemini-2.5-flash")
+MODEL_LIGHT = os.environ.get("MODEL_LIGHT", "gemini-2.5-flash-lite")
+# Actions the light tier may handle, and the largest prompt it is given for them
+ROUTER_LIGHT_ACTIONS = os.environ.get("ROUTER_LIGHT_ACTIONS", "question,simplify,summarize")
+ROUTER_LIGHT_MAX_TOKENS = int(os.environ.get("ROUTER_LIGHT_MAX_TOKENS", 4000))
+
+# Default latency budget in seconds for one model call; 0 disables it.
+# Requests can set their own with the X-Latency-Budget header.
+MODEL_LATENCY_BUDGET = float(os.environ.get("MODEL_LATENCY_BUDGET", 0))
+# Recent calls per model used to predict latency, and how many are needed before predicting
+ROUTER_WINDOW = int(os.environ.get("ROUTER_WINDOW", 50))
+ROUTER_MIN_SAMPLES = int(os.environ.get("ROUTER_MIN_SAMPLES", 5))
+ROUTER_LATENCY_PERCENTILE = float(os.environ.get("ROUTER_LATENCY_PERCENTILE", 95))
+# After a failed call a model is only used as a fallback for this many seconds
+ROUTER_COOLDOWN = float(os.environ.get("ROUTER_COOLDOWN", 30))
+
+# Latency is tracked per 1000 prompt tokens; shorter prompts count as 1000 since fixed overhead dominates them
+LATENCY_UNIT_TOKENS = 1000
+
+class Route(NamedTuple):
+    """Models to try for one call, in order, and why the first was chosen."""
+    models: Tuple[str, ...]
+    reason: str  # 'light', 'standard', 'budget', 'cooldown' or 'cached'
+
+_request_budget: contextvars.ContextVar = contextvars.ContextVar('latency_budget', default=None)
+
+def set_latency_budget(seconds: Optional[float]) -> None:
+    """
+    Set the latency budget for model calls made by the current request.
+
+    Args:
+        seconds: Budget per model call, or None for MODEL_LATENCY_BUDGET
+    """
+    _request_budget.set(seconds)
+
+def latency_budget() -> Optional[float]:
+    """
+    Latency budget for the current request.
+
+    Returns:
+        Optional[float]: Budget in seconds, or None if there is none
+    """
+    budget = _request_budget.get()
+    if budget is None:
+        budget = MODEL_LATENCY_BUDGET
+    return budget if budget > 0 else None
+
+def parse_latency_budget(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a latency budget given by a client.
+
+    Args:
+        value: Seconds as a string, e.g. from the X-Latency-Budget header
+
+    Returns:
+        Optional[float]: Positive budget in seconds, or None if missing or invalid
+    """
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        return None
+    return budget if math.isfinite(budget) and budget > 0 else None
+
+class ModelRouter:
+    """
+    Picks the model tier for each call and learns from how calls went.
+
+    Short prompts for simple actions go to the light tier and the rest to
+    the standard tier. When a latency budget is set and the chosen tier's
+    recent latency predicts the call would exceed it, the other tier is
+    tried first if it is predicted to be faster. A tier whose last call
+    failed is demoted to fallback for ROUTER_COOLDOWN seconds. Every route
+    lists the other tier as a fallback for failed calls.
+    """
+
+    def __init__(self, standard: str = MODEL_STANDARD, light: str = MODEL_LIGHT,
+                 light_actions: str = ROUTER_LIGHT_ACTIONS, light_max_tokens: int = ROUTER_LIGHT_MAX_TOKENS,
+                 window: int = ROUTER_WINDOW, cooldown: float = ROUTER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.standard = standard
+        self.light = light if light and light != standard else None
+        self.light_actions = {action.strip() for action in light_actions.split(',') if action.strip()}
+        self.light_max_tokens = light_max_tokens
+        self.cooldown = cooldown
+        self.clock = clock
+        self._latencies: Dict[str, Deque[float]] = {
+            model: deque(maxlen=window) for model in self.models
+        }
+        self._failed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def models(self) -> Tuple[str, ...]:
+        """Configured models, lightest first."""
+        return (self.light, self.standard) if self.light else (self.standard,)
+
+    @property
+    def policy(self) -> str:
+        """Identifies the configured tiers, e.g. for cache keys."""
+        return "+".join(self.models)
+
+    def predict(self, model: str, prompt_tokens: int,
+                percentile: float = ROUTER_LATENCY_PERCENTILE) -> Optional[float]:
+        """
+        Predict a call's latency from the model's recent calls.
+
+        Args:
+            model: Model name
+            prompt_tokens: Tokens in the prompt
+            percentile: Percentile of recent latencies to predict
+
+        Returns:
+            Optional[float]: Seconds, or None with fewer than ROUTER_MIN_SAMPLES recent calls
+        """
+        with self._lock:
+            rates = sorted(self._latencies.get(model, ()))
+        if len(rates) < ROUTER_MIN_SAMPLES:
+            return None
+        rate = rates[min(len(rates) - 1, int(len(rates) * percentile / 100))]
+        return rate * max(1, prompt_tokens / LATENCY_UNIT_TOKENS)
+
+    def _cooling_down(self, model: str) -> bool:
+        with self._lock:
+            failed_at = self._failed_at.get(model)
+        return failed_at is not None and self.clock() - failed_at < self.cooldown
+
+    def route(self, action: str, prompt_tokens: int, budget: Optional[float] = None,
+              pinned: Optional[str] = None) -> Route:
+        """
+        Choose the models to try for a call.
+
+        Args:
+            action: Metric label of the prompt ('summarize', 'question', ...)
+            prompt_tokens: Tokens the call is sized by
+            budget: Latency budget in seconds, or None
+            pinned: Model the call must use, e.g. the one holding its cached context
+
+        Returns:
+            Route: Models in the order to try them
+        """
+        if self.light and action in self.light_actions and prompt_tokens <= self.light_max_tokens:
+            order, reason = [self.light, self.standard], 'light'
+        else:
+            order, reason = list(reversed(self.models)), 'standard'
+
+        if pinned:
+            order, reason = [pinned], 'cached'
+        elif len(order) > 1:
+            if budget:
+                predicted = self.predict(order[0], prompt_tokens)
+                alternative = self.predict(order[1], prompt_tokens)
+                if predicted is not None and predicted > budget and \
+                        alternative is not None and alternative < predicted:
+                    order.reverse()
+                    reason = 'budget'
+            if self._cooling_down(order[0]) and not self._cooling_down(order[1]):
+                order.reverse()
+                reason = 'cooldown'
+
+        MODEL_ROUTES.inc(action=action, model=order[0], reason=reason)
+        logger.debug(f"Routing {action} call ({prompt_tokens} tokens) to {order[0]}: {reason}")
+        return Route(tuple(order), reason)
+
+    def record_success(self, model: str, prompt_tokens: int, seconds: float) -> None:
+        """
+        Record a completed call.
+
+        Args:
+            model: Model that answered
+            prompt_tokens: Tokens the call was sized by
+            seconds: Call duration
+        """
+        rate = seconds / max(1, prompt_tokens / LATENCY_UNIT_TOKENS)
+        with self._lock:
+            if model in self._latencies:
+                self._latencies[model].append(rate)
+            self._failed_at.pop(model, None)
+
+    def record_failure(self, model: str) -> None:
+        """
+        Record a failed call; the model is demoted to fallback for the cooldown.
+
+        Args:
+            model: Model that failed
+        """
+        with self._lock:
+            self._failed_at[model] = self.clock()
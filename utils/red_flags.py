@@ -0,0 +1,216 @@
+import re
+import bisect
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from utils.chunking import PAGE_MARKER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Curated red-flag lexicon: category -> (label, severity, description, phrases).
+# Phrases are regular expressions; spaces match any run of whitespace, including line breaks.
+RED_FLAG_LEXICON = {
+    'auto_renewal': (
+        "Automatic renewal", 'high',
+        "The agreement renews on its own unless you cancel in time.",
+        [r"automatic(?:ally)? renew(?:s|ed|al)?", r"auto-renew(?:s|al)?", r"renew(?:s)? automatically",
+         r"evergreen", r"successive renewal (?:term|period)s?"]
+    ),
+    'indemnification': (
+        "Indemnification", 'high',
+        "You may have to cover the other party's losses or legal costs.",
+        [r"indemnif(?:y|ies|ied|ication)", r"hold (?:\w+ )?harmless"]
+    ),
+    'arbitration': (
+        "Mandatory arbitration", 'high',
+        "Disputes go to private arbitration instead of court.",
+        [r"binding arbitration", r"submit(?:ted)? to arbitration", r"resolved (?:exclusively )?by arbitration",
+         r"arbitration (?:shall|will) be (?:final|binding)"]
+    ),
+    'jury_waiver': (
+        "Jury trial or class action waiver", 'high',
+        "You give up the right to a jury trial or to join a class action.",
+        [r"waive[sd]? (?:any |all |the |its |their |your )?(?:right to (?:a )?)?(?:trial by )?jury(?: trial)?",
+         r"class action waiver", r"waive[sd]? (?:any |the )?right to (?:bring|participate in|join) (?:a )?class"]
+    ),
+    'unilateral_amendment': (
+        "Unilateral changes", 'high',
+        "The other party can change the terms without your agreement.",
+        [r"(?:amend|modify|change|update) (?:this agreement|these terms|the terms)(?: \w+){0,3} at any time",
+         r"at (?:its|our) sole discretion", r"without (?:prior )?notice to you",
+         r"reserves? the right to (?:amend|modify|change)"]
+    ),
+    'liquidated_damages': (
+        "Liquidated damages and penalties", 'high',
+        "Fixed amounts are owed on breach or early exit.",
+        [r"liquidated damages", r"early termination (?:fee|charge|penalty)", r"cancellation fee",
+         r"(?:as|a) penalty"]
+    ),
+    'limitation_of_liability': (
+        "Limitation of liability", 'medium',
+        "The other party's liability to you is capped or excluded.",
+        [r"limitation of liability", r"in no event (?:shall|will) (?:\w+ ){1,4}be liable",
+         r"(?:consequential|incidental|indirect) damages", r"liability (?:\w+ ){0,3}(?:shall not exceed|is limited to)"]
+    ),
+    'non_compete': (
+        "Non-compete and non-solicitation", 'medium',
+        "Your future work or hiring is restricted.",
+        [r"non-?compet(?:e|ition)", r"shall not (?:directly or indirectly )?compete", r"non-?solicitation",
+         r"shall not (?:directly or indirectly )?solicit"]
+    ),
+    'termination_for_convenience': (
+        "Termination at will", 'medium',
+        "The other party can end the agreement without cause.",
+        [r"terminate (?:this agreement )?(?:at any time )?for (?:any reason|convenience|no reason)",
+         r"terminate (?:this agreement )?at any time(?: without cause)?", r"without cause"]
+    ),
+    'perpetual_rights': (
+        "Perpetual or irrevocable rights", 'medium',
+        "Rights you grant may never end or be withdrawn.",
+        [r"in perpetuity", r"perpetual(?:ly)?", r"irrevocabl[ey]"]
+    ),
+    'assignment': (
+        "Assignment without consent", 'medium',
+        "The contract can be transferred to someone else without asking you.",
+        [r"assign (?:\w+ ){0,6}without (?:your |the )?(?:prior )?(?:written )?consent",
+         r"freely (?:assign|transfer)"]
+    ),
+    'personal_guarantee': (
+        "Personal guarantee", 'high',
+        "You are personally liable for another party's obligations.",
+        [r"personal(?:ly)? guarant(?:ee|y|ees)", r"jointly and severally liable"]
+    ),
+    'late_fees': (
+        "Late fees and interest", 'low',
+        "Late payments add fees or interest.",
+        [r"late (?:payment )?(?:fee|charge)s?", r"interest (?:at|of) (?:the rate of )?\d+(?:\.\d+)? ?%"]
+    ),
+    'exclusive_jurisdiction': (
+        "Exclusive jurisdiction", 'low',
+        "Disputes must be brought in a specific, possibly distant, court.",
+        [r"exclusive jurisdiction", r"exclusive venue", r"submit to the jurisdiction"]
+    ),
+}
+
+SEVERITY_WEIGHTS = {'high': 3, 'medium': 2, 'low': 1}
+
+# Characters of context shown on either side of a hit
+SNIPPET_CONTEXT = 80
+
+# Hits listed per category on the results page
+MAX_HITS_PER_CATEGORY = 5
+
+def _compile_lexicon() -> "re.Pattern":
+    groups = []
+    for category, (_, _, _, phrases) in RED_FLAG_LEXICON.items():
+        alternatives = "|".join(phrase.replace(' ', r'\s+') for phrase in phrases)
+        groups.append(f"(?P<{category}>(?:{alternatives})\\b)")
+    # The leading word-start check rejects most positions before any alternative is tried
+    return re.compile(r"\b(?=[a-z])(?:" + "|".join(groups) + ")", re.I)
+
+# All categories in one alternation, so a document is scanned in a single left-to-right pass
+RED_FLAG_PATTERN = _compile_lexicon()
+
+class RedFlag(NamedTuple):
+    """A lexicon match in a document."""
+    category: str
+    label: str
+    severity: str
+    text: str
+    page: Optional[int]
+    start: int
+    end: int
+    snippet: str
+
+def scan_red_flags(document_text: str) -> List[RedFlag]:
+    """
+    Find red-flag clauses with the local lexicon, without calling the model.
+
+    Args:
+        document_text: Extracted document text
+
+    Returns:
+        List[RedFlag]: Non-overlapping hits in document order, with character offsets and page numbers
+    """
+    page_starts = []
+    page_numbers = []
+    for match in PAGE_MARKER_PATTERN.finditer(document_text):
+        page_starts.append(match.start())
+        page_numbers.append(int(match.group(1)))
+
+    hits = []
+    for match in RED_FLAG_PATTERN.finditer(document_text):
+        category = match.lastgroup
+        label, severity, _, _ = RED_FLAG_LEXICON[category]
+        start, end = match.span()
+
+        position = bisect.bisect_right(page_starts, start) - 1
+        page = page_numbers[position] if position >= 0 else None
+
+        snippet_start = max(0, start - SNIPPET_CONTEXT)
+        snippet_end = min(len(document_text), end + SNIPPET_CONTEXT)
+        snippet = " ".join(PAGE_MARKER_PATTERN.sub(' ', document_text[snippet_start:snippet_end]).split())
+        snippet = ("…" if snippet_start else "") + snippet + ("…" if snippet_end < len(document_text) else "")
+
+        hits.append(RedFlag(category, label, severity, " ".join(match.group().split()), page, start, end, snippet))
+
+    logger.debug(f"Red-flag scan found {len(hits)} hits")
+    return hits
+
+def summarize_red_flags(hits: List[RedFlag]) -> List[Dict[str, Any]]:
+    """
+    Group hits by category for display, most severe categories first.
+
+    Args:
+        hits: Hits from scan_red_flags()
+
+    Returns:
+        List[Dict[str, Any]]: One entry per category with its count, pages and first hits
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for hit in hits:
+        group = groups.get(hit.category)
+        if group is None:
+            label, severity, description, _ = RED_FLAG_LEXICON[hit.category]
+            group = groups[hit.category] = {
+                "category": hit.category,
+                "label": label,
+                "severity": severity,
+                "description": description,
+                "count": 0,
+                "pages": [],
+                "hits": []
+            }
+        group["count"] += 1
+        if hit.page is not None and hit.page not in group["pages"]:
+            group["pages"].append(hit.page)
+        if len(group["hits"]) < MAX_HITS_PER_CATEGORY:
+            group["hits"].append(hit._asdict())
+
+    return sorted(groups.values(), key=lambda group: -SEVERITY_WEIGHTS[group["severity"]])
+
+def red_flag_score(text: str) -> int:
+    """
+    Severity-weighted number of red-flag hits in a text.
+
+    Args:
+        text: Any document text, e.g. one chunk
+
+    Returns:
+        int: Sum of the severity weights of all hits
+    """
+    return sum(SEVERITY_WEIGHTS[RED_FLAG_LEXICON[match.lastgroup][1]]
+               for match in RED_FLAG_PATTERN.finditer(text))
+
+def prioritize_chunks(chunks: List[str]) -> List[int]:
+    """
+    Order chunk positions so the chunks with the most red flags are analyzed first.
+
+    Args:
+        chunks: Document chunks in order
+
+    Returns:
+        List[int]: Chunk positions, highest score first; ties keep document order
+    """
+    scores = [red_flag_score(chunk) for chunk in chunks]
+    return sorted(range(len(chunks)), key=lambda position: -scores[position])
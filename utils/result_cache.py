@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from utils.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# AI result cache configuration
+RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "tiered")
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "legal_demystifier_results.sqlite3")
+)
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", 24 * 60 * 60))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_DISK_MAX_ENTRIES", 100000))
+# Once the disk tier is over its limit it is trimmed to this fraction of it, so trims are rare
+RESULT_CACHE_DISK_LOW_WATER = 0.9
+
+def normalize_question(question: Optional[str]) -> str:
+    """
+    Normalize a question so trivial variations share a cache entry.
+
+    Args:
+        question: User's question, or None for document-level actions
+
+    Returns:
+        str: Lowercased question with collapsed whitespace and no trailing punctuation
+    """
+    if not question:
+        return ""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+def make_cache_key(document_hash: str, action: str, question: Optional[str],
+                   model: str, prompt_version: str) -> str:
+    """
+    Build a content-addressed cache key for an AI result.
+
+    Args:
+        document_hash: Content hash of the document text
+        action: AI action name (e.g. 'simplify')
+        question: User's question, if any
+        model: Model name used to produce the result
+        prompt_version: Version of the prompt templates
+
+    Returns:
+        str: Hex-encoded cache key
+    """
+    key_material = json.dumps(
+        [document_hash, action, normalize_question(question), model, prompt_version]
+    )
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+def is_cacheable(result: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check whether an AI result may be cached. Error and partial results never are.
+
+    Args:
+        result: Result dict returned by an AI function
+
+    Returns:
+        bool: True if the result is safe to cache
+    """
+    return isinstance(result, dict) and not result.get('error') and not result.get('partial')
+
+class MemoryResultCache:
+    """
+    In-process result cache with TTL and LRU eviction by entry count.
+
+    Values are kept as JSON strings so every hit returns a fresh copy.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: int = RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(payload)
+
+    def set(self, key: str, result: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        payload = json.dumps(result)
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteResultCache:
+    """
+    On-disk result cache shared between workers, with TTL and entry-count eviction.
+
+    Writes only count the entries; expired and least recently used entries
+    are deleted once the count exceeds max_entries.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, max_entries: int = RESULT_CACHE_DISK_MAX_ENTRIES,
+                 ttl: int = RESULT_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "cache_key TEXT PRIMARY KEY, "
+                "payload TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_entry(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT payload, expires_at FROM results WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                payload, expires_at = row
+                if expires_at < now:
+                    conn.execute("DELETE FROM results WHERE cache_key = ?", (key,))
+                    return None
+                conn.execute("UPDATE results SET last_access = ? WHERE cache_key = ?", (now, key))
+                return expires_at, json.loads(payload)
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.get_entry(key)
+        return entry[1] if entry else None
+
+    def set(self, key: str, result: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + self.ttl
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (cache_key, payload, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(result), expires_at, now)
+                )
+                count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                if count > self.max_entries:
+                    self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - \
+            int(self.max_entries * RESULT_CACHE_DISK_LOW_WATER)
+        if excess > 0:
+            # Oldest first along the last_access index, no sort needed
+            conn.execute(
+                "DELETE FROM results WHERE cache_key IN ("
+                "SELECT cache_key FROM results ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            logger.debug(f"Evicted {excess} entries from the result cache")
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM results")
+        finally:
+            conn.close()
+
+class ResultCache:
+    """
+    Two-tier cache for AI results: a per-worker memory tier in front of an
+    optional shared on-disk tier. Error results are never stored.
+    """
+
+    def __init__(self, memory: MemoryResultCache, disk: Optional[SQLiteResultCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Key built with make_cache_key()
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the cached result, or None on a miss
+        """
+        result = self.memory.get(key)
+        outcome = 'memory_hit'
+        if result is None and self.disk is not None:
+            try:
+                entry = self.disk.get_entry(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache disk lookup failed: {str(e)}")
+                entry = None
+            if entry is not None:
+                expires_at, result = entry
+                self.memory.set(key, result, expires_at=expires_at)
+                outcome = 'disk_hit'
+
+        if result is None:
+            outcome = 'miss'
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_LOOKUPS.inc(result=outcome)
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a result unless it is an error result.
+
+        Args:
+            key: Key built with make_cache_key()
+            result: Result dict returned by an AI function
+        """
+        if not is_cacheable(result):
+            return
+
+        self.memory.set(key, result)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, result)
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache disk write failed: {str(e)}")
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+def create_result_cache(backend: str = RESULT_CACHE_BACKEND) -> ResultCache:
+    """
+    Build the result cache selected by configuration.
+
+    Args:
+        backend: 'memory' for a per-worker cache, 'tiered' to add the shared SQLite tier
+
+    Returns:
+        ResultCache: Configured cache instance
+    """
+    if backend == 'memory':
+        return ResultCache(MemoryResultCache())
+    elif backend == 'tiered':
+        return ResultCache(MemoryResultCache(), SQLiteResultCache())
+    else:
+        raise ValueError(f"Unsupported result cache backend: {backend}")
@@ -0,0 +1,155 @@
+import re
+import json
+import math
+import logging
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from utils.chunking import Section, split_into_sections
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have if in into is it its of on or shall
+that the their there this to was were which will with any all such may under
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms, dropping stopwords and plural 's'.
+
+    Args:
+        text: Input text
+
+    Returns:
+        List[str]: Index terms
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+class ClauseIndex:
+    """
+    BM25 inverted index over the sections of a single document.
+
+    The index only keeps section offsets, not section text, so it stays
+    small enough to store next to the document and is sliced against the
+    document text at query time.
+    """
+
+    def __init__(self, sections: List[Tuple[str, int, str, int, int]],
+                 lengths: List[int], postings: Dict[str, List[Tuple[int, int]]]):
+        # sections: (section_id, page, heading, start, end)
+        self.sections = sections
+        self.lengths = lengths
+        self.postings = postings
+        self.average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, document_text: str) -> "ClauseIndex":
+        """
+        Build an index over the page/clause sections of a document.
+
+        Args:
+            document_text: Extracted document text
+
+        Returns:
+            ClauseIndex: The built index
+        """
+        sections = []
+        lengths = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for position, section in enumerate(split_into_sections(document_text)):
+            terms = tokenize(section.text)
+            sections.append((section.section_id, section.page, section.heading,
+                             section.start, section.start + len(section.text)))
+            lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append((position, frequency))
+
+        logger.debug(f"Built clause index with {len(sections)} sections and {len(postings)} terms")
+        return cls(sections, lengths, postings)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "sections": self.sections,
+            "lengths": self.lengths,
+            "postings": self.postings
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> "ClauseIndex":
+        data = json.loads(payload)
+        return cls(
+            [tuple(section) for section in data["sections"]],
+            data["lengths"],
+            {term: [tuple(posting) for posting in postings] for term, postings in data["postings"].items()}
+        )
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Rank sections against a query with BM25.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of results
+
+        Returns:
+            List[Tuple[int, float]]: (section position, score) pairs, best first
+        """
+        total = len(self.sections)
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[position] / (self.average_length or 1)
+                scores[position] = scores.get(position, 0.0) + idf * (
+                    frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                )
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def section(self, document_text: str, position: int) -> Section:
+        """
+        Materialize an indexed section from the document text.
+
+        Args:
+            document_text: The text the index was built from
+            position: Section position returned by search()
+
+        Returns:
+            Section: The section with its text
+        """
+        section_id, page, heading, start, end = self.sections[position]
+        return Section(section_id, page, heading, document_text[start:end], start)
+
+    def retrieve(self, document_text: str, query: str, k: int = 5) -> List[Section]:
+        """
+        Return the top-k sections for a query, in document order.
+
+        Args:
+            document_text: The text the index was built from
+            query: Free-text query
+            k: Maximum number of sections
+
+        Returns:
+            List[Section]: Matching sections ordered by position in the document
+        """
+        positions = sorted(position for position, _ in self.search(query, k))
+        return [self.section(document_text, position) for position in positions]
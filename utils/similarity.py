@@ -0,0 +1,356 @@
+import os
+import re
+import struct
+import bisect
+import hashlib
+import logging
+import itertools
+import tempfile
+import threading
+import contextvars
+from array import array
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate index: 'disk' keeps signatures in SIMILARITY_INDEX_PATH (shared by workers),
+# 'memory' keeps them per worker, 'none' disables near-duplicate reuse
+SIMILARITY_INDEX_BACKEND = os.environ.get("SIMILARITY_INDEX_BACKEND", "disk")
+SIMILARITY_INDEX_PATH = os.environ.get(
+    "SIMILARITY_INDEX_PATH",
+    os.path.join(tempfile.gettempdir(), "legal_demystifier_similarity.idx")
+)
+# Signature size and LSH banding: 64 values in 4 bands of 16 rows find documents
+# above ~0.92 estimated Jaccard similarity with high probability
+SIMILARITY_NUM_PERM = int(os.environ.get("SIMILARITY_NUM_PERM", 64))
+SIMILARITY_BANDS = int(os.environ.get("SIMILARITY_BANDS", 4))
+SIMILARITY_SHINGLE_WORDS = int(os.environ.get("SIMILARITY_SHINGLE_WORDS", 4))
+
+WORD_PATTERN = re.compile(r"\w+")
+
+EMPTY_BIN = 0xFFFFFFFF
+# Densification offset for empty bins, so a borrowed value differs from the bin it came from
+DENSIFY_STEP = 0x9E3779B1
+
+# Loads adding more documents than this rebuild the band arrays with one sort instead of inserting
+BULK_LOAD_MIN = 64
+
+# Index file layout, little-endian:
+#   header  magic, signature size, shingle size
+#   records document ID (SHA-256 digest), owner key, signature values (uint32 each), appended as documents are indexed
+INDEX_MAGIC = b'LDS2'
+INDEX_HEADER = struct.Struct('<4sHH')
+DOCUMENT_ID_BYTES = 32
+OWNER_KEY_BYTES = 16
+
+_current_owner: contextvars.ContextVar = contextvars.ContextVar('similarity_owner', default=None)
+
+def set_similarity_owner(owner: Optional[str]) -> None:
+    """
+    Set who documents indexed or looked up by the current request belong to.
+
+    Near-duplicates are only matched among documents of the same owner, so
+    one user's analysis is never reused for another's upload.
+
+    Args:
+        owner: Opaque owner ID, e.g. per browser session; None for documents without one (batch runs)
+    """
+    _current_owner.set(owner)
+
+def similarity_owner() -> Optional[str]:
+    """
+    Owner of the current request's documents (see set_similarity_owner).
+
+    Returns:
+        Optional[str]: Owner ID, or None if there is none
+    """
+    return _current_owner.get()
+
+def owner_key(owner: Optional[str]) -> bytes:
+    """Fixed-size key stored with each signature for an owner ID."""
+    if owner is None:
+        return bytes(OWNER_KEY_BYTES)
+    return hashlib.blake2b(owner.encode('utf-8'), digest_size=OWNER_KEY_BYTES).digest()
+
+def shingle_hashes(document_text: str, shingle_words: int = SIMILARITY_SHINGLE_WORDS) -> Set[int]:
+    """
+    Hash the overlapping word n-grams of a document.
+
+    Args:
+        document_text: Extracted document text
+        shingle_words: Words per shingle
+
+    Returns:
+        Set[int]: 64-bit hash of each distinct shingle
+    """
+    words = WORD_PATTERN.findall(document_text.lower())
+    count = max(1, len(words) - shingle_words + 1) if words else 0
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[start:start + shingle_words]).encode('utf-8'),
+                                       digest_size=8).digest(), 'little')
+        for start in range(count)
+    }
+
+def minhash_signature(document_text: str, num_perm: int = SIMILARITY_NUM_PERM,
+                      shingle_words: int = SIMILARITY_SHINGLE_WORDS) -> array:
+    """
+    Compute a MinHash signature of a document's shingles.
+
+    Uses one-permutation hashing: each shingle hash is assigned to one of
+    num_perm bins and each bin keeps its minimum, so the cost is one hash
+    per shingle rather than num_perm. Empty bins borrow the value of the
+    next non-empty bin (densification) so sparse documents still compare.
+
+    Args:
+        document_text: Extracted document text
+        num_perm: Signature size
+        shingle_words: Words per shingle
+
+    Returns:
+        array: num_perm unsigned 32-bit values
+    """
+    bins = [EMPTY_BIN] * num_perm
+    for shingle in shingle_hashes(document_text, shingle_words):
+        position = shingle % num_perm
+        value = (shingle // num_perm) & 0xFFFFFFFF
+        if value < bins[position]:
+            bins[position] = value
+
+    filled = [position for position, value in enumerate(bins) if value != EMPTY_BIN]
+    if filled and len(filled) < num_perm:
+        densified = list(bins)
+        for position in range(num_perm):
+            if bins[position] == EMPTY_BIN:
+                donor = filled[bisect.bisect_left(filled, position) % len(filled)]
+                distance = (donor - position) % num_perm
+                densified[position] = (bins[donor] + distance * DENSIFY_STEP) & 0xFFFFFFFF
+        bins = densified
+    return array('I', bins)
+
+def estimate_similarity(first: array, second: array) -> float:
+    """
+    Estimate the Jaccard similarity of two documents' shingle sets from their signatures.
+
+    Args:
+        first: MinHash signature
+        second: MinHash signature of the same size
+
+    Returns:
+        float: Fraction of matching signature values, between 0 and 1
+    """
+    if not first:
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+class SimilarityIndex:
+    """
+    MinHash signatures with LSH banding for near-duplicate lookup.
+
+    Signatures live in one flat uint32 array and each LSH band is a pair of
+    parallel sorted arrays (band hash, document slot), so the index costs
+    about num_perm * 4 + bands * 12 bytes per document plus its ID and
+    owner key, and a lookup is a binary search per band. Documents only
+    match lookups by the owner they were indexed for. With a path, indexed
+    signatures are appended to a file that is loaded on first use and re-read
+    when other workers have added to it.
+    """
+
+    def __init__(self, num_perm: int = SIMILARITY_NUM_PERM, bands: int = SIMILARITY_BANDS,
+                 shingle_words: int = SIMILARITY_SHINGLE_WORDS, path: Optional[str] = None):
+        if num_perm % bands:
+            raise ValueError(f"Signature size {num_perm} is not divisible into {bands} bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_words = shingle_words
+        self.path = path
+        self._record = struct.Struct(f'<{DOCUMENT_ID_BYTES}s{OWNER_KEY_BYTES}s{num_perm}I')
+        self._lock = threading.Lock()
+        self._document_ids = bytearray()
+        self._owners = bytearray()
+        self._signatures = array('I')
+        self._band_keys = [array('Q') for _ in range(bands)]
+        self._band_slots = [array('I') for _ in range(bands)]
+        self._file_offset = 0
+        self._opened = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self.path:
+                self._load()
+            return len(self._document_ids) // DOCUMENT_ID_BYTES
+
+    def _band_hashes(self, signature: array) -> List[int]:
+        return [
+            int.from_bytes(hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                                           digest_size=8).digest(), 'little')
+            for band in range(self.bands)
+        ]
+
+    def _document_id(self, slot: int) -> str:
+        return self._document_ids[slot * DOCUMENT_ID_BYTES:(slot + 1) * DOCUMENT_ID_BYTES].hex()
+
+    def _candidates(self, band_hashes: List[int]) -> Set[int]:
+        slots = set()
+        for band, band_hash in enumerate(band_hashes):
+            keys = self._band_keys[band]
+            position = bisect.bisect_left(keys, band_hash)
+            while position < len(keys) and keys[position] == band_hash:
+                slots.add(self._band_slots[band][position])
+                position += 1
+        return slots
+
+    def _owner(self, slot: int) -> bytes:
+        return bytes(self._owners[slot * OWNER_KEY_BYTES:(slot + 1) * OWNER_KEY_BYTES])
+
+    def _contains(self, document_id: bytes, owner: bytes, band_hashes: List[int]) -> bool:
+        # A document always shares every band with itself, so its slot is among the candidates
+        return any(self._document_ids[slot * DOCUMENT_ID_BYTES:(slot + 1) * DOCUMENT_ID_BYTES] == document_id
+                   and self._owner(slot) == owner
+                   for slot in self._candidates(band_hashes))
+
+    def _insert(self, records: Iterable[Tuple[bytes, bytes, array]]) -> None:
+        # Band entries of new documents are collected first, then merged into each band's sorted arrays
+        new_entries: List[List[Tuple[int, int]]] = [[] for _ in range(self.bands)]
+        added = set()
+        indexed = len(self._document_ids) > 0
+        for document_id, owner, signature in records:
+            band_hashes = self._band_hashes(signature)
+            if (document_id, owner) in added or (indexed and self._contains(document_id, owner, band_hashes)):
+                continue
+            added.add((document_id, owner))
+            slot = len(self._document_ids) // DOCUMENT_ID_BYTES
+            self._document_ids += document_id
+            self._owners += owner
+            self._signatures.extend(signature)
+            for band, band_hash in enumerate(band_hashes):
+                new_entries[band].append((band_hash, slot))
+        for band, entries in enumerate(new_entries):
+            self._merge_band(band, entries)
+
+    def _merge_band(self, band: int, entries: List[Tuple[int, int]]) -> None:
+        keys, slots = self._band_keys[band], self._band_slots[band]
+        if len(entries) <= BULK_LOAD_MIN:
+            # A few insertions into the sorted arrays are cheaper than rebuilding them
+            for band_hash, slot in entries:
+                position = bisect.bisect_right(keys, band_hash)
+                keys.insert(position, band_hash)
+                slots.insert(position, slot)
+            return
+        # Slots grow with insertion order, so sorting pairs keeps equal hashes in slot order
+        merged = sorted(itertools.chain(zip(keys, slots), entries))
+        self._band_keys[band] = array('Q', (band_hash for band_hash, _ in merged))
+        self._band_slots[band] = array('I', (slot for _, slot in merged))
+
+    def _open_file(self) -> None:
+        header = INDEX_HEADER.pack(INDEX_MAGIC, self.num_perm, self.shingle_words)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            with open(self.path, 'rb') as index_file:
+                existing = index_file.read(INDEX_HEADER.size)
+        except FileNotFoundError:
+            existing = b''
+        if existing != header:
+            if existing:
+                logger.warning(f"Similarity index {self.path} has another format, starting a new one")
+            with open(self.path, 'wb') as index_file:
+                index_file.write(header)
+        self._file_offset = INDEX_HEADER.size
+        self._refresh()
+        logger.info(f"Loaded {len(self._document_ids) // DOCUMENT_ID_BYTES} document signatures from {self.path}")
+
+    def _load(self) -> None:
+        # The file is opened on first use rather than on construction, keeping it off the startup path
+        if not self._opened:
+            self._open_file()
+            self._opened = True
+        else:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        # Only whole records are read; a record another worker is still writing is picked up next time
+        size = os.path.getsize(self.path)
+        count = (size - self._file_offset) // self._record.size
+        if count <= 0:
+            return
+        with open(self.path, 'rb') as index_file:
+            index_file.seek(self._file_offset)
+            data = index_file.read(count * self._record.size)
+        self._insert((document_id, owner, array('I', values))
+                     for document_id, owner, *values in self._record.iter_unpack(data))
+        self._file_offset += count * self._record.size
+
+    def add(self, document_id: str, document_text: str, owner: Optional[str] = None) -> None:
+        """
+        Index a document's signature.
+
+        Args:
+            document_id: The document's hash (see compute_document_id)
+            document_text: Extracted document text
+            owner: Owner ID the document is indexed for (see set_similarity_owner)
+        """
+        signature = minhash_signature(document_text, self.num_perm, self.shingle_words)
+        raw_id = bytes.fromhex(document_id)
+        key = owner_key(owner)
+        with self._lock:
+            if not self.path:
+                self._insert([(raw_id, key, signature)])
+                return
+            self._load()
+            if self._contains(raw_id, key, self._band_hashes(signature)):
+                return
+            # Appended records are picked up by every worker, including this one, on refresh
+            with open(self.path, 'ab') as index_file:
+                index_file.write(self._record.pack(raw_id, key, *signature))
+            self._refresh()
+
+    def query(self, document: Union[str, array], threshold: float,
+              limit: int = 5, owner: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Find indexed documents similar to a document.
+
+        Args:
+            document: Extracted document text, or its signature
+            threshold: Minimum estimated Jaccard similarity
+            limit: Maximum number of matches
+            owner: Only documents indexed for this owner are matched
+
+        Returns:
+            List[Tuple[str, float]]: Document IDs with their estimated similarity, most similar first
+        """
+        signature = document if isinstance(document, array) else \
+            minhash_signature(document, self.num_perm, self.shingle_words)
+        band_hashes = self._band_hashes(signature)
+        key = owner_key(owner)
+        with self._lock:
+            if self.path:
+                self._load()
+            matches = []
+            for slot in self._candidates(band_hashes):
+                if self._owner(slot) != key:
+                    continue
+                candidate = self._signatures[slot * self.num_perm:(slot + 1) * self.num_perm]
+                similarity = estimate_similarity(signature, candidate)
+                if similarity >= threshold:
+                    matches.append((self._document_id(slot), similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches[:limit]
+
+def create_similarity_index(backend: str = SIMILARITY_INDEX_BACKEND) -> Optional[SimilarityIndex]:
+    """
+    Build the near-duplicate index selected by configuration.
+
+    Args:
+        backend: 'disk' for the shared index file, 'memory' for a per-worker index, 'none' to disable
+
+    Returns:
+        Optional[SimilarityIndex]: Configured index, or None when disabled
+    """
+    if backend == 'disk':
+        return SimilarityIndex(path=SIMILARITY_INDEX_PATH)
+    elif backend == 'memory':
+        return SimilarityIndex()
+    elif backend == 'none':
+        return None
+    else:
+        raise ValueError(f"Unsupported similarity index backend: {backend}")
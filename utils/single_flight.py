@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from utils.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Cross-worker coalescing: directory for per-key lock files; empty keeps coalescing within each worker
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get("SINGLE_FLIGHT_LOCK_DIR", "")
+# Longest a worker waits for another worker's identical analysis before running its own
+SINGLE_FLIGHT_LOCK_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_LOCK_TIMEOUT", 120))
+
+LOCK_POLL_INTERVAL = 0.05
+
+class _Call:
+    """An in-flight call that followers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one.
+
+    While a call for a key is running, further calls with the same key wait
+    for it and receive its result (or its exception) instead of running
+    again. Threads and asyncio tasks are coalesced separately.
+
+    With a lock directory, workers also take an exclusive lock file per key
+    around the call. A worker that had to wait for the lock re-checks the
+    shared result cache through recheck() before running the call itself,
+    so identical requests across workers cost one model call.
+    """
+
+    def __init__(self, lock_dir: str = SINGLE_FLIGHT_LOCK_DIR, lock_timeout: float = SINGLE_FLIGHT_LOCK_TIMEOUT):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        if lock_dir:
+            try:
+                import fcntl  # noqa: F401
+            except ImportError:
+                logger.warning("File locks are not supported on this platform; coalescing within each worker only")
+                self.lock_dir = ""
+            else:
+                os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call, e.g. a result cache key
+            fn: The call to run
+            recheck: Returns a result stored by another worker, or None
+
+        Returns:
+            The result of fn (or of recheck)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.inc(scope='worker')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._file_lock(key) as waited:
+                result = recheck() if waited and recheck else None
+                if result is not None:
+                    COALESCED_REQUESTS.inc(scope='cluster')
+                else:
+                    result = fn()
+            call.result = result
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]],
+                       recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Async equivalent of do(); fn is awaited once for all concurrent tasks with the same key.
+
+        A waiting task that is cancelled does not cancel the shared call.
+        """
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            COALESCED_REQUESTS.inc(scope='worker')
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._run_async(key, fn, recheck))
+        self._tasks[key] = task
+        task.add_done_callback(lambda finished: self._tasks.pop(key, None) if self._tasks.get(key) is finished else None)
+        return await asyncio.shield(task)
+
+    async def _run_async(self, key: str, fn: Callable[[], Awaitable[Any]],
+                         recheck: Optional[Callable[[], Any]]) -> Any:
+        if not self.lock_dir:
+            return await fn()
+
+        # Waiting for another worker's lock blocks, so it happens on a worker thread
+        lock_file, waited = await asyncio.to_thread(self._acquire_file_lock, key)
+        try:
+            result = recheck() if waited and recheck else None
+            if result is not None:
+                COALESCED_REQUESTS.inc(scope='cluster')
+                return result
+            return await fn()
+        finally:
+            self._release_file_lock(lock_file)
+
+    @contextmanager
+    def _file_lock(self, key: str) -> Iterator[bool]:
+        """Hold the cross-worker lock for key; yields whether another worker held it first."""
+        if not self.lock_dir:
+            yield False
+            return
+        lock_file, waited = self._acquire_file_lock(key)
+        try:
+            yield waited
+        finally:
+            self._release_file_lock(lock_file)
+
+    def _acquire_file_lock(self, key: str):
+        import fcntl
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        lock_file = open(os.path.join(self.lock_dir, f"{name}.lock"), 'a')
+        deadline = time.monotonic() + self.lock_timeout
+        waited = False
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file, waited
+            except BlockingIOError:
+                waited = True
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timed out waiting for another worker's analysis of {key}; running it here")
+                    lock_file.close()
+                    return None, waited
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def _release_file_lock(self, lock_file) -> None:
+        if lock_file is None:
+            return
+        import fcntl
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
@@ -0,0 +1,143 @@
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from utils.document_store import compute_document_id
+
+logger = logging.getLogger(__name__)
+
+# Per-request latency budget in seconds for prompt processing; 0 disables it.
+# Together with the backend's prompt throughput it caps the tokens sent in one call.
+PROMPT_LATENCY_BUDGET = float(os.environ.get("PROMPT_LATENCY_BUDGET", 0))
+PROMPT_TOKENS_PER_SECOND = float(os.environ.get("PROMPT_TOKENS_PER_SECOND", 4000))
+
+# Documents whose token counts are remembered, by document hash
+TOKEN_COUNT_CACHE_SIZE = int(os.environ.get("TOKEN_COUNT_CACHE_SIZE", 256))
+
+# Approximates a subword tokenizer: common words are one token, long words
+# are split every 7 characters and each punctuation mark is a token of its own
+TOKEN_PATTERN = re.compile(r"\w{1,7}|[^\w\s]")
+
+TRUNCATION_NOTE = "\n\n[Note: Document was truncated due to length limits]"
+
+class PromptPlan(NamedTuple):
+    """How a request's document context fits into the prompt budget."""
+    strategy: str  # 'single', 'retrieval' or 'map_reduce'
+    document_tokens: int  # tokens in the whole document
+    budget_tokens: int  # tokens allowed in one prompt
+    context_tokens: int  # tokens of document context allowed in one prompt
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with a local approximation of the model tokenizer.
+
+    Args:
+        text: Any prompt text
+
+    Returns:
+        int: Approximate token count
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+_document_token_counts: "OrderedDict[str, int]" = OrderedDict()
+_document_token_lock = threading.Lock()
+
+def document_tokens(document_text: str, document_id: Optional[str] = None) -> int:
+    """
+    Token count of a document, counted once per document hash.
+
+    Args:
+        document_text: Extracted document text
+        document_id: The document's hash, computed if not given
+
+    Returns:
+        int: Approximate token count
+    """
+    document_id = document_id or compute_document_id(document_text)
+    with _document_token_lock:
+        if document_id in _document_token_counts:
+            _document_token_counts.move_to_end(document_id)
+            return _document_token_counts[document_id]
+
+    tokens = count_tokens(document_text)
+    with _document_token_lock:
+        _document_token_counts[document_id] = tokens
+        while len(_document_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _document_token_counts.popitem(last=False)
+    return tokens
+
+def prompt_token_budget(max_tokens: int, latency_budget: float = PROMPT_LATENCY_BUDGET,
+                        tokens_per_second: float = PROMPT_TOKENS_PER_SECOND) -> int:
+    """
+    Tokens one prompt may contain under the configured token and latency budgets.
+
+    Args:
+        max_tokens: Configured token budget for the prompt
+        latency_budget: Seconds of prompt processing allowed per call; 0 for no limit
+        tokens_per_second: Prompt throughput of the model backend
+
+    Returns:
+        int: The smaller of the two budgets
+    """
+    if latency_budget > 0:
+        return max(1, min(max_tokens, int(latency_budget * tokens_per_second)))
+    return max_tokens
+
+def plan_prompt(document_tokens: int, overhead_tokens: int, budget_tokens: int,
+                question: bool = False, retrieval_min_tokens: Optional[int] = None,
+                retrieval_max_tokens: Optional[int] = None) -> PromptPlan:
+    """
+    Choose how to send a document within the prompt budget.
+
+    Documents that fit are sent whole. Otherwise questions send the
+    best-matching sections (retrieval) and document-level actions analyze
+    budget-sized chunks and merge them (map-reduce).
+
+    Args:
+        document_tokens: Tokens in the document
+        overhead_tokens: Tokens in the system prompt, question and framing
+        budget_tokens: Tokens allowed in one prompt (see prompt_token_budget)
+        question: Whether the request is a question about the document
+        retrieval_min_tokens: Questions about smaller documents always send the whole document
+        retrieval_max_tokens: Upper bound on retrieved context
+
+    Returns:
+        PromptPlan: Chosen strategy and the document context allowed per prompt
+    """
+    context_tokens = max(1, budget_tokens - overhead_tokens)
+    if question:
+        if document_tokens <= min(context_tokens, retrieval_min_tokens or context_tokens):
+            return PromptPlan('single', document_tokens, budget_tokens, context_tokens)
+        if retrieval_max_tokens:
+            context_tokens = min(context_tokens, retrieval_max_tokens)
+        return PromptPlan('retrieval', document_tokens, budget_tokens, context_tokens)
+
+    strategy = 'single' if document_tokens <= context_tokens else 'map_reduce'
+    return PromptPlan(strategy, document_tokens, budget_tokens, context_tokens)
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to at most max_tokens tokens, at a word boundary, with a truncation note.
+
+    Args:
+        text: Text to trim
+        max_tokens: Token limit
+
+    Returns:
+        str: The text unchanged if it fits, otherwise its trimmed prefix
+    """
+    end = None
+    for count, match in enumerate(TOKEN_PATTERN.finditer(text), 1):
+        if count > max_tokens:
+            end = match.start()
+            break
+    if end is None:
+        return text
+
+    last_space = text.rfind(' ', 0, end)
+    if last_space > end * 0.8:
+        end = last_space
+    return text[:end].rstrip() + TRUNCATION_NOTE
@@ -0,0 +1,103 @@
+import re
+import hashlib
+import logging
+from difflib import SequenceMatcher
+from typing import List, NamedTuple, Optional
+
+from utils.chunking import PAGE_MARKER_PATTERN, split_into_sections
+
+logger = logging.getLogger(__name__)
+
+# Leading clause numbering ("12.", "4.2.1", "Section 3:") is ignored when fingerprinting,
+# so inserting a clause does not make every later, renumbered clause look changed
+NUMBERING_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule|EXHIBIT|Exhibit)\s+[\dIVXLCivxlc]+[.:]?'
+    r'|\d{1,3}(?:\.\d{1,3})+\.?'
+    r'|\d{1,3}[.)]'
+    r')\s+'
+)
+
+class Clause(NamedTuple):
+    """A clause of one document version with its content fingerprint."""
+    clause_id: str
+    heading: str
+    text: str
+    fingerprint: str
+
+class ClauseChange(NamedTuple):
+    """One difference between two versions of a document."""
+    change: str  # 'added', 'modified' or 'removed'
+    clause: Optional[Clause]  # the clause in the new version (None when removed)
+    previous: Optional[Clause]  # the clause in the old version (None when added)
+
+def clause_fingerprint(text: str) -> str:
+    """
+    Fingerprint a clause by its wording, ignoring numbering, case and layout.
+
+    Args:
+        text: Clause text
+
+    Returns:
+        str: Hex digest identifying the clause content
+    """
+    normalized = " ".join(NUMBERING_PATTERN.sub('', text, count=1).lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+
+def split_into_clauses(document_text: str) -> List[Clause]:
+    """
+    Split a document into fingerprinted clauses.
+
+    Page markers are removed first so that a clause moving to another page
+    between versions is not reported as changed.
+
+    Args:
+        document_text: Extracted document text
+
+    Returns:
+        List[Clause]: Clauses in document order
+    """
+    text = PAGE_MARKER_PATTERN.sub('', document_text)
+    return [
+        Clause(f"C{position + 1}", section.heading, section.text.strip(), clause_fingerprint(section.text))
+        for position, section in enumerate(split_into_sections(text))
+    ]
+
+def diff_clauses(previous: List[Clause], current: List[Clause]) -> List[ClauseChange]:
+    """
+    Compare two versions of a document clause by clause.
+
+    Clauses that only moved are not reported. Replaced runs of clauses are
+    paired up as modifications; any surplus is reported as added or removed.
+
+    Args:
+        previous: Clauses of the earlier version
+        current: Clauses of the new version
+
+    Returns:
+        List[ClauseChange]: Changes in new-version order, removals at their old position
+    """
+    previous_fingerprints = [clause.fingerprint for clause in previous]
+    current_fingerprints = [clause.fingerprint for clause in current]
+    previous_set = set(previous_fingerprints)
+    current_set = set(current_fingerprints)
+
+    changes = []
+    matcher = SequenceMatcher(None, previous_fingerprints, current_fingerprints, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        # Clauses that still exist elsewhere in the other version were moved, not changed
+        removed = [clause for clause in previous[i1:i2] if clause.fingerprint not in current_set]
+        added = [clause for clause in current[j1:j2] if clause.fingerprint not in previous_set]
+
+        paired = min(len(removed), len(added)) if tag == 'replace' else 0
+        for old, new in zip(removed[:paired], added[:paired]):
+            changes.append(ClauseChange('modified', new, old))
+        for new in added[paired:]:
+            changes.append(ClauseChange('added', new, None))
+        for old in removed[paired:]:
+            changes.append(ClauseChange('removed', None, old))
+
+    logger.debug(f"Diffed {len(previous)} -> {len(current)} clauses: {len(changes)} changes")
+    return changes